@@ -1,47 +1,30 @@
 import click
 
-from jg.coop.cli import (
-    backup,
-    cache,
-    cancel_previous_builds,
-    check_bot,
-    check_docs,
-    check_sponsors,
-    data,
-    notes,
-    screenshots,
-    sync,
-    tidy,
-    web,
-    winners,
-)
 from jg.coop.cli.dev import main as dev
 from jg.coop.lib import loggers
 from jg.coop.lib.cache import close_cache
-from jg.coop.lib.cli import load_command
+from jg.coop.lib.cli import LazyGroup, command_name
 
 
-subcommands = click.Group(
-    commands=dict(
-        map(
-            load_command,
-            [
-                backup,
-                cache,
-                cancel_previous_builds,
-                check_bot,
-                check_docs,
-                check_sponsors,
-                data,
-                notes,
-                screenshots,
-                sync,
-                tidy,
-                web,
-                winners,
-            ],
-        )
-    )
+subcommands = LazyGroup(
+    lazy_commands={
+        command_name(module_name): f"jg.coop.cli.{module_name}"
+        for module_name in [
+            "backup",
+            "cache",
+            "cancel_previous_builds",
+            "check_bot",
+            "check_docs",
+            "check_sponsors",
+            "data",
+            "notes",
+            "screenshots",
+            "sync",
+            "tidy",
+            "web",
+            "winners",
+        ]
+    }
 )
 
 
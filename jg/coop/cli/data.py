@@ -24,6 +24,7 @@ SNAPSHOT_EXCLUDE = [
     "node_modules",
     "public",
     ".image_templates_cache",
+    ".profiles",
     ".pytest_cache",
     ".vscode",
     SNAPSHOT_FILE,
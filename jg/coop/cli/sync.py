@@ -1,16 +1,31 @@
 import os
+import subprocess
 import sys
-from functools import cached_property, wraps
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import cached_property, partial, wraps
 from pathlib import Path
 from time import perf_counter_ns
 
 import click
 
 from jg.coop import sync as sync_package
-from jg.coop.lib import images, loggers, mutations
-from jg.coop.lib.cli import command_name, import_commands
-from jg.coop.models.base import db
-from jg.coop.models.sync import Sync
+from jg.coop.lib import (
+    discord_task,
+    fingerprints,
+    loggers,
+    mutations,
+    profiling,
+    sync_history,
+)
+from jg.coop.lib.cli import (
+    LazyGroup,
+    command_name,
+    find_commands,
+    get_module_path,
+    read_dependencies,
+)
+from jg.coop.models.base import PRAGMAS_PROFILES, db
+from jg.coop.models.sync import Sync, SyncFingerprint
 
 
 try:
@@ -21,24 +36,24 @@ except (Exception, ImportError):
 
 NOTIFY_AFTER_MIN = 1
 
+DEFAULT_DB_PROFILE = "bulk"
+
 
 logger = loggers.from_path(__file__)
 
 
-class Group(click.Group):
+class Group(LazyGroup):
     sync_package = sync_package
 
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault("lazy_commands", find_commands(self.sync_package))
         super().__init__(*args, **kwargs)
 
-    @cached_property
-    def sync_commands(self):
-        return dict(import_commands(self.sync_package))
-
     @cached_property
     def dependencies_map(self):
         return {
-            name: command.dependencies for name, command in self.sync_commands.items()
+            name: read_dependencies(get_module_path(module_name))
+            for name, module_name in self.lazy_commands.items()
         }
 
     def sync_command(self, *args, **kwargs):
@@ -72,16 +87,34 @@ class Group(click.Group):
                         logger[name].debug(f"Invoking dependency: {dependency_name}")
                         context.invoke(main.get_command(context, dependency_name))
 
+                command = context.command
+                if command.has_inputs and not context.obj["force"]:
+                    if self._is_sync_command_fresh(name, command, fn, fn_kwargs):
+                        logger[name].info("Skipping (inputs unchanged)")
+                        self._start_sync_command(name, sync)
+                        self._end_sync_command(name, sync)
+                        return
+
                 logger[name].debug("Invoking self")
                 self._start_sync_command(name, sync)
                 try:
-                    context.invoke(fn, *fn_args, **fn_kwargs)
+                    db_profile = context.obj["db_profile"] or command.db_profile
+                    with (
+                        db.pragmas_profile(db_profile),
+                        profiling.profiling(name),
+                        db.count_queries() as queries,
+                    ):
+                        context.invoke(fn, *fn_args, **fn_kwargs)
                 except:
                     sync_command = self._end_sync_command(name, sync)
                     logger[name].error("Crashed!")
                     raise
                 else:
                     sync_command = self._end_sync_command(name, sync)
+                    log_queries(logger[name], queries)
+                    sync_history.record(name, sync.id, sync_command.time_diff)
+                    if command.has_inputs:
+                        self._record_sync_command_inputs(name, command, fn, fn_kwargs)
                     logger[name].info(
                         f"Finished in {sync_command.time_diff_min:.1f}min"
                     )
@@ -106,19 +139,58 @@ class Group(click.Group):
     def _end_sync_command(self, name, sync):
         return sync.command_end(name, perf_counter_ns())
 
-    def list_commands(self, context):
-        return sorted(super().list_commands(context) + list(self.sync_commands))
+    @db.connection_context()
+    def _is_sync_command_fresh(self, name, command, fn, params):
+        # If the command crashes, its outputs might be left broken,
+        # so the fingerprint needs to be forgotten before running it
+        fingerprint = command.fingerprint(fn, params)
+        if fingerprint == SyncFingerprint.get_fingerprint(name):
+            return True
+        SyncFingerprint.forget(name)
+        return False
 
-    def get_command(self, context, name):
-        return super().get_command(context, name) or self.sync_commands.get(name)
+    @db.connection_context()
+    def _record_sync_command_inputs(self, name, command, fn, params):
+        # Computed after the run, because the command itself might
+        # have filled the cache tags it reads from
+        SyncFingerprint.record(name, command.fingerprint(fn, params))
 
 
 class Command(click.Command):
-    def __init__(self, *args, dependencies=None, **kwargs):
+    def __init__(
+        self,
+        *args,
+        dependencies=None,
+        input_files=None,
+        input_tables=None,
+        input_cache_tags=None,
+        db_profile=DEFAULT_DB_PROFILE,
+        **kwargs,
+    ):
         self.dependencies = list(dependencies or [])
+        self.input_files = list(input_files or [])
+        self.input_tables = list(input_tables or [])
+        self.input_cache_tags = list(input_cache_tags or [])
+        self.db_profile = db_profile
         super().__init__(*args, **kwargs)
         self.name = command_name(self.callback.__module__)
 
+    @property
+    def has_inputs(self):
+        return bool(self.input_files or self.input_tables or self.input_cache_tags)
+
+    def fingerprint(self, fn, params):
+        return fingerprints.fingerprint(
+            files=self.input_files,
+            tables=self.input_tables,
+            cache_tags=self.input_cache_tags,
+            params=params,
+            fn=fn,
+            dependencies=[
+                SyncFingerprint.get_fingerprint(name) for name in self.dependencies
+            ],
+        )
+
 
 @click.group(chain=True, cls=Group)
 @click.option("--id", envvar="CIRCLE_WORKFLOW_WORKSPACE_ID", default=perf_counter_ns)
@@ -134,6 +206,32 @@ class Command(click.Command):
 @click.option(
     "--clear-image-templates-cache/--keep-image-templates-cache", default=True
 )
+@click.option(
+    "--force/--no-force",
+    default=False,
+    help="Run commands even if their inputs haven't changed.",
+)
+@click.option(
+    "--profile/--no-profile",
+    default=False,
+    help="Save a pstats profile of each command.",
+)
+@click.option(
+    "--profile-dir",
+    default=profiling.PROFILES_DIR,
+    type=click.Path(path_type=Path, file_okay=False),
+    show_default=True,
+)
+@click.option(
+    "--db-profile",
+    type=click.Choice(list(PRAGMAS_PROFILES)),
+    envvar="JG_DB_PROFILE",
+    help=(
+        "Profile of SQLite pragmas to use for all commands. "
+        f"By default, commands use {DEFAULT_DB_PROFILE!r} or the one they declare."
+    ),
+)
+@click.option("--notify/--no-notify", default=True, hidden=True)
 @click.pass_context
 def main(
     context,
@@ -142,25 +240,49 @@ def main(
     mutate,
     allow_mutations,
     clear_image_templates_cache,
+    force,
+    profile,
+    profile_dir,
+    db_profile,
+    notify,
 ):
     if allow_mutations:
         mutations.allow_all()
     else:
         mutations.allow(*mutate)
 
+    if profile:
+        logger.info(f"Profiling commands to {profile_dir}")
+        profiling.enable(profile_dir)
+
+    if db_profile:
+        logger.debug(f"Using {db_profile!r} profile of SQLite pragmas")
+    db.use_pragmas_profile(db_profile or DEFAULT_DB_PROFILE)
+
     if clear_image_templates_cache:
+        # Imports Playwright, which is slow and not needed by most commands
+        from jg.coop.lib import images
+
         images.init_templates_cache()
     else:
         logger.info("Keeping image templates cache")
 
     with db.connection_context():
         sync = Sync.start(id)
-    context.obj = dict(sync=sync, skip_dependencies=not deps)
+    context.obj = dict(
+        sync=sync,
+        skip_dependencies=not deps,
+        force=force,
+        db_profile=db_profile,
+        notify=notify,
+    )
     logger.debug(
         f"Sync #{id} starts with {sync.count_commands()} commands already recorded"
     )
     context.call_on_close(close)
 
+    context.with_resource(discord_task.session())
+
 
 @main.command()
 @click.argument("job", type=click.Choice(["sync-1", "sync-2"]), envvar="CIRCLE_JOB")
@@ -169,34 +291,26 @@ def main(
 @click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
 @click.pass_context
 def ci(context, job, node_index, nodes, print_only):
-    if job == "sync-1":
-        commands_with_deps = {
-            name for name, deps in main.dependencies_map.items() if deps
-        }
-        chains = get_parallel_chains(main.dependencies_map, exclude=commands_with_deps)
-    elif job == "sync-2":
-        commands_without_deps = {
-            name for name, deps in main.dependencies_map.items() if not deps
-        }
-        chains = get_parallel_chains(
-            main.dependencies_map, exclude=commands_without_deps
-        )
-    else:
-        raise ValueError(job)
-
-    if nodes and nodes != len(chains):
+    chains = get_job_chains(main.dependencies_map, job)
+    nodes = nodes or len(chains)
+    if nodes > len(chains):
         logger.error(
-            f"The job {job} has parallelism {nodes}, but there are {len(chains)} command chains!"
+            f"The job {job} has parallelism {nodes}, but there are only {len(chains)} command chains!"
         )
         raise click.Abort()
 
+    durations = get_durations(main.dependencies_map)
+    nodes_chains = pack_chains(chains, nodes, durations)
+
     if print_only:
-        for index, chain in enumerate(chains):
+        makespans = get_makespans(nodes_chains, durations)
+        for index, (chain, makespan) in enumerate(zip(nodes_chains, makespans)):
+            bold, color = (True, "green") if index == node_index else (None, None)
+            click.secho(f"{index} ~{makespan / 60000000000:.1f}min", bold=bold)
             for name in chain:
-                bold, color = (True, "green") if index == node_index else (None, None)
                 click.secho(f"{index} {name}", bold=bold, fg=color)
     else:
-        for name in chains[node_index]:
+        for name in nodes_chains[node_index]:
             command = main.get_command(context, name)
             context.invoke(command)
 
@@ -209,21 +323,18 @@ def ci(context, job, node_index, nodes, print_only):
 )
 @click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
 def parallelism(config_path, print_only):
-    commands_with_deps = {name for name, deps in main.dependencies_map.items() if deps}
-    sync1_chains = get_parallel_chains(
-        main.dependencies_map, exclude=commands_with_deps
-    )
-    sync1_parallelism = len(sync1_chains)
-    click.echo(f"sync-1 {sync1_parallelism}")
-
-    commands_without_deps = {
-        name for name, deps in main.dependencies_map.items() if not deps
-    }
-    sync2_chains = get_parallel_chains(
-        main.dependencies_map, exclude=commands_without_deps
-    )
-    sync2_parallelism = len(sync2_chains)
-    click.echo(f"sync-2 {sync2_parallelism}")
+    durations = get_durations(main.dependencies_map)
+    jobs_parallelism = {}
+    for job in ["sync-1", "sync-2"]:
+        chains = get_job_chains(main.dependencies_map, job)
+        nodes = get_nodes_count(chains, durations)
+        makespans = get_makespans(pack_chains(chains, nodes, durations), durations)
+        jobs_parallelism[job] = nodes
+        click.echo(f"{job} {nodes}")
+        logger[job].info(
+            f"{len(chains)} chains on {nodes} nodes, predicted makespans: "
+            + ", ".join(f"{makespan / 60000000000:.1f}min" for makespan in makespans)
+        )
 
     if print_only:
         return
@@ -232,10 +343,8 @@ def parallelism(config_path, print_only):
     parallelism = None
     with config_path.open() as config_file:
         for line in config_file:
-            if line.strip() == "sync-1:":
-                parallelism = sync1_parallelism
-            elif line.strip() == "sync-2:":
-                parallelism = sync2_parallelism
+            if line.strip().removesuffix(":") in jobs_parallelism:
+                parallelism = jobs_parallelism[line.strip().removesuffix(":")]
             elif line.lstrip().startswith("parallelism:"):
                 line, _ = line.split(":", 1)
                 line += f": {parallelism}\n"
@@ -245,16 +354,80 @@ def parallelism(config_path, print_only):
 
 @main.command()
 @click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
+@click.option("-j", "--jobs", default=1, type=int, show_default=True)
 @click.pass_context
-def all(context, print_only):
-    for name in main.dependencies_map:
-        command = main.get_command(context, name)
-        if print_only:
+def all(context, print_only, jobs):
+    if print_only:
+        for name in main.dependencies_map:
             click.echo(name)
-        else:
+    elif jobs > 1:
+        sync = context.obj["sync"]
+        with db.connection_context():
+            done = set(filter(sync.is_command_seen, main.dependencies_map))
+        logger.info(f"Running {len(main.dependencies_map)} commands in {jobs} jobs")
+        time_start = perf_counter_ns()
+        run_parallel(
+            main.dependencies_map,
+            partial(
+                run_in_process,
+                sync.id,
+                force=context.obj["force"],
+                db_profile=context.obj["db_profile"],
+            ),
+            jobs=jobs,
+            done=done,
+        )
+        time_diff_min = (perf_counter_ns() - time_start) / 60000000000
+        logger.info(f"Finished all commands in {time_diff_min:.1f}min")
+    else:
+        for name in main.dependencies_map:
+            command = main.get_command(context, name)
             context.invoke(command)
 
 
+@main.command()
+@click.option(
+    "--threshold",
+    "threshold_ptc",
+    default=sync_history.REGRESSION_THRESHOLD_PTC,
+    type=float,
+    show_default=True,
+    help="In percents.",
+)
+@click.option("--fail/--no-fail", default=False, show_default=True)
+def stats(threshold_ptc, fail):
+    history = sync_history.load(main.dependencies_map)
+    if not history:
+        logger.warning("No history recorded yet")
+        return
+
+    regressions = []
+    for name, records in history.items():
+        stats = sync_history.get_stats(records, threshold_ptc=threshold_ptc)
+        change = (
+            f"{stats['change_ptc']:+.0f}%" if stats["change_ptc"] is not None else "-"
+        )
+        line = (
+            f"{name:30} {stats['trend']:10} {stats['count']:4}× "
+            f"last {stats['last'] / 60000000000:5.1f}min "
+            f"p50 {stats['p50'] / 60000000000:5.1f}min "
+            f"p90 {stats['p90'] / 60000000000:5.1f}min "
+            f"{change:>6}"
+        )
+        if stats["is_regression"]:
+            regressions.append(name)
+            click.secho(line, bold=True, fg="red")
+        else:
+            click.echo(line)
+
+    if regressions:
+        logger.warning(
+            f"Slower by more than {threshold_ptc:.0f}%: {', '.join(regressions)}"
+        )
+        if fail:
+            raise click.Abort()
+
+
 @click.pass_context
 def close(context):
     exception = sys.exception()
@@ -275,16 +448,38 @@ def close(context):
         if not exception:
             logger.info(times_repr)
         total_time = sum(times.values())
-        if total_time >= NOTIFY_AFTER_MIN:
+        if total_time >= NOTIFY_AFTER_MIN and context.obj["notify"]:
             notify("Finished!", f"{total_time:.1f}min")
 
 
+def log_queries(logger, queries, top=5):
+    logger.info(f"Executed {queries.count} SQL queries in {queries.time_s:.1f}s")
+    for statement, count in queries.most_common(top):
+        logger.debug(f"{count}× {statement}")
+    for statement, count in queries.n_plus_one():
+        logger.warning(f"Probable N+1, {count}× {statement}")
+
+
 def notify(title, text):
     print("\a", end="", flush=True)
     if pync:
         pync.Notifier.notify(text, title=title)
 
 
+def get_durations(names):
+    return sync_history.median_durations(sync_history.load(names))
+
+
+def get_job_chains(dependencies_map, job):
+    if job == "sync-1":
+        exclude = {name for name, deps in dependencies_map.items() if deps}
+    elif job == "sync-2":
+        exclude = {name for name, deps in dependencies_map.items() if not deps}
+    else:
+        raise ValueError(job)
+    return get_parallel_chains(dependencies_map, exclude=exclude)
+
+
 def get_parallel_chains(dependencies_map, exclude=None):
     exclude = exclude or []
     temp_chains = {
@@ -309,6 +504,143 @@ def get_parallel_chains(dependencies_map, exclude=None):
         chains = {}
 
 
+def get_chain_duration(chain, durations):
+    known_durations = sorted(durations.values())
+    default_duration = (
+        known_durations[len(known_durations) // 2] if known_durations else 1
+    )
+    return sum(durations.get(name, default_duration) for name in chain)
+
+
+def pack_chains(chains, nodes, durations):
+    """
+    Distributes chains of commands to given number of nodes
+
+    Chains are connected components of the dependency graph and they can't be
+    split, because a command would then invoke its dependencies on more than one
+    node and their records would conflict when merging the data. The longest
+    chains are placed first, each on the node with the least work so far.
+    Commands without a known duration are expected to take the median time.
+    """
+    if nodes < 1:
+        raise ValueError(f"Invalid number of nodes: {nodes}")
+    nodes_chains = [[] for _ in range(nodes)]
+    makespans = [0] * nodes
+    chains = sorted(
+        chains, key=lambda chain: (-get_chain_duration(chain, durations), chain)
+    )
+    for chain in chains:
+        index = makespans.index(min(makespans))
+        nodes_chains[index].extend(chain)
+        makespans[index] += get_chain_duration(chain, durations)
+    return nodes_chains
+
+
+def get_makespans(nodes_chains, durations):
+    return [get_chain_duration(chain, durations) for chain in nodes_chains]
+
+
+def get_nodes_count(chains, durations):
+    """
+    Returns the least number of nodes which can run given chains
+    as fast as if each chain had its own node
+    """
+    if not durations:
+        return len(chains)
+    longest = max(get_chain_duration(chain, durations) for chain in chains)
+    for nodes in range(1, len(chains)):
+        if (
+            max(get_makespans(pack_chains(chains, nodes, durations), durations))
+            <= longest
+        ):
+            return nodes
+    return len(chains)
+
+
+def run_parallel(dependencies_map, run_fn, jobs=None, done=None):
+    """
+    Runs given commands concurrently, in the order given by their dependencies
+
+    Commands are started as soon as all their dependencies are done, at most
+    'jobs' at a time. Those with the most commands depending on them go first.
+    If a command fails, no further commands are started, those already running
+    are waited for, and the first exception is raised.
+    """
+    jobs = jobs or os.cpu_count()
+    done = set(done or [])
+    pending = {
+        name: set(deps) for name, deps in dependencies_map.items() if name not in done
+    }
+    unknown_dependencies = set().union(*pending.values()) - set(dependencies_map)
+    if unknown_dependencies:
+        raise NotImplementedError(
+            f"Unknown dependencies: {', '.join(sorted(unknown_dependencies))}"
+        )
+    dependents_counts = get_dependents_counts(dependencies_map)
+    running = {}
+    exception = None
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            if exception is None:
+                ready = [name for name, deps in pending.items() if deps <= done]
+                ready.sort(key=lambda name: (-dependents_counts[name], name))
+                for name in ready[: jobs - len(running)]:
+                    logger[name].debug("Starting")
+                    del pending[name]
+                    running[executor.submit(run_fn, name)] = name
+            if not running:
+                if exception is None:
+                    raise ValueError(f"Cyclic dependencies: {', '.join(pending)}")
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger[name].error("Crashed, not starting any other commands")
+                    exception = exception or e
+                else:
+                    done.add(name)
+    if exception:
+        raise exception
+
+
+def run_in_process(sync_id, name, force=False, db_profile=None):
+    # Not skipping dependencies, because by the time the command runs,
+    # they're all recorded as seen and the command would warn about it
+    subprocess.run(
+        [
+            "jg",
+            "sync",
+            "--id",
+            str(sync_id),
+            "--keep-image-templates-cache",
+            "--force" if force else "--no-force",
+            *(["--db-profile", db_profile] if db_profile else []),
+            "--no-notify",
+            name,
+        ],
+        check=True,
+    )
+
+
+def get_dependents_counts(dependencies_map):
+    dependents_map = {name: set() for name in dependencies_map}
+    for name, deps in dependencies_map.items():
+        for dependency_name in deps:
+            dependents_map.setdefault(dependency_name, set()).add(name)
+
+    def collect(name, seen):
+        for dependent_name in dependents_map[name] - seen:
+            seen.add(dependent_name)
+            collect(dependent_name, seen)
+        return seen
+
+    return {name: len(collect(name, set())) for name in dependents_map}
+
+
 def confirm(question, default=True):
     print("\a", end="", flush=True)
     return click.confirm(question, default=default, show_default=True, prompt_suffix="")
@@ -1,15 +1,28 @@
+import copy
 import os
+import pickle
+import time
+import zlib
 from datetime import timedelta
+from typing import AsyncGenerator
 
-from apify_client import ApifyClient
+from apify_client import ApifyClient, ApifyClientAsync
 from apify_shared.consts import ActorJobStatus
+from diskcache import Cache
 
 from jg.coop.lib import loggers
-from jg.coop.lib.cache import cache
+from jg.coop.lib.async_utils import call_async
+from jg.coop.lib.cache import CACHE_DIR, cache, get_cache
 
 
 APIFY_API_KEY = os.environ.get("APIFY_API_KEY")
 
+STREAM_EXPIRE = timedelta(days=1)
+
+# Items get cached in compressed chunks, so that reading them back
+# needs memory just for one chunk, not for the whole dataset
+CHUNK_SIZE = 100
+
 
 logger = loggers.from_path(__file__)
 
@@ -42,3 +55,78 @@ def fetch_data(
     )
     dataset = last_run.dataset()
     return list(dataset.iterate_items())
+
+
+async def stream_data(
+    actor_name: str,
+    token: str | None = None,
+    raise_if_missing: bool = True,
+    api_url: str | None = None,
+    cache_dir: str = CACHE_DIR,
+) -> AsyncGenerator[dict, None]:
+    """
+    Yields items of the last successful run as the pages get downloaded
+
+    Downloaded items get cached in compressed chunks. The cache is used
+    only if the previous download finished, otherwise it starts over.
+    """
+    cache = get_cache(cache_dir)
+    key = f"apify:{actor_name}"
+    chunks_count = await call_async(cache.get, key, retry=True)
+    if chunks_count is not None:
+        logger.debug(f"Reading {chunks_count} cached chunks of {actor_name}")
+        for chunk_no in range(chunks_count):
+            for item in await call_async(load_chunk, cache, f"{key}:{chunk_no}"):
+                yield item
+        return
+
+    client = ApifyClientAsync(token=token or APIFY_API_KEY, api_url=api_url)
+    logger.debug(f"Getting last successful run of {actor_name}")
+    last_run = client.actor(actor_name).last_run(status=ActorJobStatus.SUCCEEDED)
+    run_info = await last_run.get()
+    if run_info is None:
+        if raise_if_missing:
+            raise RuntimeError(f"No successful runs of {actor_name!r} found")
+        logger.error(f"No successful runs of {actor_name!r} found")
+        return
+
+    run_url = (
+        f"https://console.apify.com/actors/{run_info['actId']}/runs/{run_info['id']}"
+    )
+    logger.debug(
+        f"Last successful run of {actor_name}: {run_url}, "
+        f"finished {run_info['finishedAt']}, "
+        f"took {run_info['stats']['runTimeSecs']}s"
+    )
+    started_at = time.monotonic()
+    chunks_count = 0
+    chunk = []
+    async for item in last_run.dataset().iterate_items():
+        # The consumer may change the item before the chunk gets stored
+        chunk.append(copy.deepcopy(item))
+        yield item
+        if len(chunk) == CHUNK_SIZE:
+            await call_async(store_chunk, cache, f"{key}:{chunks_count}", chunk)
+            chunks_count += 1
+            chunk = []
+    if chunk:
+        await call_async(store_chunk, cache, f"{key}:{chunks_count}", chunk)
+        chunks_count += 1
+
+    # Chunks expire no sooner than the count, as they were stored later
+    expire_s = STREAM_EXPIRE.total_seconds() - (time.monotonic() - started_at)
+    await call_async(
+        cache.set, key, chunks_count, expire=expire_s, tag="apify", retry=True
+    )
+    logger.debug(f"Cached {chunks_count} chunks of {actor_name}")
+
+
+def store_chunk(cache: Cache, key: str, items: list[dict]) -> None:
+    data = zlib.compress(pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+    cache.set(key, data, expire=STREAM_EXPIRE.total_seconds(), tag="apify", retry=True)
+
+
+def load_chunk(cache: Cache, key: str) -> list[dict]:
+    if (data := cache.get(key, retry=True)) is None:
+        raise RuntimeError(f"Cached chunk {key!r} expired")
+    return pickle.loads(zlib.decompress(data))
@@ -1,6 +1,11 @@
 import asyncio
 from functools import partial, wraps
-from typing import Awaitable, Callable
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+_DONE = object()
 
 
 async def call_async(fn: Callable, *args, **kwargs):
@@ -15,3 +20,36 @@ def make_async(fn: Callable) -> Callable[..., Awaitable]:
         return await call_async(fn, *args, **kwargs)
 
     return wrapper
+
+
+async def merge(*iterables: AsyncIterable[T]) -> AsyncGenerator[T, None]:
+    """
+    Yields values of given async iterables as they come, concurrently
+
+    Iterables don't run ahead of the consumer by more than one value each.
+    """
+    queue = asyncio.Queue(maxsize=len(iterables) or 1)
+
+    async def drain(iterable: AsyncIterable[T]) -> None:
+        try:
+            async for value in iterable:
+                await queue.put((value, None))
+        except Exception as e:
+            await queue.put((None, e))
+        else:
+            await queue.put((_DONE, None))
+
+    tasks = [asyncio.create_task(drain(iterable)) for iterable in iterables]
+    try:
+        remaining_count = len(tasks)
+        while remaining_count:
+            value, exception = await queue.get()
+            if exception is not None:
+                raise exception
+            if value is _DONE:
+                remaining_count -= 1
+            else:
+                yield value
+    finally:
+        for task in tasks:
+            task.cancel()
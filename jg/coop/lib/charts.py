@@ -1,9 +1,11 @@
 import calendar
 import itertools
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from datetime import date, timedelta
 from functools import cache
 from numbers import Number
-from typing import Callable, Generator, Iterable
+from typing import Any, Callable, Generator, Hashable, Iterable
 
 from slugify import slugify
 
@@ -70,6 +72,58 @@ def per_month_breakdown(
     }
 
 
+class Rollup:
+    """
+    Sums of values per day and category, which can be summed over any range
+
+    Built from rows of a query grouped by day and category, so that the
+    source series gets computed once. Each monthly, TTM, or breakdown value
+    is then a difference of prefix sums, found by a binary search.
+    """
+
+    def __init__(self, rows: Iterable[tuple[date, Hashable, Number]]):
+        values = defaultdict(dict)
+        for day, category, value in rows:
+            values[day][category] = values[day].get(category, 0) + value
+        self.days = sorted(values)
+        categories = dict.fromkeys(
+            itertools.chain.from_iterable(values[day] for day in self.days)
+        )
+        self.totals = prefix_sums(sum(values[day].values()) for day in self.days)
+        self.sums = {
+            category: prefix_sums(values[day].get(category, 0) for day in self.days)
+            for category in categories
+        }
+        self.counts = {
+            category: prefix_sums(int(category in values[day]) for day in self.days)
+            for category in categories
+        }
+
+    def sum(self, from_date: date, to_date: date) -> Number:
+        start, end = self._slice(from_date, to_date)
+        return self.totals[end] - self.totals[start]
+
+    def breakdown(self, from_date: date, to_date: date) -> dict[Any, Number]:
+        start, end = self._slice(from_date, to_date)
+        return {
+            category: sums[end] - sums[start]
+            for category, sums in self.sums.items()
+            if self.counts[category][end] - self.counts[category][start]
+        }
+
+    def ptc(self, from_date: date, to_date: date, category: Hashable) -> float:
+        if total := self.sum(from_date, to_date):
+            return (self.breakdown(from_date, to_date).get(category, 0) / total) * 100
+        return 0
+
+    def _slice(self, from_date: date, to_date: date) -> tuple[int, int]:
+        return bisect_left(self.days, from_date), bisect_right(self.days, to_date)
+
+
+def prefix_sums(values: Iterable[Number]) -> list[Number]:
+    return list(itertools.accumulate(values, initial=0))
+
+
 @cache
 def ttm_range(date: date) -> tuple[date, date]:
     try:
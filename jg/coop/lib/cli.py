@@ -1,23 +1,76 @@
+import ast
 import asyncio
 import pkgutil
 import threading
 from functools import wraps
 from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
 from types import ModuleType
-from typing import Awaitable, Callable, Generator
+from typing import Awaitable, Callable
+
+import click
+
+from jg.coop.lib.profiling import profiled
 
 
 def command_name(module_name: str) -> str:
     return module_name.split(".")[-1].replace("_", "-")
 
 
-def load_command(module: ModuleType) -> tuple[str, Callable]:
-    return command_name(module.__name__), module.main
+def find_commands(package: ModuleType) -> dict[str, str]:
+    return {
+        command_name(name): f"{package.__name__}.{name}"
+        for _, name, _ in pkgutil.iter_modules(package.__path__)
+    }
+
+
+def read_dependencies(path: Path) -> list[str]:
+    """
+    Reads dependencies of a sync command without importing its module
+
+    Importing all sync commands just to learn how they depend on each
+    other would be slow, so the decorator of the 'main' function gets
+    parsed from the source code. Dependencies must be a literal list.
+    """
+    tree = ast.parse(path.read_text(), filename=str(path))
+    for node in tree.body:
+        if (
+            isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+            and node.name == "main"
+        ):
+            for decorator in node.decorator_list:
+                if (
+                    isinstance(decorator, ast.Call)
+                    and isinstance(decorator.func, ast.Attribute)
+                    and decorator.func.attr == "sync_command"
+                ):
+                    for keyword in decorator.keywords:
+                        if keyword.arg == "dependencies":
+                            return list(ast.literal_eval(keyword.value))
+    return []
+
+
+def get_module_path(module_name: str) -> Path:
+    return Path(find_spec(module_name).origin)
+
+
+class LazyGroup(click.Group):
+    """Group which imports modules of its commands only when they're needed"""
+
+    def __init__(self, *args, lazy_commands: dict[str, str] | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
 
+    def list_commands(self, context: click.Context) -> list[str]:
+        return sorted(set(super().list_commands(context)) | set(self.lazy_commands))
 
-def import_commands(package: ModuleType) -> Generator[tuple[str, Callable], None, None]:
-    for _, name, _ in pkgutil.iter_modules(package.__path__):
-        yield load_command(import_module(f"{package.__package__}.{name}"))
+    def get_command(self, context: click.Context, name: str) -> click.Command | None:
+        if command := super().get_command(context, name):
+            return command
+        if module_name := self.lazy_commands.get(name):
+            return import_module(module_name).main
+        return None
 
 
 def async_command(fn: Callable[..., Awaitable]) -> Callable:
@@ -25,6 +78,7 @@ def async_command(fn: Callable[..., Awaitable]) -> Callable:
     def wrapper(*args, **kwargs):
         exc = None
 
+        @profiled
         def run():
             try:
                 asyncio.run(fn(*args, **kwargs))
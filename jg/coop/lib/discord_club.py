@@ -8,8 +8,11 @@ from typing import TYPE_CHECKING, AsyncGenerator
 
 import discord
 import emoji
+from diskcache import Cache
 
 from jg.coop.lib import loggers, mutations
+from jg.coop.lib.async_utils import call_async
+from jg.coop.lib.cache import get_cache
 
 
 if TYPE_CHECKING:
@@ -26,6 +29,12 @@ DEFAULT_THREAD_CREATED_AT = datetime(
 
 DEFAULT_CHANNELS_HISTORY_SINCE = timedelta(days=380)
 
+# Discord keeps the same DM channel between the bot and a user, so its ID
+# can be reused across runs instead of asking the API for it every time
+DM_CHANNELS_CACHE_TAG = "discord-dm-channels"
+
+DM_CHANNELS_CACHE_EXPIRE = timedelta(days=180)
+
 MESSAGE_URL_RE = re.compile(
     r"""
         https://discord.com/channels/
@@ -297,17 +306,84 @@ def is_channel_private(channel: discord.abc.GuildChannel | discord.DMChannel) ->
     return not channel.permissions_for(channel.guild.default_role).read_messages
 
 
-async def get_or_create_dm_channel(member: discord.Member) -> None | discord.DMChannel:
+async def get_or_create_dm_channel(
+    member: discord.Member | discord.User,
+    cache: Cache | None = None,
+    verify: bool = True,
+) -> None | discord.DMChannel:
+    """
+    Returns DM channel with given member, asking the API only if necessary
+
+    The ID of the channel is kept in the cache across runs. A channel
+    constructed from the cached ID gets verified by reading its newest
+    message. If it's gone, it's forgotten and the API creates a new one.
+    The caller can skip the verification if it reads the channel anyway,
+    but then it must call this again with verification if it gets 404.
+    """
     if member.dm_channel:
         return member.dm_channel
+
+    cache = get_cache() if cache is None else cache
+    key = f"{DM_CHANNELS_CACHE_TAG}:{member.id}"
+    if channel_id := await call_async(cache.get, key, retry=True):
+        if channel := build_dm_channel(member, channel_id):
+            if not verify:
+                return channel
+            try:
+                await channel.history(limit=1).flatten()
+                return channel
+            except discord.NotFound:
+                logger["users"][member.id].warning(f"DM channel #{channel_id} is gone")
+                await call_async(cache.delete, key, retry=True)
+
     try:
         with mutations.allowing_discord():
-            return await member.create_dm()
+            channel = await member.create_dm()
     except discord.HTTPException as e:
         if e.code == 50007:  # cannot send messages to this user
             logger["users"][member.id].warning(e)
             return None
         raise
+    await call_async(
+        cache.set,
+        key,
+        channel.id,
+        expire=DM_CHANNELS_CACHE_EXPIRE.total_seconds(),
+        tag=DM_CHANNELS_CACHE_TAG,
+        retry=True,
+    )
+    return channel
+
+
+def build_dm_channel(
+    member: discord.Member | discord.User, channel_id: int
+) -> None | discord.DMChannel:
+    # py-cord has no public way to get the state needed to construct a channel,
+    # so if an upgrade changes it, the channel is rather asked from the API.
+    # The channel isn't registered in the state, so a stale one doesn't stick.
+    try:
+        state = member._state
+        return discord.DMChannel(
+            me=state.user,
+            state=state,
+            data=dict(
+                id=channel_id,
+                type=discord.ChannelType.private.value,
+                recipients=[
+                    dict(
+                        id=member.id,
+                        username=member.name,
+                        discriminator=member.discriminator,
+                        global_name=member.global_name,
+                        avatar=member.avatar.key if member.avatar else None,
+                        bot=member.bot,
+                    )
+                ],
+            ),
+        )
+    except (AttributeError, KeyError, TypeError):
+        logger["users"][member.id].exception("Could not construct DM channel")
+        return None
 
 
 def is_message_pinning(message: discord.Message) -> bool:
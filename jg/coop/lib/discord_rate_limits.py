@@ -0,0 +1,266 @@
+import asyncio
+import contextvars
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from typing import AsyncGenerator, Callable, Generator, Mapping
+
+import aiohttp
+import discord
+
+from jg.coop.lib import loggers
+
+
+MIN_CONCURRENCY = 1
+
+MAX_CONCURRENCY = 16
+
+INITIAL_CONCURRENCY = 4
+
+# Discord allows 50 requests per second globally, but doesn't send any headers
+# about it, so the limiter keeps a bit of a reserve and counts requests itself
+GLOBAL_LIMIT = 45
+
+GLOBAL_WINDOW_S = 1.0
+
+# Share of requests left in a bucket, below which the concurrency shrinks,
+# and above which it grows
+HEADROOM_LOW = 0.25
+
+HEADROOM_HIGH = 0.5
+
+
+logger = loggers.from_path(__file__)
+
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+@dataclass
+class Bucket:
+    limit: int
+    remaining: int
+    reset_at: float
+
+
+class AdaptiveRateLimiter:
+    """
+    Schedules requests to Discord API so that they don't get rate limited
+
+    Buckets are learned from the rate limit headers of responses. Requests
+    wait until their bucket resets instead of getting 429. Discord shares
+    buckets across routes, which the HTTP client of py-cord doesn't know
+    about, as it locks just per route. The global limit is enforced by
+    counting requests in flight and those which finished within a sliding
+    window.
+
+    Workers crawling channels are admitted by concurrency, which grows
+    while there's headroom, and shrinks when a bucket or the global limit
+    get low, or when a request gets rate limited anyway.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = MIN_CONCURRENCY,
+        max_concurrency: int = MAX_CONCURRENCY,
+        initial_concurrency: int = INITIAL_CONCURRENCY,
+        global_limit: int = GLOBAL_LIMIT,
+        global_window_s: float = GLOBAL_WINDOW_S,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency = initial_concurrency
+        self.global_limit = global_limit
+        self.global_window_s = global_window_s
+        self.clock = clock
+        self.workers_count = 0
+        self.buckets: dict[str, Bucket] = {}
+        self.buckets_hashes: dict[tuple[str, str], str] = {}
+        self.in_flight = Counter()
+        self.finished_at = deque()
+        self.requests_counts = Counter()
+        self.wait_times = Counter()
+        self.rate_limited_count = 0
+        self._condition = asyncio.Condition()
+
+    @contextmanager
+    def installed(self, client: discord.Client) -> Generator[None, None, None]:
+        # py-cord creates its aiohttp session privately at login, without
+        # a way to pass trace configs, and it doesn't expose response headers
+        session = client.http._HTTPClient__session
+        trace_config = self.trace_config()
+        request = client.http.request
+        session._trace_configs.append(trace_config)
+        client.http.request = self.wrap(request)
+        try:
+            yield
+        finally:
+            client.http.request = request
+            session._trace_configs.remove(trace_config)
+
+    def wrap(self, request):
+        @wraps(request)
+        async def wrapper(route, *args, **kwargs):
+            route_key = f"{route.method} {route.path}"
+            major = f"{route.channel_id}:{route.guild_id}:{route.webhook_id}"
+            async with self.request(route_key, major):
+                return await request(route, *args, **kwargs)
+
+        return wrapper
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        async def on_request_end(session, context, params):
+            await self.observe(params.response.status, params.response.headers)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.freeze()
+        return trace_config
+
+    @asynccontextmanager
+    async def worker(self) -> AsyncGenerator[None, None]:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.workers_count < self.concurrency
+            )
+            self.workers_count += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.workers_count -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def request(
+        self, route_key: str, major: str = ""
+    ) -> AsyncGenerator[None, None]:
+        started_at = self.clock()
+        async with self._condition:
+            while (wait_s := self.get_wait_time(route_key, major)) is not None:
+                if wait_s:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), wait_s)
+                    except TimeoutError:
+                        pass
+                else:
+                    await self._condition.wait()
+            self.in_flight[route_key, major] += 1
+        self.requests_counts[route_key] += 1
+        self.wait_times[route_key] += self.clock() - started_at
+
+        token = current_request.set((route_key, major))
+        try:
+            yield
+        finally:
+            current_request.reset(token)
+            async with self._condition:
+                self.in_flight[route_key, major] -= 1
+                self.finished_at.append(self.clock())
+                self._condition.notify_all()
+
+    def get_wait_time(self, route_key: str, major: str = "") -> float | None:
+        """
+        Returns for how long the request should wait, None if it can go
+
+        Zero means waiting until another request of the bucket finishes.
+        Until the bucket of a route is known, its requests go one by one.
+        """
+        now = self.clock()
+        while self.finished_at and self.finished_at[0] <= now - self.global_window_s:
+            self.finished_at.popleft()
+        if self.get_global_count() >= self.global_limit:
+            if self.finished_at:
+                return self.finished_at[0] + self.global_window_s - now
+            return 0
+
+        try:
+            bucket_hash = self.buckets_hashes[route_key, major]
+        except KeyError:
+            return 0 if self.in_flight[route_key, major] else None
+        bucket = self.buckets[f"{bucket_hash}:{major}"]
+        if now >= bucket.reset_at:
+            bucket.remaining = bucket.limit
+        in_flight = sum(
+            self.in_flight[key]
+            for key, hash in self.buckets_hashes.items()
+            if hash == bucket_hash and key[1] == major
+        )
+        if bucket.remaining - in_flight > 0:
+            return None
+        return max(0, bucket.reset_at - now)
+
+    def get_global_count(self) -> int:
+        # Requests count against the window when they finish, which is surely
+        # after the API counted them. Until then, they count as in flight.
+        return len(self.finished_at) + self.in_flight.total()
+
+    def get_headroom(self, bucket: Bucket | None) -> float:
+        headroom = 1 - (self.get_global_count() / self.global_limit)
+        if bucket:
+            return min(headroom, bucket.remaining / bucket.limit)
+        return headroom
+
+    async def observe(
+        self,
+        status: int,
+        headers: Mapping[str, str],
+        route_key: str | None = None,
+        major: str = "",
+    ) -> None:
+        if route_key is None:
+            if not (request := current_request.get()):
+                return
+            route_key, major = request
+        async with self._condition:
+            bucket = self.update_bucket(route_key, major, headers)
+            if status == 429:
+                self.rate_limited_count += 1
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                logger.warning(
+                    f"Rate limited at {route_key}, concurrency lowered to {self.concurrency}"
+                )
+            else:
+                headroom = self.get_headroom(bucket)
+                if headroom < HEADROOM_LOW:
+                    self.concurrency = max(self.min_concurrency, self.concurrency - 1)
+                elif headroom > HEADROOM_HIGH:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._condition.notify_all()
+
+    def update_bucket(
+        self, route_key: str, major: str, headers: Mapping[str, str]
+    ) -> Bucket | None:
+        try:
+            bucket_hash = headers["X-RateLimit-Bucket"]
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_after = float(headers["X-RateLimit-Reset-After"])
+        except (KeyError, ValueError):
+            return None
+        self.buckets_hashes[route_key, major] = bucket_hash
+        now = self.clock()
+        bucket_id = f"{bucket_hash}:{major}"
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None or now >= bucket.reset_at:
+            bucket = Bucket(
+                limit=limit, remaining=remaining, reset_at=now + reset_after
+            )
+            self.buckets[bucket_id] = bucket
+        else:
+            # responses can come out of order, the lowest number is the most recent
+            bucket.remaining = min(bucket.remaining, remaining)
+        return bucket
+
+    def log_stats(self, logger: loggers.Logger = logger) -> None:
+        logger.info(
+            f"Made {self.requests_counts.total()} requests, "
+            f"{self.rate_limited_count} rate limited, "
+            f"final concurrency {self.concurrency}"
+        )
+        for route_key, wait_s in self.wait_times.most_common(5):
+            logger.info(
+                f"Waited {wait_s:.1f}s in total before {self.requests_counts[route_key]} requests to {route_key}"
+            )
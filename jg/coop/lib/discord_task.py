@@ -1,10 +1,18 @@
 import asyncio
 import os
 import threading
-from typing import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Coroutine, Generator
 
-from jg.coop.lib import loggers
-from jg.coop.lib.discord_club import ClubClient
+from jg.coop.lib import loggers, profiling
+from jg.coop.lib.profiling import profiled, profiled_call
+
+
+# Importing Discord is slow, so it's imported only when connecting
+if TYPE_CHECKING:
+    from jg.coop.lib.discord_club import ClubClient
 
 
 DISCORD_API_KEY = os.getenv("DISCORD_API_KEY") or None
@@ -12,6 +20,118 @@ DISCORD_API_KEY = os.getenv("DISCORD_API_KEY") or None
 
 logger = loggers.from_path(__file__)
 
+_session = None
+
+
+class Session:
+    """
+    Discord client connected once and shared by all tasks run within
+
+    The client connects on the first task, so that commands which don't
+    use Discord don't wait for it. It runs in a separate thread with its
+    own async loop, to which the tasks get submitted.
+    """
+
+    def __init__(self, client_cls: type["ClubClient"] | None = None):
+        self.client_cls = client_cls
+        self.client = None
+        self.connect_time_s = None
+        self.tasks_count = 0
+        self._thread = None
+        self._start_future = None
+        self._lock = threading.Lock()
+
+    def run(self, task_fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        check_async(task_fn)
+        with self._lock:
+            if self.client is None:
+                self.connect()
+            self.tasks_count += 1
+        coroutine = task_fn(self.client, *args, **kwargs)
+        if profiling.get_dir():
+            coroutine = profiled_task(coroutine)
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.client.loop)
+        return future.result()
+
+    def connect(self) -> None:
+        logger.debug("Connecting shared Discord client")
+        time_start = perf_counter()
+        if self.client_cls is None:
+            from jg.coop.lib.discord_club import ClubClient
+
+            self.client_cls = ClubClient
+        loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=loop.run_forever, daemon=True)
+        self._thread.start()
+
+        client = self.client_cls(loop=loop)
+        self._start_future = asyncio.run_coroutine_threadsafe(
+            client.start(DISCORD_API_KEY), loop
+        )
+        ready_future = asyncio.run_coroutine_threadsafe(client.wait_until_ready(), loop)
+        wait([self._start_future, ready_future], return_when=FIRST_COMPLETED)
+        if not ready_future.done():
+            ready_future.cancel()
+            try:
+                self._start_future.result()  # raises
+            finally:
+                self.client = client
+                self.close()
+            raise RuntimeError("Discord client stopped before it got ready")
+
+        self.client = client
+        self.connect_time_s = perf_counter() - time_start
+        logger.debug(f"Discord connection ready in {self.connect_time_s:.1f}s")
+
+    def close(self) -> None:
+        if self.client is None:
+            return
+        loop = self.client.loop
+        logger.debug("Closing shared Discord client")
+        asyncio.run_coroutine_threadsafe(self.client.close(), loop).result()
+        wait([self._start_future])
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+        self.client = None
+
+        if self.tasks_count > 1:
+            saved_s = (self.tasks_count - 1) * self.connect_time_s
+            logger.info(
+                f"Discord connection shared by {self.tasks_count} tasks, "
+                f"saved {saved_s:.1f}s on connection setup"
+            )
+
+
+async def profiled_task(coroutine: Coroutine) -> Any:
+    # Tasks run in the thread of the shared client, which the profiler
+    # of the command can't see
+    with profiled_call():
+        return await coroutine
+
+
+@contextmanager
+def session(
+    client_cls: type["ClubClient"] | None = None,
+) -> Generator[Session, None, None]:
+    """Shares a single Discord client by all tasks run within"""
+    global _session
+    _session = Session(client_cls)
+    try:
+        yield _session
+    finally:
+        try:
+            _session.close()
+        finally:
+            _session = None
+
+
+def check_async(task_fn: Callable[..., Awaitable]) -> None:
+    if not asyncio.iscoroutinefunction(task_fn):
+        raise TypeError(
+            f"Not async function: {task_fn.__qualname__} from {task_fn.__module__}"
+        )
+
 
 def run(task_fn: Callable[..., Awaitable], *args, **kwargs) -> None:
     """
@@ -19,14 +139,18 @@ def run(task_fn: Callable[..., Awaitable], *args, **kwargs) -> None:
 
     Separate process is used so that it's possible to run multiple one-time
     async tasks independently on each other, in separate async loops.
+    If there's a session, the function runs with its shared client instead.
     """
+    if _session:
+        _session.run(task_fn, *args, **kwargs)
+        return
+
     exc = None
 
+    @profiled
     def _discord_thread(task_fn: Callable[..., Awaitable], args, kwargs) -> None:
-        if not asyncio.iscoroutinefunction(task_fn):
-            raise TypeError(
-                f"Not async function: {task_fn.__qualname__} from {task_fn.__module__}"
-            )
+        check_async(task_fn)
+        from jg.coop.lib.discord_club import ClubClient
 
         class Client(ClubClient):
             async def on_ready(self):
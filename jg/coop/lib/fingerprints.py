@@ -0,0 +1,91 @@
+import hashlib
+import sqlite3
+import sys
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from diskcache.core import DBNAME
+from peewee import SQL, Model, OperationalError, fn
+
+from jg.coop.lib.cache import get_cache
+
+
+def fingerprint(
+    files: Iterable[str] = (),
+    tables: Iterable[Model] = (),
+    cache_tags: Iterable[str] = (),
+    params: dict[str, Any] | None = None,
+    fn: Callable | None = None,
+    dependencies: Iterable[str | None] = (),
+) -> str:
+    """
+    Computes a fingerprint of everything a sync command reads
+
+    Covers contents of files matching given glob patterns, row counts and
+    last row IDs of given tables, entries of the cache with given tags,
+    command parameters, the source code of the module where the command
+    is defined, and fingerprints of commands which produce the tables.
+    """
+    hash = hashlib.sha256()
+    if fn:
+        hash.update(b"sources")
+        update_files(hash, get_module_sources(fn))
+    hash.update(b"files")
+    update_files(hash, sorted(set(glob_files(files))))
+    hash.update(b"tables")
+    for model in tables:
+        update_table(hash, model)
+    hash.update(b"cache_tags")
+    for tag in cache_tags:
+        update_cache_tag(hash, tag)
+    hash.update(b"params")
+    hash.update(repr(sorted((params or {}).items())).encode())
+    hash.update(b"dependencies")
+    hash.update(repr(list(dependencies)).encode())
+    return hash.hexdigest()
+
+
+def glob_files(patterns: Iterable[str], cwd: Path | None = None) -> Iterable[Path]:
+    cwd = cwd or Path.cwd()
+    for pattern in patterns:
+        for path in cwd.glob(pattern):
+            if path.is_file():
+                yield path
+
+
+def get_module_sources(fn: Callable) -> list[Path]:
+    path = Path(sys.modules[fn.__module__].__file__)
+    if path.name == "__init__.py":
+        return sorted(path.parent.glob("**/*.py"))
+    return [path]
+
+
+def update_files(hash, paths: Iterable[Path]) -> None:
+    for path in paths:
+        hash.update(str(path).encode())
+        hash.update(path.read_bytes())
+
+
+def update_table(hash, model: Model) -> None:
+    # Reading all rows of big tables on every run would be slow. The count
+    # and the last row ID change as rows get added. Rows changed in place,
+    # or a table rebuilt with the same number of rows, show up only through
+    # the fingerprint of the command which produces the table
+    hash.update(model._meta.table_name.encode())
+    try:
+        row = model.select(fn.COUNT(SQL("*")), fn.MAX(SQL("rowid"))).tuples().get()
+        hash.update(repr(row).encode())
+    except OperationalError:
+        hash.update(b"missing")
+
+
+def update_cache_tag(hash, tag: str) -> None:
+    hash.update(tag.encode())
+    db_path = Path(get_cache().directory) / DBNAME
+    with closing(sqlite3.connect(db_path)) as connection:
+        rows = connection.execute(
+            "SELECT key, store_time FROM Cache WHERE tag = ? ORDER BY key", [tag]
+        )
+        for row in rows:
+            hash.update(repr(row).encode())
@@ -1,7 +1,10 @@
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import unicodedata
+from dataclasses import dataclass
 from datetime import timedelta
 from functools import lru_cache
 
@@ -30,6 +33,26 @@ logger = loggers.from_path(__file__)
 limit = asyncio.Semaphore(4)
 
 
+@dataclass
+class Stats:
+    requests_count: int = 0
+    calls_count: int = 0
+    coalesced_count: int = 0
+
+    @property
+    def saved_count(self) -> int:
+        return self.requests_count - self.calls_count
+
+
+stats = Stats()
+
+_in_flight: dict[str, asyncio.Future] = {}
+
+# Hashes of content for which the LLM got actually asked, as opposed
+# to reading the reply from cache. Retries of the same call add nothing.
+_asked: set[str] = set()
+
+
 @lru_cache
 def get_client() -> AsyncOpenAI:
     logger.debug("Creating OpenAI client")
@@ -43,6 +66,65 @@ retry_defaults = dict(
 )
 
 
+async def ask_for_json(system_prompt: str, user_prompt: str) -> dict:
+    """
+    Asks LLM once for every distinct content of the prompts
+
+    Prompts which differ only in case or whitespace share the cached reply.
+    If a request for the same content is already in flight, waits for its
+    reply instead of asking again.
+    """
+    stats.requests_count += 1
+    content_hash = hash_content(system_prompt, user_prompt)
+    if future := _in_flight.get(content_hash):
+        stats.coalesced_count += 1
+        logger.debug(f"Waiting for reply to the same content {content_hash}")
+        return dict(await asyncio.shield(future))
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[content_hash] = future
+    try:
+        data = await fetch_json(content_hash, system_prompt, user_prompt)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # prevents warnings if no request waits for the reply
+        raise
+    else:
+        future.set_result(data)
+        return data
+    finally:
+        del _in_flight[content_hash]
+        if content_hash in _asked:
+            _asked.remove(content_hash)
+            stats.calls_count += 1
+
+
+def normalize_content(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def hash_content(*texts: str) -> str:
+    content = "\n\n".join(normalize_content(text) for text in texts)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def reset_stats() -> None:
+    global stats
+    stats = Stats()
+
+
+def log_stats(logger: loggers.Logger = logger) -> None:
+    logger.info(
+        f"Requested {stats.requests_count} replies, "
+        f"asked LLM {stats.calls_count} times, "
+        f"saved {stats.saved_count} calls "
+        f"({stats.coalesced_count} waited for the same content in flight)"
+    )
+
+
 @mutates("openai", raises=True)
 @retry(
     retry=(
@@ -68,10 +150,11 @@ retry_defaults = dict(
     wait=wait_random_exponential(min=60, max=5 * 60),
     **retry_defaults,
 )
-@cache(expire=timedelta(days=60), tag="llm-opinion")
-async def ask_for_json(system_prompt: str, user_prompt: str) -> dict:
+@cache(expire=timedelta(days=60), tag="llm-opinion", ignore=(1, 2))
+async def fetch_json(content_hash: str, system_prompt: str, user_prompt: str) -> dict:
     client = get_client()
     async with limit:
+        _asked.add(content_hash)
         completion = await client.chat.completions.create(
             model=OPENAI_MODEL,
             messages=[
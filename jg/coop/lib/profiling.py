@@ -0,0 +1,112 @@
+import cProfile
+import os
+import pstats
+import shutil
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Generator
+
+from jg.coop.lib import global_state, loggers
+
+
+PROFILES_DIR = ".profiles"
+
+
+logger = loggers.from_path(__file__)
+
+_profilers = {}
+
+_local = threading.local()
+
+
+def enable(profiles_dir: str | Path = PROFILES_DIR) -> None:
+    # Stored in the global state, so that child processes know about it
+    global_state.set("profiling_dir", str(Path(profiles_dir).absolute()))
+
+
+def get_dir() -> Path | None:
+    if profiles_dir := global_state.get("profiling_dir"):
+        return Path(profiles_dir)
+    return None
+
+
+@contextmanager
+def profiling(name: str) -> Generator[None, None, None]:
+    """
+    Profiles the code within as a command of given name
+
+    All code decorated with @profiled, running in threads or processes
+    while the command runs, gets profiled as well. When the command
+    finishes, all profiles get merged into a single pstats file.
+    """
+    profiles_dir = get_dir()
+    if not profiles_dir:
+        yield
+        return
+
+    parts_dir = profiles_dir / name
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    parts_dir.mkdir(parents=True)
+    global_state.set("profiling_command", name)
+    try:
+        with profiled_call():
+            yield
+    finally:
+        global_state.set("profiling_command", None)
+        for key in [key for key in _profilers if key[0] == name]:
+            del _profilers[key]
+        path = profiles_dir / f"{name}.pstats"
+        merge(parts_dir, path)
+        logger[name].info(f"Profile saved to {path}")
+
+
+def profiled(fn: Callable) -> Callable:
+    """
+    Profiles the function if a command is being profiled
+
+    Suitable for targets of threads or workers of process pools,
+    because their code can't be seen by the profiler of the main thread.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with profiled_call():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def profiled_call() -> Generator[None, None, None]:
+    name = global_state.get("profiling_command")
+    pid, thread_id = os.getpid(), threading.get_ident()
+
+    # Nested calls are already covered by the active profiler. Thread locals
+    # are copied to forked processes, hence the check for process ID.
+    if not name or getattr(_local, "active_pid", None) == pid:
+        yield
+        return
+
+    # Workers of a pool can process many items, so their profiles accumulate
+    # and get saved after each call. Pools terminate their workers, so there's
+    # no chance to save them at exit.
+    key = (name, pid, thread_id)
+    profiler = _profilers.setdefault(key, cProfile.Profile())
+    _local.active_pid = pid
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _local.active_pid = None
+        profiler.dump_stats(get_dir() / name / f"{pid}-{thread_id}.pstats")
+
+
+def merge(parts_dir: Path, path: Path) -> None:
+    parts_paths = sorted(parts_dir.glob("*.pstats"))
+    if parts_paths:
+        stats = pstats.Stats(*map(str, parts_paths))
+        stats.dump_stats(path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
@@ -0,0 +1,140 @@
+import math
+from datetime import datetime, timedelta
+from typing import Iterable, TypedDict
+
+from diskcache import Cache
+
+from jg.coop.lib.cache import get_cache
+
+
+CACHE_TAG = "sync-history"
+
+MAX_RECORDS = 100
+
+EXPIRE = timedelta(days=365)
+
+REGRESSION_THRESHOLD_PTC = 50
+
+REGRESSION_MIN_DIFF = timedelta(seconds=30)
+
+BASELINE_SIZE = 10
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+
+class Record(TypedDict):
+    sync_id: str
+    recorded_at: str
+    time_diff: int
+
+
+class Stats(TypedDict):
+    count: int
+    last: int
+    p50: float
+    p90: float
+    baseline: float | None
+    change_ptc: float | None
+    is_regression: bool
+    trend: str
+
+
+def record(
+    name: str,
+    sync_id: str,
+    time_diff: int,
+    now: datetime | None = None,
+    cache: Cache | None = None,
+) -> None:
+    """Appends the duration of a finished command to its history"""
+    cache = get_cache() if cache is None else cache
+    item = Record(
+        sync_id=str(sync_id),
+        recorded_at=(now or datetime.now()).isoformat(),
+        time_diff=time_diff,
+    )
+    with cache.transact(retry=True):
+        records = cache.get(f"{CACHE_TAG}:{name}", default=[], retry=True)
+        records = (records + [item])[-MAX_RECORDS:]
+        cache.set(
+            f"{CACHE_TAG}:{name}",
+            records,
+            expire=EXPIRE.total_seconds(),
+            tag=CACHE_TAG,
+            retry=True,
+        )
+
+
+def load(names: Iterable[str], cache: Cache | None = None) -> dict[str, list[Record]]:
+    cache = get_cache() if cache is None else cache
+    history = {
+        name: cache.get(f"{CACHE_TAG}:{name}", default=[], retry=True)
+        for name in sorted(names)
+    }
+    return {name: records for name, records in history.items() if records}
+
+
+def percentile(values: Iterable[int | float], ptc: int | float) -> float:
+    values = sorted(values)
+    if not values:
+        raise ValueError("No values")
+    position = (len(values) - 1) * ptc / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def median_durations(history: dict[str, list[Record]]) -> dict[str, float]:
+    return {
+        name: percentile(
+            [record["time_diff"] for record in records[-BASELINE_SIZE:]], 50
+        )
+        for name, records in history.items()
+    }
+
+
+def get_stats(
+    records: list[Record],
+    threshold_ptc: int | float = REGRESSION_THRESHOLD_PTC,
+    min_diff: timedelta = REGRESSION_MIN_DIFF,
+) -> Stats:
+    """
+    Summarizes history of a command
+
+    The last duration is compared to the median of the runs preceding it.
+    It is a regression if it's slower by more than the given percentage
+    and also by more than the given time, so that commands taking just
+    a few seconds don't get reported because of noise.
+    """
+    durations = [record["time_diff"] for record in records]
+    last = durations[-1]
+    previous = durations[:-1][-BASELINE_SIZE:]
+    if previous:
+        baseline = percentile(previous, 50)
+        change_ptc = ((last - baseline) * 100 / baseline) if baseline else None
+        is_regression = (
+            change_ptc is not None
+            and change_ptc > threshold_ptc
+            and (last - baseline) > min_diff.total_seconds() * 1_000_000_000
+        )
+    else:
+        baseline, change_ptc, is_regression = None, None, False
+    return Stats(
+        count=len(durations),
+        last=last,
+        p50=percentile(durations, 50),
+        p90=percentile(durations, 90),
+        baseline=baseline,
+        change_ptc=change_ptc,
+        is_regression=is_regression,
+        trend=sparkline(durations[-BASELINE_SIZE:]),
+    )
+
+
+def sparkline(values: list[int | float]) -> str:
+    low, high = min(values), max(values)
+    if low == high:
+        return SPARKS[0] * len(values)
+    return "".join(
+        SPARKS[round((value - low) * (len(SPARKS) - 1) / (high - low))]
+        for value in values
+    )
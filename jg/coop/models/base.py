@@ -1,16 +1,22 @@
 import asyncio
 import json
+import re
 import sqlite3
+import threading
+from collections import Counter
 from collections.abc import Set
+from contextlib import contextmanager
 from enum import Enum
 from functools import wraps
 from pathlib import Path
-from typing import Iterable
+from time import perf_counter_ns
+from typing import Any, Generator, Iterable, Self
 
 from czech_sort import bytes_key as czech_sort_key
 from peewee import (
     Check,
     ConnectionContext as BaseConnectionContext,
+    Field,
     Model,
     Node,
     SqliteDatabase as BaseSqliteDatabase,
@@ -22,6 +28,35 @@ from jg.coop.lib import loggers
 
 DB_FILE = Path("jg/coop/data/data.db")
 
+N_PLUS_ONE_THRESHOLD = 100
+
+BULK_BATCH_SIZE = 500
+
+SQLITE_MAX_VARIABLES = 32766
+
+PRAGMAS_PROFILES = {
+    # Safe for any use, suitable for read-heavy web builds. In WAL mode,
+    # the 'normal' synchronous setting can't corrupt the database.
+    "default": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "cache_size": -64_000,  # 64 MB
+        "mmap_size": 268_435_456,  # 256 MB
+        "temp_store": "memory",
+        "wal_autocheckpoint": 1_000,
+    },
+    # Fast writes for syncs. Their data can be lost if the machine crashes,
+    # but a crashed sync needs to be re-run anyway.
+    "bulk": {
+        "journal_mode": "wal",
+        "synchronous": "off",
+        "cache_size": -256_000,  # 256 MB
+        "mmap_size": 1_073_741_824,  # 1 GB
+        "temp_store": "memory",
+        "wal_autocheckpoint": 10_000,
+    },
+}
+
 
 logger = loggers.from_path(__file__)
 
@@ -44,12 +79,101 @@ class ConnectionContext(BaseConnectionContext):
         return super().__call__(fn)
 
 
+class QueryStats:
+    """Counts and times SQL statements, grouped by their normalized form"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.times = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, time_ns: int) -> None:
+        statement = normalize_sql(sql)
+        with self._lock:
+            self.counts[statement] += 1
+            self.times[statement] += time_ns
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def time_s(self) -> float:
+        return sum(self.times.values()) / 1_000_000_000
+
+    def most_common(self, n: int | None = None) -> list[tuple[str, int]]:
+        return self.counts.most_common(n)
+
+    def n_plus_one(
+        self, threshold: int = N_PLUS_ONE_THRESHOLD
+    ) -> list[tuple[str, int]]:
+        # Inserts of many rows in batches, each in a transaction, repeat
+        # the same statements, but that's how BulkWriter avoids N+1
+        return [
+            (statement, count)
+            for statement, count in self.most_common()
+            if count > threshold and not is_batch_statement(statement)
+        ]
+
+
 class SqliteDatabase(BaseSqliteDatabase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._query_stats = []
+
     def connection_context(self):
         return ConnectionContext(self)
 
+    def use_pragmas_profile(self, name: str) -> None:
+        """Applies pragmas of given profile to current and future connections"""
+        pragmas = PRAGMAS_PROFILES[name]
+        self._pragmas = list({**dict(self._pragmas), **pragmas}.items())
+        if not self.is_closed():
+            for key, value in pragmas.items():
+                self.pragma(key, value)
 
-db = SqliteDatabase(DB_FILE, pragmas={"journal_mode": "wal"})
+    @contextmanager
+    def pragmas_profile(self, name: str) -> Generator[None, None, None]:
+        """Applies pragmas of given profile within, then restores the previous ones"""
+        pragmas = dict(self._pragmas)
+        self.use_pragmas_profile(name)
+        try:
+            yield
+        finally:
+            self._pragmas = list(pragmas.items())
+            if not self.is_closed():
+                for key in PRAGMAS_PROFILES[name]:
+                    if key in pragmas:
+                        self.pragma(key, pragmas[key])
+
+    def execute_sql(self, sql, params=None, commit=None):
+        if not self._query_stats:
+            return super().execute_sql(sql, params, commit)
+        time_start = perf_counter_ns()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            time_diff = perf_counter_ns() - time_start
+            for query_stats in self._query_stats:
+                query_stats.record(sql, time_diff)
+
+    @contextmanager
+    def count_queries(self) -> Generator[QueryStats, None, None]:
+        """
+        Collects statistics about the SQL statements executed within
+
+        The time covers execution of the statements, not iterating
+        over their results.
+        """
+        query_stats = QueryStats()
+        self._query_stats.append(query_stats)
+        try:
+            yield query_stats
+        finally:
+            self._query_stats.remove(query_stats)
+
+
+db = SqliteDatabase(DB_FILE, pragmas=PRAGMAS_PROFILES["default"])
 
 
 db.func("czech_sort")(czech_sort_key)
@@ -63,6 +187,92 @@ class BaseModel(Model):
         self._dirty = set()
 
 
+class BulkWriter:
+    """
+    Buffers rows of given model and inserts them in batches
+
+    Each batch is a single INSERT statement executed in a transaction,
+    which is much faster than creating or saving the rows one by one.
+    Rows can be dicts or unsaved model instances. Conflicting rows are
+    either ignored, or updated as specified by 'preserve' (fields to take
+    from the inserted row) and 'update' (arbitrary expressions, which can
+    refer to the inserted row using peewee's EXCLUDED).
+    """
+
+    def __init__(
+        self,
+        model: type[Model],
+        batch_size: int = BULK_BATCH_SIZE,
+        conflict_target: list[Field] | None = None,
+        preserve: list[Field] | None = None,
+        update: dict[Field, Any] | None = None,
+        ignore: bool = False,
+    ):
+        if ignore and (preserve or update):
+            raise ValueError("Conflicting rows can't be both ignored and updated")
+        self.model = model
+        self.batch_size = batch_size
+        self.conflict_target = conflict_target
+        self.preserve = preserve
+        self.update = update
+        self.ignore = ignore
+        self.count = 0
+        self._rows = []
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def add(self, row: dict[str, Any] | Model) -> None:
+        if isinstance(row, Model):
+            row = model_to_row(row)
+        # Peewee takes columns from the first row and ignores any extra keys
+        # in the rows which follow, thus rows of a batch must be uniform
+        if self._rows and row.keys() != self._rows[0].keys():
+            self.flush()
+        self._rows.append(row)
+        if (
+            len(self._rows) >= self.batch_size
+            or (len(self._rows) + 1) * len(row) > SQLITE_MAX_VARIABLES
+        ):
+            self.flush()
+
+    def add_many(self, rows: Iterable[dict[str, Any] | Model]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        insert = self.model.insert_many(self._rows)
+        if self.ignore:
+            insert = insert.on_conflict_ignore()
+        elif self.preserve or self.update:
+            insert = insert.on_conflict(
+                conflict_target=self.conflict_target,
+                preserve=self.preserve,
+                update=self.update,
+            )
+        with self.model._meta.database.atomic():
+            insert.execute()
+        self.count += len(self._rows)
+        self._rows = []
+
+
+def model_to_row(instance: Model) -> dict[str, Any]:
+    """Turns an unsaved model instance into a row for BulkWriter"""
+    data = instance.__data__
+    primary_key = instance._meta.primary_key
+    return {
+        field.name: data.get(field.name)
+        for field in instance._meta.sorted_fields
+        if field is not primary_key or data.get(field.name) is not None
+    }
+
+
 class JSONField(BaseJSONField):
     def __init__(self, *args, **kwargs):
         kwargs.setdefault("json_dumps", json_dumps)
@@ -83,6 +293,17 @@ def json_dumps(value):
     return json.dumps(value, ensure_ascii=False, default=default)
 
 
+def normalize_sql(sql: str) -> str:
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return re.sub(r"\?(, \?)+", "?, ...", sql)
+
+
+def is_batch_statement(statement: str) -> bool:
+    if re.match(r"(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", statement):
+        return True
+    return bool(re.match(r"(INSERT|REPLACE)\b", statement)) and "), (" in statement
+
+
 def check_enum(field_name: str, enum_cls: Enum) -> Node:
     return check(field_name, (member.value for member in enum_cls))
 
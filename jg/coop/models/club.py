@@ -7,10 +7,13 @@ from operator import attrgetter
 from typing import Iterable, Optional, Self, TypeVar
 
 from peewee import (
+    JOIN,
     BooleanField,
     CharField,
+    DateField,
     DateTimeField,
     ForeignKeyField,
+    Function,
     IntegerField,
     TextField,
     fn,
@@ -94,14 +97,7 @@ class ClubUser(BaseModel):
 
     @property
     def intro(self) -> Optional["ClubMessage"]:
-        return (
-            self.list_public_messages.where(
-                ClubMessage.channel_id == ClubChannelID.INTRO,
-                ClubMessage.type == "default",
-            )
-            .order_by(ClubMessage.created_at.desc())
-            .first()
-        )
+        return self.intro_mapping([self]).get(self.id)
 
     @property
     def list_public_messages(self) -> Iterable["ClubMessage"]:
@@ -118,44 +114,31 @@ class ClubUser(BaseModel):
         self.expires_at = non_empty_max([self.expires_at, expires_at])
 
     def content_size(self, private: bool = False) -> int:
-        list_messages = self.list_messages if private else self.list_public_messages
-        return sum(message.content_size for message in list_messages)
+        return self.content_size_mapping([self], private=private).get(self.id, 0)
 
     def recent_content_size(
         self, today=None, days=RECENT_PERIOD_DAYS, private=False
     ) -> int:
-        messages = self.list_recent_messages(today, days=days, private=private)
-        return sum(message.content_size for message in messages)
+        since = (today or date.today()) - timedelta(days=days)
+        return self.content_size_mapping([self], since=since, private=private).get(
+            self.id, 0
+        )
 
     def messages_count(self, private: bool = False) -> int:
         list_messages = self.list_messages if private else self.list_public_messages
         return list_messages.count()
 
     def upvotes_count(self, private: bool = False) -> int:
-        list_messages = self.list_messages if private else self.list_public_messages
-        messages = list_messages.where(
-            ClubMessage.parent_channel_id.not_in(UPVOTES_EXCLUDE_CHANNELS)
-        )
-        return sum([message.upvotes_count for message in messages])
+        return self.upvotes_count_mapping([self], private=private).get(self.id, 0)
 
     def recent_upvotes_count(self, today=None, private=False) -> int:
-        messages = self.list_recent_messages(today, private=private).where(
-            ClubMessage.parent_channel_id.not_in(UPVOTES_EXCLUDE_CHANNELS)
+        since = (today or date.today()) - timedelta(days=RECENT_PERIOD_DAYS)
+        return self.upvotes_count_mapping([self], since=since, private=private).get(
+            self.id, 0
         )
-        return sum([message.upvotes_count for message in messages])
 
     def first_seen_on(self) -> date:
-        first_message = self.list_messages.order_by(ClubMessage.created_at).first()
-        if not first_message:
-            first_pin = (
-                self.list_pins.join(
-                    ClubMessage, on=(ClubPin.pinned_message == ClubMessage.id)
-                )
-                .order_by(ClubMessage.created_at)
-                .first()
-            )
-            first_message = first_pin.pinned_message if first_pin else None
-        return first_message.created_at.date() if first_message else self.joined_on
+        return self.first_seen_on_mapping([self])[self.id]
 
     def list_recent_messages(
         self, today=None, days=RECENT_PERIOD_DAYS, private=False
@@ -240,6 +223,123 @@ class ClubUser(BaseModel):
     def avatars_listing(cls) -> Iterable[Self]:
         return cls.members_listing().where(cls.avatar_path.is_null(False))
 
+    @classmethod
+    def content_size_mapping(
+        cls,
+        members: Iterable[Self],
+        since: date | None = None,
+        private: bool = False,
+    ) -> dict[int, int]:
+        query = cls._aggregate_messages(
+            members, fn.SUM(ClubMessage.content_size), since=since, private=private
+        )
+        return dict(query.tuples())
+
+    @classmethod
+    def upvotes_count_mapping(
+        cls,
+        members: Iterable[Self],
+        since: date | None = None,
+        private: bool = False,
+    ) -> dict[int, int]:
+        query = cls._aggregate_upvotes(members, since=since, private=private)
+        return dict(query.tuples())
+
+    @classmethod
+    def first_seen_on_mapping(cls, members: Iterable[Self]) -> dict[int, date | None]:
+        members = list(members)
+        first_messages = dict(cls._first_messages(members).tuples())
+        first_pins = {}
+        if members_without_messages := [
+            member for member in members if member.id not in first_messages
+        ]:
+            first_pins = dict(cls._first_pins(members_without_messages).tuples())
+        mapping = {}
+        for member in members:
+            first_seen_at = first_messages.get(member.id) or first_pins.get(member.id)
+            mapping[member.id] = (
+                first_seen_at.date() if first_seen_at else member.joined_on
+            )
+        return mapping
+
+    @classmethod
+    def intro_mapping(cls, members: Iterable[Self]) -> dict[int, "ClubMessage"]:
+        query = (
+            cls._intro_messages(members)
+            .group_by(ClubMessage.author)
+            .having(ClubMessage.created_at == fn.MAX(ClubMessage.created_at))
+        )
+        return {message.author_id: message for message in query}
+
+    # The following queries are shared by the mappings above, which compute
+    # stats of given members, and by ClubMemberStats, which computes them
+    # for all users at once. Without members, they don't filter by author.
+
+    @classmethod
+    def _aggregate_messages(
+        cls,
+        members: Iterable[Self] | None,
+        value: Function,
+        since: date | None = None,
+        private: bool = False,
+    ) -> Iterable["ClubMessage"]:
+        query = ClubMessage.select(
+            ClubMessage.author.alias("user_id"), value.alias("value")
+        ).group_by(ClubMessage.author)
+        if members is not None:
+            query = query.where(
+                ClubMessage.author.in_([member.id for member in members])
+            )
+        if not private:
+            query = query.where(ClubMessage.is_private == False)  # noqa: E712
+        if since:
+            query = query.where(ClubMessage.created_at >= since)
+        return query
+
+    @classmethod
+    def _aggregate_upvotes(
+        cls,
+        members: Iterable[Self] | None,
+        since: date | None = None,
+        private: bool = False,
+    ) -> Iterable["ClubMessage"]:
+        return cls._aggregate_messages(
+            members, fn.SUM(ClubMessage.upvotes_count), since=since, private=private
+        ).where(ClubMessage.parent_channel_id.not_in(UPVOTES_EXCLUDE_CHANNELS))
+
+    @classmethod
+    def _first_messages(cls, members: Iterable[Self] | None) -> Iterable["ClubMessage"]:
+        return cls._aggregate_messages(
+            members, fn.MIN(ClubMessage.created_at), private=True
+        )
+
+    @classmethod
+    def _first_pins(cls, members: Iterable[Self] | None) -> Iterable["ClubPin"]:
+        query = (
+            ClubPin.select(
+                ClubPin.member.alias("user_id"),
+                fn.MIN(ClubMessage.created_at).alias("value"),
+            )
+            .join(ClubMessage, on=(ClubPin.pinned_message == ClubMessage.id))
+            .group_by(ClubPin.member)
+        )
+        if members is not None:
+            query = query.where(ClubPin.member.in_([member.id for member in members]))
+        return query
+
+    @classmethod
+    def _intro_messages(cls, members: Iterable[Self] | None) -> Iterable["ClubMessage"]:
+        query = ClubMessage.select().where(
+            ClubMessage.is_private == False,  # noqa: E712
+            ClubMessage.channel_id == ClubChannelID.INTRO,
+            ClubMessage.type == "default",
+        )
+        if members is not None:
+            query = query.where(
+                ClubMessage.author.in_([member.id for member in members])
+            )
+        return query
+
 
 class ClubMessage(BaseModel):
     id = IntegerField(primary_key=True)
@@ -305,14 +405,19 @@ class ClubMessage(BaseModel):
 
     @classmethod
     def content_size_by_month(cls, date: date) -> int:
-        messages = (
-            cls.select()
-            .where(cls.created_month == f"{date:%Y-%m}")
+        return cls.monthly_content_size([date])[0]
+
+    @classmethod
+    def monthly_content_size(cls, months: Iterable[date]) -> list[int]:
+        sizes = dict(
+            cls.select(cls.created_month, fn.SUM(cls.content_size))
             .where(cls.author_is_bot == False)  # noqa: E712
             .where(cls.is_private == False)  # noqa: E712
             .where(cls.channel_id.not_in(STATS_EXCLUDE_CHANNELS))
+            .group_by(cls.created_month)
+            .tuples()
         )
-        return sum(message.content_size for message in messages)
+        return [sizes.get(f"{month:%Y-%m}", 0) for month in months]
 
     @classmethod
     def listing(cls) -> Iterable[Self]:
@@ -368,6 +473,15 @@ class ClubMessage(BaseModel):
             .order_by(cls.created_at.desc())
         )
 
+    @classmethod
+    def forum_comments_count_mapping(cls, channel_id: int) -> dict[int, int]:
+        return dict(
+            cls.select(cls.channel_id, fn.COUNT(cls.id) - 1)
+            .where(cls.channel_id != channel_id, cls.parent_channel_id == channel_id)
+            .group_by(cls.channel_id)
+            .tuples()
+        )
+
     @classmethod
     def digest_listing(cls, since: datetime, limit: int = 5) -> Iterable[Self]:
         return (
@@ -469,6 +583,126 @@ class ClubPin(BaseModel):
         )
 
 
+class ClubChannelMark(BaseModel):
+    """Newest crawled message of a channel, so that next crawl can continue"""
+
+    channel_id = IntegerField(primary_key=True)
+    message_id = IntegerField()
+
+    @classmethod
+    def get_message_id(cls, channel_id: int) -> int | None:
+        if mark := cls.get_or_none(cls.channel_id == channel_id):
+            return mark.message_id
+        return None
+
+    @classmethod
+    def record(cls, channel_id: int, message_id: int) -> None:
+        cls.insert(channel_id=channel_id, message_id=message_id).on_conflict(
+            action="update",
+            update={cls.message_id: fn.MAX(cls.message_id, message_id)},
+            conflict_target=[cls.channel_id],
+        ).execute()
+
+
+class ClubMemberStats(BaseModel):
+    """
+    Statistics of users' activity in the club, computed all at once
+
+    Same as what the respective methods of ClubUser compute per user,
+    but aggregated by a single query for all users.
+    """
+
+    user = ForeignKeyField(ClubUser, primary_key=True, backref="_stats")
+    content_size = IntegerField(default=0)
+    recent_content_size = IntegerField(default=0)
+    upvotes_count = IntegerField(default=0)
+    recent_upvotes_count = IntegerField(default=0)
+    has_intro = BooleanField(default=False)
+    first_seen_on = DateField(null=True)
+
+    def is_new(self, today=None) -> bool:
+        if self.first_seen_on is None:
+            return False
+        return (self.first_seen_on + timedelta(days=IS_NEW_PERIOD_DAYS)) >= (
+            today or date.today()
+        )
+
+    @classmethod
+    def compute(cls, today=None, days=RECENT_PERIOD_DAYS) -> int:
+        recent_period_start_at = (today or date.today()) - timedelta(days=days)
+        content_sizes = ClubUser._aggregate_messages(
+            None, fn.SUM(ClubMessage.content_size)
+        ).alias("content_sizes")
+        recent_content_sizes = ClubUser._aggregate_messages(
+            None, fn.SUM(ClubMessage.content_size), since=recent_period_start_at
+        ).alias("recent_content_sizes")
+        upvotes = ClubUser._aggregate_upvotes(None).alias("upvotes")
+        recent_upvotes = ClubUser._aggregate_upvotes(
+            None, since=recent_period_start_at
+        ).alias("recent_upvotes")
+        intros = (
+            ClubUser._intro_messages(None)
+            .select(ClubMessage.author.alias("user_id"))
+            .group_by(ClubMessage.author)
+            .alias("intros")
+        )
+        first_messages = ClubUser._first_messages(None).alias("first_messages")
+        first_pins = ClubUser._first_pins(None).alias("first_pins")
+        query = ClubUser.select(
+            ClubUser.id,
+            fn.COALESCE(content_sizes.c.value, 0),
+            fn.COALESCE(recent_content_sizes.c.value, 0),
+            fn.COALESCE(upvotes.c.value, 0),
+            fn.COALESCE(recent_upvotes.c.value, 0),
+            intros.c.user_id.is_null(False),
+            fn.DATE(
+                fn.COALESCE(
+                    first_messages.c.value,
+                    first_pins.c.value,
+                    ClubUser.joined_at,
+                )
+            ),
+        )
+        for subquery in [
+            content_sizes,
+            recent_content_sizes,
+            upvotes,
+            recent_upvotes,
+            intros,
+            first_messages,
+            first_pins,
+        ]:
+            query = query.join(
+                subquery,
+                JOIN.LEFT_OUTER,
+                on=(subquery.c.user_id == ClubUser.id),
+            )
+        return cls.insert_from(
+            query,
+            [
+                cls.user,
+                cls.content_size,
+                cls.recent_content_size,
+                cls.upvotes_count,
+                cls.recent_upvotes_count,
+                cls.has_intro,
+                cls.first_seen_on,
+            ],
+        ).execute()
+
+    @classmethod
+    def members_mapping(cls) -> dict[int, Self]:
+        return {
+            stats.user_id: stats
+            for stats in cls.select()
+            .join(ClubUser)
+            .where(
+                ClubUser.is_bot == False,  # noqa: E712
+                ClubUser.is_member == True,  # noqa: E712
+            )
+        }
+
+
 def non_empty_min(values: Iterable[T | None]) -> T | None:
     values = list(filter(None, values))
     if values:
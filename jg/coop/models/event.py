@@ -1,5 +1,6 @@
 import math
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Iterable
 
 import arrow
 from peewee import (
@@ -11,7 +12,7 @@ from peewee import (
     fn,
 )
 
-from jg.coop.lib.charts import month_range, ttm_range
+from jg.coop.lib.charts import Rollup, month_range, ttm_range
 from jg.coop.lib.md import strip_links
 from jg.coop.models.base import BaseModel, JSONField
 from jg.coop.models.club import ClubUser
@@ -114,28 +115,27 @@ class Event(BaseModel):
 
     @classmethod
     def count_by_month(cls, date):
-        from_date, to_date = month_range(date)
-        return (
-            cls.select()
-            .where(
-                fn.date_trunc("day", cls.start_at) >= from_date,
-                fn.date_trunc("day", cls.start_at) <= to_date,
-            )
-            .count()
-        )
+        return cls.monthly_count([date])[0]
 
     @classmethod
     def count_by_month_ttm(cls, date):
-        from_date, to_date = ttm_range(date)
-        return math.ceil(
-            cls.select()
-            .where(
-                fn.date_trunc("day", cls.start_at) >= from_date,
-                fn.date_trunc("day", cls.start_at) <= to_date,
-            )
-            .count()
-            / 12.0
-        )
+        return cls.monthly_count_ttm([date])[0]
+
+    @classmethod
+    def monthly_count(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.rollup()
+        return [rollup.sum(*month_range(month)) for month in months]
+
+    @classmethod
+    def monthly_count_ttm(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.rollup()
+        return [math.ceil(rollup.sum(*ttm_range(month)) / 12.0) for month in months]
+
+    @classmethod
+    def rollup(cls) -> Rollup:
+        day = fn.DATE(cls.start_at).coerce(False)
+        query = cls.select(day, fn.COUNT(cls.id)).group_by(day).tuples()
+        return Rollup((date.fromisoformat(day), None, count) for day, count in query)
 
 
 class EventSpeaking(BaseModel):
@@ -148,8 +148,8 @@ class EventSpeaking(BaseModel):
             cls.select()
             .join(Event)
             .where(
-                fn.date_trunc("day", Event.start_at) >= from_date,
-                fn.date_trunc("day", Event.start_at) <= to_date,
+                fn.DATE(Event.start_at) >= from_date,
+                fn.DATE(Event.start_at) <= to_date,
             )
         )
 
@@ -172,7 +172,21 @@ class EventSpeaking(BaseModel):
 
     @classmethod
     def women_ptc_ttm(cls, date):
-        count = cls.count_ttm(date)
-        if count:
-            return math.ceil((cls.women_count_ttm(date) / count) * 100)
-        return 0
+        return cls.monthly_women_ptc_ttm([date])[0]
+
+    @classmethod
+    def monthly_women_ptc_ttm(cls, months: Iterable[date]) -> list[int]:
+        day = fn.DATE(Event.start_at).coerce(False)
+        query = (
+            cls.select(day, ClubUser.has_feminine_name, fn.COUNT(cls.id))
+            .join(Event)
+            .switch(cls)
+            .join(ClubUser)
+            .group_by(day, ClubUser.has_feminine_name)
+            .tuples()
+        )
+        rollup = Rollup(
+            (date.fromisoformat(day), has_feminine_name, count)
+            for day, has_feminine_name, count in query
+        )
+        return [math.ceil(rollup.ptc(*ttm_range(month), True)) for month in months]
@@ -1,11 +1,13 @@
 import json
+from contextlib import contextmanager
 from datetime import date
-from typing import Iterable, Self
+from typing import Generator, Iterable, Self
 
-from peewee import Case, CharField, IntegerField
+from peewee import EXCLUDED, Case, CharField, IntegerField
 from playhouse.shortcuts import model_to_dict
 
-from jg.coop.models.base import BaseModel
+from jg.coop.lib.charts import per_month_breakdown
+from jg.coop.models.base import BaseModel, BulkWriter
 
 
 class Followers(BaseModel):
@@ -16,11 +18,23 @@ class Followers(BaseModel):
     name = CharField()
     count = IntegerField()
 
+    _pivot = None
+
     @classmethod
-    def deserialize(cls, line: str) -> Self | None:
-        data = json.loads(line)
-        if data["count"] is not None:
-            return cls.add(**data)
+    def deserialize_many(cls, lines: Iterable[str]) -> int:
+        update = {
+            cls.count: Case(
+                None, [(cls.count < EXCLUDED.count, EXCLUDED.count)], cls.count
+            )
+        }
+        with BulkWriter(
+            cls, conflict_target=[cls.month, cls.name], update=update
+        ) as writer:
+            for line in lines:
+                data = json.loads(line)
+                if data["count"] is not None:
+                    writer.add(data)
+        return writer.count
 
     def serialize(self) -> str:
         data = model_to_dict(self, exclude=[self.__class__.id])
@@ -52,12 +66,40 @@ class Followers(BaseModel):
             .get()
         )
 
+    @classmethod
+    def pivot(cls) -> dict[str, dict[str, int]]:
+        if cls._pivot is not None:
+            return cls._pivot
+        pivot = {}
+        for month, name, count in cls.select(cls.month, cls.name, cls.count).tuples():
+            pivot.setdefault(month, {})[name] = count
+        return pivot
+
+    @classmethod
+    @contextmanager
+    def pivot_cache(cls) -> Generator[None, None, None]:
+        cls._pivot = cls.pivot()
+        try:
+            yield
+        finally:
+            cls._pivot = None
+
     @classmethod
     def breakdown(cls, date: date) -> dict[str, int]:
-        breakdown = {name: None for name in cls.names()}
-        for followers in cls.select().where(cls.month == f"{date:%Y-%m}"):
-            breakdown[followers.name] = followers.count
-        return breakdown
+        return cls.breakdown_pivot(cls.pivot(), date)
+
+    @classmethod
+    def monthly_breakdown(cls, months: Iterable[date]) -> dict[str, list[int]]:
+        pivot = cls.pivot()
+        return per_month_breakdown(
+            lambda month: cls.breakdown_pivot(pivot, month), months
+        )
+
+    @staticmethod
+    def breakdown_pivot(pivot: dict[str, dict[str, int]], date: date) -> dict[str, int]:
+        names = sorted({name for counts in pivot.values() for name in counts})
+        counts = pivot.get(f"{date:%Y-%m}", {})
+        return {name: counts.get(name) for name in names}
 
     @classmethod
     def names(cls) -> list[str]:
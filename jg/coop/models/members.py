@@ -1,12 +1,12 @@
-import itertools
 import json
+from contextlib import contextmanager
 from datetime import date
-from typing import Iterable, Self
+from typing import Generator, Iterable, Self
 
-from peewee import CharField, IntegerField
+from peewee import Case, CharField, IntegerField, fn
 from playhouse.shortcuts import model_to_dict
 
-from jg.coop.models.base import BaseModel, check
+from jg.coop.models.base import BaseModel, BulkWriter, check
 from jg.coop.models.club import SubscriptionType
 
 
@@ -32,9 +32,15 @@ class Members(BaseModel):
     name = CharField(constraints=[check("name", NAMES)])
     count = IntegerField()
 
+    _pivot = None
+
     @classmethod
-    def deserialize(cls, line: str) -> Self | None:
-        return cls.record(**json.loads(line))
+    def deserialize_many(cls, lines: Iterable[str]) -> int:
+        with BulkWriter(
+            cls, conflict_target=[cls.month, cls.name], preserve=[cls.count]
+        ) as writer:
+            writer.add_many(map(json.loads, lines))
+        return writer.count
 
     def serialize(self) -> str:
         data = model_to_dict(self, exclude=[self.__class__.id])
@@ -53,13 +59,36 @@ class Members(BaseModel):
     def history(cls) -> Iterable[Self]:
         return cls.select().order_by(cls.month, cls.name)
 
+    @classmethod
+    def pivot(cls) -> dict[str, dict[str, int | None]]:
+        if cls._pivot is not None:
+            return cls._pivot
+        query = (
+            cls.select(
+                cls.month,
+                *[
+                    fn.MAX(Case(None, [(cls.name == name, cls.count)])).alias(name)
+                    for name in NAMES
+                ],
+            )
+            .group_by(cls.month)
+            .dicts()
+        )
+        return {row.pop("month"): row for row in query}
+
+    @classmethod
+    @contextmanager
+    def pivot_cache(cls) -> Generator[None, None, None]:
+        cls._pivot = cls.pivot()
+        try:
+            yield
+        finally:
+            cls._pivot = None
+
     @classmethod
     def per_month(cls, name: str, months: Iterable[date]) -> list[int]:
-        counts = {
-            row.month: row.count
-            for row in cls.select().where(cls.name == name).order_by(cls.month)
-        }
-        return [counts.get(month.strftime("%Y-%m"), None) for month in months]
+        pivot = cls.pivot()
+        return [pivot.get(month.strftime("%Y-%m"), {}).get(name) for month in months]
 
     @classmethod
     def monthly_members(cls, months: Iterable[date]) -> list[int]:
@@ -89,14 +118,12 @@ class Members(BaseModel):
     def monthly_subscription_types_breakdown(
         cls, months: Iterable[date]
     ) -> dict[str, list[int]]:
-        subscription_types = set(
-            itertools.chain.from_iterable(
-                cls.select(cls.name)
-                .where(cls.name.startswith(SUBSCRIPTION_TYPES_PREFIX))
-                .distinct()
-                .tuples()
-            )
-        )
+        subscription_types = {
+            name
+            for counts in cls.pivot().values()
+            for name, count in counts.items()
+            if name.startswith(SUBSCRIPTION_TYPES_PREFIX) and count is not None
+        }
         return {
             name.removeprefix(SUBSCRIPTION_TYPES_PREFIX): cls.per_month(name, months)
             for name in subscription_types
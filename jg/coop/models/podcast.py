@@ -1,10 +1,11 @@
 import math
 from datetime import date, datetime, time
+from typing import Iterable
 from zoneinfo import ZoneInfo
 
-from peewee import BooleanField, CharField, DateField, IntegerField
+from peewee import BooleanField, CharField, DateField, IntegerField, fn
 
-from jg.coop.lib.charts import ttm_range
+from jg.coop.lib.charts import Rollup, ttm_range
 from jg.coop.models.base import BaseModel
 
 
@@ -121,7 +122,17 @@ class PodcastEpisode(BaseModel):
 
     @classmethod
     def women_ptc_ttm(cls, date):
-        count = cls.guests_count_ttm(date)
-        if count:
-            return math.ceil((cls.women_count_ttm(date) / count) * 100)
-        return 0
+        return cls.monthly_women_ptc_ttm([date])[0]
+
+    @classmethod
+    def monthly_women_ptc_ttm(cls, months: Iterable[date]) -> list[int]:
+        query = (
+            cls.select(
+                cls.publish_on, cls.guest_has_feminine_name, fn.COUNT(cls.number)
+            )
+            .where(cls.guest_name.is_null(False))
+            .group_by(cls.publish_on, cls.guest_has_feminine_name)
+            .tuples()
+        )
+        rollup = Rollup(query)
+        return [math.ceil(rollup.ptc(*ttm_range(month), True)) for month in months]
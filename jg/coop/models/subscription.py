@@ -11,7 +11,7 @@ from peewee import (
     fn,
 )
 
-from jg.coop.lib.charts import month_range
+from jg.coop.lib.charts import Rollup, month_range, per_month_breakdown
 from jg.coop.models.base import BaseModel, check_enum
 from jg.coop.models.club import ClubUser
 
@@ -122,12 +122,26 @@ class SubscriptionCancellation(BaseModel):
 
     @classmethod
     def breakdown_ptc(cls, date: date) -> dict[str, float]:
-        from_date, to_date = month_range(date)
-        query = cls.select().where(
-            cls.expires_on >= from_date, cls.expires_on <= to_date
+        return {
+            reason: values[0]
+            for reason, values in cls.monthly_breakdown_ptc([date]).items()
+        }
+
+    @classmethod
+    def monthly_breakdown_ptc(cls, months: Iterable[date]) -> dict[str, list[float]]:
+        rollup = Rollup(
+            cls.select(cls.expires_on, cls.reason, fn.COUNT(cls.account_id))
+            .where(cls.expires_on.is_null(False))
+            .group_by(cls.expires_on, cls.reason)
+            .tuples()
+        )
+        return per_month_breakdown(
+            lambda month: get_breakdown_ptc(
+                Counter(rollup.breakdown(*month_range(month))),
+                SubscriptionCancellationReason,
+            ),
+            months,
         )
-        counter = Counter([cancellation.reason for cancellation in query])
-        return get_breakdown_ptc(counter, SubscriptionCancellationReason)
 
     @classmethod
     def total_breakdown_ptc(cls) -> dict[str, float]:
@@ -57,3 +57,26 @@ class SyncCommand(BaseModel):
     @property
     def time_diff_min(self):
         return self.time_diff / 60000000000
+
+
+class SyncFingerprint(BaseModel):
+    name = CharField(primary_key=True)
+    fingerprint = CharField()
+
+    @classmethod
+    def get_fingerprint(cls, name):
+        cls.create_table()
+        try:
+            return cls.get_by_id(name).fingerprint
+        except cls.DoesNotExist:
+            return None
+
+    @classmethod
+    def record(cls, name, fingerprint):
+        cls.create_table()
+        cls.insert(name=name, fingerprint=fingerprint).on_conflict_replace().execute()
+
+    @classmethod
+    def forget(cls, name):
+        cls.create_table()
+        cls.delete_by_id(name)
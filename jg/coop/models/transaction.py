@@ -1,14 +1,13 @@
-import functools
 import json
 import math
 from datetime import date
 from enum import StrEnum, unique
 from typing import Iterable, Self
 
-from peewee import CharField, DateField, IntegerField
+from peewee import CharField, DateField, IntegerField, fn
 from playhouse.shortcuts import model_to_dict
 
-from jg.coop.lib.charts import month_range, ttm_range
+from jg.coop.lib.charts import Rollup, month_range, per_month_breakdown, ttm_range
 from jg.coop.models.base import BaseModel, check_enum
 
 
@@ -82,62 +81,64 @@ class Transaction(BaseModel):
         )
 
     @classmethod
-    def revenue(cls, date):
-        return sum(
-            transaction.amount for transaction in cls.incomes(*month_range(date))
+    def expenses(cls, from_date, to_date):
+        return cls.listing(from_date, to_date).where(
+            (cls.amount < 0) | (cls.category == "tax")
         )
 
     @classmethod
-    def revenue_ttm(cls, date):
-        return math.ceil(
-            sum(transaction.amount for transaction in cls.incomes(*ttm_range(date)))
-            / 12.0
+    def incomes_rollup(cls) -> Rollup:
+        return cls._rollup((cls.amount >= 0) & (cls.category != "tax"))
+
+    @classmethod
+    def expenses_rollup(cls) -> Rollup:
+        return cls._rollup((cls.amount < 0) | (cls.category == "tax"))
+
+    @classmethod
+    def _rollup(cls, condition) -> Rollup:
+        return Rollup(
+            cls.select(cls.happened_on, cls.category, fn.SUM(cls.amount))
+            .where(condition)
+            .group_by(cls.happened_on, cls.category)
+            .tuples()
         )
 
+    @classmethod
+    def revenue(cls, date):
+        return cls.monthly_revenue([date])[0]
+
+    @classmethod
+    def revenue_ttm(cls, date):
+        return cls.monthly_revenue_ttm([date])[0]
+
     @classmethod
     def revenue_breakdown(cls, date):
-        return sum_by_category(cls.incomes(*month_range(date)))
+        return cls.incomes_rollup().breakdown(*month_range(date))
 
     @classmethod
     def revenue_ttm_breakdown(cls, date):
         return {
             category: math.ceil(value / 12)
-            for category, value in sum_by_category(
-                cls.incomes(*ttm_range(date))
-            ).items()
+            for category, value in cls.incomes_rollup()
+            .breakdown(*ttm_range(date))
+            .items()
         }
 
-    @classmethod
-    def expenses(cls, from_date, to_date):
-        return cls.listing(from_date, to_date).where(
-            (cls.amount < 0) | (cls.category == "tax")
-        )
-
     @classmethod
     def cost(cls, date):
-        return -1 * sum(
-            transaction.amount for transaction in cls.expenses(*month_range(date))
-        )
+        return cls.monthly_cost([date])[0]
 
     @classmethod
     def cost_ttm(cls, date):
-        return math.ceil(
-            (
-                -1
-                * sum(
-                    transaction.amount for transaction in cls.expenses(*ttm_range(date))
-                )
-            )
-            / 12.0
-        )
+        return cls.monthly_cost_ttm([date])[0]
 
     @classmethod
     def cost_breakdown(cls, date):
         return {
             category: -1 * value
-            for category, value in sum_by_category(
-                cls.expenses(*month_range(date))
-            ).items()
+            for category, value in cls.expenses_rollup()
+            .breakdown(*month_range(date))
+            .items()
         }
 
     @classmethod
@@ -148,11 +149,62 @@ class Transaction(BaseModel):
     def profit_ttm(cls, date):
         return cls.revenue_ttm(date) - cls.cost_ttm(date)
 
+    @classmethod
+    def monthly_revenue(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.incomes_rollup()
+        return [rollup.sum(*month_range(month)) for month in months]
+
+    @classmethod
+    def monthly_revenue_ttm(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.incomes_rollup()
+        return [math.ceil(rollup.sum(*ttm_range(month)) / 12.0) for month in months]
+
+    @classmethod
+    def monthly_revenue_breakdown(cls, months: Iterable[date]) -> dict[str, list[int]]:
+        rollup = cls.incomes_rollup()
+        return per_month_breakdown(
+            lambda month: rollup.breakdown(*month_range(month)), months
+        )
+
+    @classmethod
+    def monthly_cost(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.expenses_rollup()
+        return [-1 * rollup.sum(*month_range(month)) for month in months]
+
+    @classmethod
+    def monthly_cost_ttm(cls, months: Iterable[date]) -> list[int]:
+        rollup = cls.expenses_rollup()
+        return [
+            math.ceil((-1 * rollup.sum(*ttm_range(month))) / 12.0) for month in months
+        ]
+
+    @classmethod
+    def monthly_cost_breakdown(cls, months: Iterable[date]) -> dict[str, list[int]]:
+        rollup = cls.expenses_rollup()
+        return per_month_breakdown(
+            lambda month: {
+                category: -1 * value
+                for category, value in rollup.breakdown(*month_range(month)).items()
+            },
+            months,
+        )
 
-def sum_by_category(transactions):
-    def reduce_step(mapping, transaction):
-        mapping.setdefault(transaction.category, 0)
-        mapping[transaction.category] += transaction.amount
-        return mapping
+    @classmethod
+    def monthly_profit(cls, months: Iterable[date]) -> list[int]:
+        months = list(months)
+        return [
+            revenue - cost
+            for revenue, cost in zip(
+                cls.monthly_revenue(months), cls.monthly_cost(months)
+            )
+        ]
 
-    return functools.reduce(reduce_step, transactions, {})
+    @classmethod
+    def monthly_profit_ttm(cls, months: Iterable[date]) -> list[int]:
+        months = list(months)
+        return [
+            revenue - cost
+            for revenue, cost in zip(
+                cls.monthly_revenue_ttm(months), cls.monthly_cost_ttm(months)
+            )
+        ]
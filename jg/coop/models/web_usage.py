@@ -1,7 +1,9 @@
 from datetime import date
+from typing import Iterable
 
 from peewee import CharField, DateField, IntegerField
 
+from jg.coop.lib.charts import per_month_breakdown
 from jg.coop.models.base import BaseModel
 
 
@@ -29,3 +31,21 @@ class WebUsage(BaseModel):
                 breakdown[usage.product_slug], usage.pageviews
             )
         return breakdown
+
+    @classmethod
+    def monthly_breakdown(cls, months: Iterable[date]) -> dict[str, list[int]]:
+        products = cls.products()
+        breakdowns = {}
+        for usage in cls.select():
+            breakdown = breakdowns.setdefault(
+                usage.month_starts_on, dict.fromkeys(products, 0)
+            )
+            breakdown[usage.product_slug] = max(
+                breakdown[usage.product_slug], usage.pageviews
+            )
+        return per_month_breakdown(
+            lambda month: breakdowns.get(
+                month.replace(day=1), dict.fromkeys(products, 0)
+            ),
+            months,
+        )
@@ -7,7 +7,7 @@ import requests
 
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
-from jg.coop.models.base import db
+from jg.coop.models.base import BulkWriter, db
 from jg.coop.models.blog import BlogArticle
 
 
@@ -27,10 +27,13 @@ def main(feed_url: str):
     articles = feedparser.parse(response.content).entries
     articles = sorted(articles, key=attrgetter("published"), reverse=True)
 
-    for article in articles:
-        logger.info(f"Saving blog article: {article.link}")
-        BlogArticle.create(
-            title=article.title,
-            url=article.link,
-            published_on=date(*article.published_parsed[:3]),
-        )
+    with BulkWriter(BlogArticle) as writer:
+        for article in articles:
+            logger.info(f"Saving blog article: {article.link}")
+            writer.add(
+                dict(
+                    title=article.title,
+                    url=article.link,
+                    published_on=date(*article.published_parsed[:3]),
+                )
+            )
@@ -3,7 +3,7 @@ import requests
 
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
-from jg.coop.models.base import db
+from jg.coop.models.base import BulkWriter, db
 from jg.coop.models.candidate import Candidate, CandidateProject
 from jg.coop.models.club import ClubUser
 
@@ -22,20 +22,26 @@ def main(api_url: str):
     response = requests.get(api_url)
     response.raise_for_status()
 
-    for candidate_item in response.json()["items"]:
-        logger.debug(f"Candidate {candidate_item!r}")
-        discord_id = candidate_item.pop("discord_id", None)
-        projects_items = candidate_item.pop("projects", [])
-
-        candidate = Candidate.create(is_member=False, **candidate_item)
-        if user := ClubUser.get_or_none(discord_id):
-            candidate.user = user
-            candidate.is_member = user.is_member
-            candidate.save()
-            logger.info(f"Saved {candidate!r} ( ↔ {user!r})")
-        else:
-            logger.info(f"Saved {candidate!r} (no club user)")
-
-        for project_item in projects_items:
-            CandidateProject.create(candidate=candidate, **project_item)
-        logger.info(f"Saved {len(projects_items)} projects for {candidate!r}")
+    with (
+        BulkWriter(Candidate) as candidates_writer,
+        BulkWriter(CandidateProject) as projects_writer,
+    ):
+        for candidate_item in response.json()["items"]:
+            logger.debug(f"Candidate {candidate_item!r}")
+            discord_id = candidate_item.pop("discord_id", None)
+            projects_items = candidate_item.pop("projects", [])
+
+            candidate = Candidate(is_member=False, **candidate_item)
+            if user := ClubUser.get_or_none(discord_id):
+                candidate.user = user
+                candidate.is_member = user.is_member
+                logger.info(f"Saving {candidate!r} ( ↔ {user!r})")
+            else:
+                logger.info(f"Saving {candidate!r} (no club user)")
+            candidates_writer.add(candidate)
+
+            for project_item in projects_items:
+                projects_writer.add(
+                    CandidateProject(candidate=candidate, **project_item)
+                )
+            logger.info(f"Saving {len(projects_items)} projects for {candidate!r}")
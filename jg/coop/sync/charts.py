@@ -1,12 +1,14 @@
 from datetime import date
 from typing import Any, Callable, NotRequired, TypedDict
 
+import click
+
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import charts, loggers
 from jg.coop.lib.discord_club import DEFAULT_CHANNELS_HISTORY_SINCE
 from jg.coop.models.base import db
 from jg.coop.models.chart import Chart
-from jg.coop.models.club import ClubMessage
+from jg.coop.models.club import ClubMessage, ClubUser
 from jg.coop.models.event import Event, EventSpeaking
 from jg.coop.models.exchange_rate import ExchangeRate
 from jg.coop.models.followers import Followers
@@ -83,29 +85,54 @@ class FloatBreakdownChartDict(ChartDict):
         "subscriptions-country",
         "transactions",
         "web-usage",
-    ]
+    ],
+    input_tables=[
+        ClubMessage,
+        ClubUser,
+        Event,
+        EventSpeaking,
+        ExchangeRate,
+        Followers,
+        Members,
+        Page,
+        PodcastEpisode,
+        SubscriptionCancellation,
+        SubscriptionCountry,
+        SubscriptionInternalReferrer,
+        SubscriptionMarketingSurvey,
+        SubscriptionReferrer,
+        Transaction,
+        WebUsage,
+    ],
+)
+@click.option(
+    "--today",
+    default=lambda: date.today().isoformat(),
+    type=date.fromisoformat,
 )
 @db.connection_context()
-def main():
+def main(today: date):
     Chart.drop_table()
     Chart.create_table()
 
-    today = date.today()
-    for chart_slug, chart_fn in CHARTS.items():
-        logger.info(f"Generating: {chart_slug}")
-        try:
-            chart = chart_fn(today)
-            chart.setdefault("slug", chart_slug)
+    with Members.pivot_cache(), Followers.pivot_cache():
+        for chart_slug, chart_fn in CHARTS.items():
+            logger.info(f"Generating: {chart_slug}")
             try:
-                months = chart.pop("months")
-            except KeyError:
-                pass
-            else:
-                chart.setdefault("labels", charts.labels(months))
-                chart.setdefault("annotations", charts.milestones(months, MILESTONES))
-            Chart.create(**chart)
-        except Exception:
-            logger.exception(f"Failed to generate: {chart_slug}")
+                chart = chart_fn(today)
+                chart.setdefault("slug", chart_slug)
+                try:
+                    months = chart.pop("months")
+                except KeyError:
+                    pass
+                else:
+                    chart.setdefault("labels", charts.labels(months))
+                    chart.setdefault(
+                        "annotations", charts.milestones(months, MILESTONES)
+                    )
+                Chart.create(**chart)
+            except Exception:
+                logger.exception(f"Failed to generate: {chart_slug}")
 
 
 def chart(chart_fn: Callable) -> Callable:
@@ -115,84 +142,84 @@ def chart(chart_fn: Callable) -> Callable:
 @chart
 def profit(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.profit, months)
+    data = Transaction.monthly_profit(months)
     return dict(data=data, months=months)
 
 
 @chart
 def profit_ttm(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.profit_ttm, months)
+    data = Transaction.monthly_profit_ttm(months)
     return dict(data=data, months=months)
 
 
 @chart
 def revenue(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.revenue, months)
+    data = Transaction.monthly_revenue(months)
     return dict(data=data, months=months)
 
 
 @chart
 def revenue_ttm(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.revenue_ttm, months)
+    data = Transaction.monthly_revenue_ttm(months)
     return dict(data=data, months=months)
 
 
 @chart
 def revenue_breakdown(today: date) -> IntBreakdownChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month_breakdown(Transaction.revenue_breakdown, months)
+    data = Transaction.monthly_revenue_breakdown(months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.cost, months)
+    data = Transaction.monthly_cost(months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost_ttm(today: date) -> IntChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.cost_ttm, months)
+    data = Transaction.monthly_cost_ttm(months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost_breakdown(today: date) -> IntBreakdownChartDict:
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month_breakdown(Transaction.cost_breakdown, months)
+    data = Transaction.monthly_cost_breakdown(months)
     return dict(data=data, months=months)
 
 
 @chart
 def events(today: date) -> IntChartDict:
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(Event.count_by_month, months)
+    data = Event.monthly_count(months)
     return dict(data=data, months=months)
 
 
 @chart
 def events_ttm(today: date) -> IntChartDict:
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(Event.count_by_month_ttm, months)
+    data = Event.monthly_count_ttm(months)
     return dict(data=data, months=months)
 
 
 @chart
 def events_women(today: date) -> FloatChartDict:
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(EventSpeaking.women_ptc_ttm, months)
+    data = EventSpeaking.monthly_women_ptc_ttm(months)
     return dict(data=data, months=months)
 
 
 @chart
 def podcast_women(today: date) -> FloatChartDict:
     months = charts.months(PODCAST_BEGIN_ON, today)
-    data = charts.per_month(PodcastEpisode.women_ptc_ttm, months)
+    data = PodcastEpisode.monthly_women_ptc_ttm(months)
     return dict(data=data, months=months)
 
 
@@ -290,7 +317,7 @@ def total_spend_internal_referrer_breakdown(today: date) -> FloatBreakdownChartD
 @chart
 def cancellations_breakdown(today: date) -> IntBreakdownChartDict:
     months = charts.months(SURVEYS_BEGIN_ON, today)
-    data = charts.per_month_breakdown(SubscriptionCancellation.breakdown_ptc, months)
+    data = SubscriptionCancellation.monthly_breakdown_ptc(months)
     count = SubscriptionCancellation.count()
     return dict(data=data, months=months, count=count)
 
@@ -344,7 +371,7 @@ def club_content(today: date) -> IntChartDict:
         charts.next_month(today - DEFAULT_CHANNELS_HISTORY_SINCE),
         charts.previous_month(today),
     )
-    data = charts.per_month(ClubMessage.content_size_by_month, months)
+    data = ClubMessage.monthly_content_size(months)
     return dict(data=data, months=months)
 
 
@@ -371,21 +398,21 @@ def handbook_notes(today: date) -> IntChartDict:
 @chart
 def followers_breakdown(today: date) -> IntBreakdownChartDict:
     months = charts.months(*Followers.months_range())
-    data = charts.per_month_breakdown(Followers.breakdown, months)
+    data = Followers.monthly_breakdown(months)
     return dict(data=data, months=months)
 
 
 @chart
 def web_usage_total(today: date) -> ChartDict:
     months = charts.months(*WebUsage.months_range())
-    breakdown = charts.per_month_breakdown(WebUsage.breakdown, months)
+    breakdown = WebUsage.monthly_breakdown(months)
     return dict(data=breakdown.pop("total"), months=months)
 
 
 @chart
 def web_usage_breakdown(today: date) -> IntBreakdownChartDict:
     months = charts.months(*WebUsage.months_range())
-    breakdown = charts.per_month_breakdown(WebUsage.breakdown, months)
+    breakdown = WebUsage.monthly_breakdown(months)
     del breakdown["total"]
     return dict(data=breakdown, months=months)
 
@@ -403,7 +430,7 @@ def web_club_conversion(today: date) -> FloatChartDict:
         )
         for (count_trials, count_visits) in zip(
             Members.monthly_trials(months),
-            [WebUsage.breakdown(month).get("club") for month in months],
+            WebUsage.monthly_breakdown(months).get("club", [None] * len(months)),
         )
     ]
     return dict(data=data, months=months)
@@ -414,7 +441,7 @@ def logo_impressions_breakdown(today: date) -> IntBreakdownChartDict:
     product_names = ["home", "courses", "handbook"]
     months = charts.months(*WebUsage.months_range())
     months_len = len(months)
-    web_usage_breakdown = charts.per_month_breakdown(WebUsage.breakdown, months)
+    web_usage_breakdown = WebUsage.monthly_breakdown(months)
     web_usage_breakdown_items = sorted(
         web_usage_breakdown.items(), key=lambda item: position(product_names, item[0])
     )
@@ -1,6 +1,7 @@
 import logging
 from pprint import pformat
 
+import click
 from discord import DiscordServerError
 from tenacity import (
     before_sleep_log,
@@ -13,8 +14,15 @@ from tenacity import (
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import discord_task, loggers
 from jg.coop.models.base import db
-from jg.coop.models.club import ClubMessage, ClubPin, ClubUser
+from jg.coop.models.club import (
+    ClubChannelMark,
+    ClubMemberStats,
+    ClubMessage,
+    ClubPin,
+    ClubUser,
+)
 from jg.coop.sync.club_content.crawler import crawl
+from jg.coop.sync.club_content.store import reset_users
 
 
 logger = loggers.from_path(__file__)
@@ -28,14 +36,27 @@ logger = loggers.from_path(__file__)
     before_sleep=before_sleep_log(logger, logging.WARNING),
 )
 @cli.sync_command()
-def main():
+@click.option(
+    "--full/--incremental",
+    default=False,
+    help="Crawl all history instead of continuing where the previous crawl ended.",
+)
+def main(full: bool):
+    tables = [ClubMessage, ClubUser, ClubPin, ClubChannelMark, ClubMemberStats]
     with db.connection_context():
-        db.drop_tables([ClubMessage, ClubUser, ClubPin])
-        db.create_tables([ClubMessage, ClubUser, ClubPin])
+        if full:
+            logger.info("Crawling all history")
+            db.drop_tables(tables)
+        db.create_tables(tables)
+        reset_users()
 
-    discord_task.run(crawl)
+    discord_task.run(crawl, full)
 
     with db.connection_context():
+        logger.info("Computing members' stats")
+        ClubMemberStats.delete().execute()
+        ClubMemberStats.compute()
+
         stats = dict(
             messages=ClubMessage.count(),
             users=ClubUser.count(),
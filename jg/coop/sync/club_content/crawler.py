@@ -2,8 +2,9 @@ import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import AsyncGenerator
 
-from discord import DMChannel, Member, Message, Reaction, User
+from discord import DMChannel, Member, Message, NotFound, Reaction, User
 from discord.abc import GuildChannel
+from discord.utils import snowflake_time
 
 from jg.coop.lib import loggers
 from jg.coop.lib.discord_club import (
@@ -16,21 +17,28 @@ from jg.coop.lib.discord_club import (
     get_channel_name,
     get_or_create_dm_channel,
     get_parent_channel,
+    is_channel_dm,
     is_member,
     is_thread_after,
 )
+from jg.coop.lib.discord_rate_limits import AdaptiveRateLimiter
 from jg.coop.sync.club_content.store import (
-    store_dm_channel,
-    store_member,
-    store_message,
-    store_pin,
+    DatabaseWriter,
+    forget_channels_except,
+    forget_messages,
+    get_channel_mark,
+    get_pins,
 )
 
 
 logger = loggers.from_path(__file__)
 
 
-WORKERS_COUNT = 6
+PINS_CONCURRENCY = 4
+
+# Incremental crawl downloads again also messages this old, so that
+# it notices recent edits, deletions, or changes in reactions
+HISTORY_RESCAN_PERIOD = timedelta(days=7)
 
 CHANNELS_HISTORY_SINCE = {
     ClubChannelID.FUN: timedelta(days=30),
@@ -54,114 +62,210 @@ CHANNELS_SKIP = [
 ]
 
 
-async def crawl(client: ClubClient) -> None:
-    logger.info("Crawling members")
-    members = []
-    tasks = []
-    async for member in client.club_guild.fetch_members(limit=None):
-        members.append(member)
-        tasks.append(asyncio.create_task(store_member(member)))
-    await asyncio.gather(*tasks)
-
-    logger.info("Crawling club channels")
-    queue = asyncio.Queue()
-    for channel in client.club_guild.channels:
-        if (
-            channel.type != "category"
-            and channel.permissions_for(client.club_guild.me).read_messages
-        ):
-            if channel.id not in CHANNELS_SKIP:
-                queue.put_nowait(channel)
-            else:
-                logger.debug(
-                    f"Skipping channel #{channel.id} {get_channel_name(channel)!r}"
-                )
-
-    workers = [
-        asyncio.create_task(channel_worker(worker_no, queue))
-        for worker_no in range(WORKERS_COUNT)
-    ]
-
-    logger.info("Adding DM channels")
-    dm_tasks = [
-        asyncio.create_task(crawl_dm_channel(queue, member)) for member in members
-    ]
+async def crawl(client: ClubClient, full: bool = True) -> None:
+    limiter = AdaptiveRateLimiter()
+    with limiter.installed(client):
+        await crawl_with_limiter(client, limiter, full)
+    limiter.log_stats()
+
+
+async def crawl_with_limiter(
+    client: ClubClient, limiter: AdaptiveRateLimiter, full: bool
+) -> None:
+    async with DatabaseWriter() as writer:
+        logger.info("Crawling members")
+        members = []
+        async for member in client.club_guild.fetch_members(limit=None):
+            members.append(member)
+            await writer.store_member(member)
+
+        logger.info("Crawling club channels")
+        queue = asyncio.Queue()
+        for channel in client.club_guild.channels:
+            if (
+                channel.type != "category"
+                and channel.permissions_for(client.club_guild.me).read_messages
+            ):
+                if channel.id not in CHANNELS_SKIP:
+                    queue.put_nowait(channel)
+                else:
+                    logger.debug(
+                        f"Skipping channel #{channel.id} {get_channel_name(channel)!r}"
+                    )
+
+        channels_ids = set()
+        workers = [
+            asyncio.create_task(
+                channel_worker(worker_no, queue, writer, limiter, channels_ids, full)
+            )
+            for worker_no in range(limiter.max_concurrency)
+        ]
 
-    # trick to prevent hangs if workers raise, see https://stackoverflow.com/a/60710981/325365
-    queue_completed = asyncio.create_task(queue.join())
-    await asyncio.wait([queue_completed, *workers], return_when=asyncio.FIRST_COMPLETED)
+        logger.info("Adding DM channels")
+        dm_tasks = [
+            asyncio.create_task(crawl_dm_channel(queue, writer, member))
+            for member in members
+        ]
 
-    # if there's a worker which raised
-    if not queue_completed.done():
-        workers_done = [worker for worker in workers if worker.done()]
-        logger.warning(
-            f"Some workers ({len(workers_done)} of {WORKERS_COUNT}) finished before the queue is done!"
+        # trick to prevent hangs if workers raise, see https://stackoverflow.com/a/60710981/325365
+        queue_completed = asyncio.create_task(queue.join())
+        await asyncio.wait(
+            [queue_completed, writer.task, *workers],
+            return_when=asyncio.FIRST_COMPLETED,
         )
-        workers_done[0].result()  # raises
 
-    # cancel workers which are still runnning
-    for worker in workers:
-        worker.cancel()
+        # if there's a worker or the writer which raised
+        if not queue_completed.done():
+            if writer.task.done():
+                logger.warning("Writer finished before the queue is done!")
+                writer.task.result()  # raises
+            workers_done = [worker for worker in workers if worker.done()]
+            logger.warning(
+                f"Some workers ({len(workers_done)} of {len(workers)}) finished before the queue is done!"
+            )
+            workers_done[0].result()  # raises
 
-    # return_exceptions=True silently collects CancelledError() exceptions
-    await asyncio.gather(*dm_tasks, *workers, return_exceptions=True)
+        # cancel workers which are still runnning
+        for worker in workers:
+            worker.cancel()
 
+        # return_exceptions=True silently collects CancelledError() exceptions
+        await asyncio.gather(*dm_tasks, *workers, return_exceptions=True)
 
-async def crawl_dm_channel(queue: asyncio.Queue, member: Member) -> None:
-    channel = await get_or_create_dm_channel(member)
+    logger.info(f"Crawled {len(channels_ids)} channels")
+    await forget_channels_except(channels_ids)
+
+
+async def crawl_dm_channel(
+    queue: asyncio.Queue, writer: DatabaseWriter, member: Member
+) -> None:
+    # The channel gets read right away, which verifies it
+    channel = await get_or_create_dm_channel(member, verify=False)
     if channel:
         logger["channels"].debug(
             f"Adding DM channel #{channel.id} for member {channel.recipient.display_name!r}"
         )
         queue.put_nowait(channel)
-        await store_dm_channel(channel)
+        await writer.store_dm_channel(channel)
 
 
-async def channel_worker(worker_no, queue) -> None:
+async def channel_worker(worker_no, queue, writer, limiter, channels_ids, full) -> None:
     logger_cw = logger[worker_no]["channels"]
     while True:
         channel = await queue.get()
-        logger_c = get_channel_logger(logger_cw, channel)
-        logger_c.info(f"Crawling {get_channel_name(channel)!r}")
-
-        history_since = CHANNELS_HISTORY_SINCE.get(
-            get_parent_channel(channel).id, DEFAULT_CHANNELS_HISTORY_SINCE
-        )
-        if history_since is None:
-            history_after = None
-            logger_c.debug("Crawling all channel history")
-        else:
-            history_after = get_history_after(history_since)
-            logger_c.debug(
-                f"Crawling history after {history_after:%Y-%m-%d} ({history_since.days} days ago)"
+        async with limiter.worker():
+            await crawl_channel_with_threads(
+                channel, queue, writer, channels_ids, full, logger_cw
             )
+        queue.task_done()
 
-        threads = [
-            thread
-            async for thread in fetch_threads(channel)
-            if is_thread_after(thread, after=history_after) and not thread.is_private()
-        ]
-        if threads:
-            logger_c.info(f"Adding {len(threads)} threads")
-        for thread in threads:
-            logger_c.debug(
-                f"Adding thread '{thread.name}' #{thread.id} {thread.jump_url}"
-            )
-            queue.put_nowait(thread)
 
-        tasks = []
-        async for message in fetch_messages(channel, history_after):
-            db_message = await store_message(message)
-            async for reacting_member in fetch_members_reacting_by_pin(
-                message.reactions
-            ):
-                tasks.append(
-                    asyncio.create_task(store_pin(db_message, reacting_member))
-                )
-        await asyncio.gather(*tasks)
+async def crawl_channel_with_threads(
+    channel: GuildChannel | DMChannel,
+    queue: asyncio.Queue,
+    writer: DatabaseWriter,
+    channels_ids: set[int],
+    full: bool,
+    logger_cw: loggers.Logger,
+) -> None:
+    channels_ids.add(channel.id)
+    logger_c = get_channel_logger(logger_cw, channel)
+    logger_c.info(f"Crawling {get_channel_name(channel)!r}")
+
+    history_since = CHANNELS_HISTORY_SINCE.get(
+        get_parent_channel(channel).id, DEFAULT_CHANNELS_HISTORY_SINCE
+    )
+    if history_since is None:
+        history_after = None
+        logger_c.debug("Crawling all channel history")
+    else:
+        history_after = get_history_after(history_since)
+        logger_c.debug(
+            f"Crawling history after {history_after:%Y-%m-%d} ({history_since.days} days ago)"
+        )
 
-        logger_c.debug(f"Done crawling {get_channel_name(channel)!r}")
-        queue.task_done()
+    threads = [
+        thread
+        async for thread in fetch_threads(channel)
+        if is_thread_after(thread, after=history_after) and not thread.is_private()
+    ]
+    if threads:
+        logger_c.info(f"Adding {len(threads)} threads")
+    for thread in threads:
+        logger_c.debug(f"Adding thread '{thread.name}' #{thread.id} {thread.jump_url}")
+        queue.put_nowait(thread)
+
+    try:
+        await crawl_channel(channel, writer, history_after, full, logger_c)
+    except NotFound:
+        if not is_channel_dm(channel):
+            raise
+        logger_c.warning("DM channel not found, getting it again")
+        if new_channel := await get_or_create_dm_channel(channel.recipient):
+            channels_ids.add(new_channel.id)
+            await writer.store_dm_channel(new_channel)
+            await crawl_channel(new_channel, writer, history_after, full, logger_c)
+    logger_c.debug(f"Done crawling {get_channel_name(channel)!r}")
+
+
+async def crawl_channel(
+    channel: GuildChannel | DMChannel,
+    writer: DatabaseWriter,
+    history_after: datetime | None,
+    full: bool,
+    logger_c: loggers.Logger,
+) -> None:
+    crawl_after = history_after
+    known_pins = {}
+    if not full:
+        if history_after:
+            await forget_messages(channel.id, before=history_after)
+        if message_id := await get_channel_mark(channel.id):
+            crawl_after = get_crawl_after(history_after, message_id)
+            logger_c.debug(f"Crawling incrementally after {crawl_after:%Y-%m-%d}")
+            known_pins = await get_pins(channel.id, after=crawl_after)
+            await forget_messages(channel.id, after=crawl_after)
+
+    # Members who pinned a message are fetched by separate tasks, so that
+    # paging through the history doesn't wait for them
+    newest_message_id = None
+    pins_slots = asyncio.Semaphore(PINS_CONCURRENCY)
+    pins_tasks = []
+    try:
+        async for message in fetch_messages(channel, crawl_after):
+            newest_message_id = max(newest_message_id or 0, message.id)
+            await writer.store_message(message)
+            if reaction := get_pin_reaction(message.reactions):
+                count, members_ids = known_pins.get(message.id, (None, []))
+                if reaction.count == count:
+                    await writer.store_known_pins(message.id, members_ids)
+                else:
+                    await pins_slots.acquire()
+                    pins_tasks.append(
+                        asyncio.create_task(
+                            crawl_pins(message.id, reaction, writer, pins_slots)
+                        )
+                    )
+        await asyncio.gather(*pins_tasks)
+    finally:
+        for task in pins_tasks:
+            task.cancel()
+
+    if newest_message_id:
+        await writer.store_channel_mark(channel.id, newest_message_id)
+
+
+async def crawl_pins(
+    message_id: int,
+    reaction: Reaction,
+    writer: DatabaseWriter,
+    slots: asyncio.Semaphore,
+) -> None:
+    try:
+        async for reacting_member in fetch_members_reacting(reaction):
+            await writer.store_pin(message_id, reacting_member)
+    finally:
+        slots.release()
 
 
 def get_channel_logger(
@@ -196,15 +300,30 @@ async def fetch_messages(
     logger_m.debug(f"Downloaded {count} messages")
 
 
-async def fetch_members_reacting_by_pin(
-    reactions: list[Reaction],
-) -> AsyncGenerator[User | Member, None]:
+def get_pin_reaction(reactions: list[Reaction]) -> Reaction | None:
     for reaction in reactions:
         if emoji_name(reaction.emoji) == ClubEmoji.PIN:
-            async for user in reaction.users():
-                if is_member(user):
-                    yield user
-            break
+            return reaction
+    return None
+
+
+async def fetch_members_reacting(
+    reaction: Reaction,
+) -> AsyncGenerator[User | Member, None]:
+    async for user in reaction.users():
+        if is_member(user):
+            yield user
+
+
+def get_crawl_after(
+    history_after: datetime | None,
+    message_id: int,
+    rescan_period: timedelta = HISTORY_RESCAN_PERIOD,
+) -> datetime:
+    crawl_after = snowflake_time(message_id) - rescan_period
+    if history_after:
+        return max(history_after, crawl_after)
+    return crawl_after
 
 
 def get_history_after(
@@ -1,10 +1,15 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Iterable, Self
+
 import arrow
 import peewee
 from discord import DMChannel, Member, Message, User
 
 from jg.coop.lib import loggers
-from jg.coop.lib.async_utils import make_async
+from jg.coop.lib.async_utils import call_async, make_async
 from jg.coop.lib.discord_club import (
+    ClubEmoji,
     ClubMemberID,
     emoji_name,
     get_channel_name,
@@ -16,19 +21,213 @@ from jg.coop.lib.discord_club import (
     is_channel_private,
 )
 from jg.coop.lib.discord_votes import count_downvotes, count_upvotes
-from jg.coop.models.base import db
-from jg.coop.models.club import ClubMessage, ClubPin, ClubUser
+from jg.coop.models.base import BulkWriter, db
+from jg.coop.models.club import ClubChannelMark, ClubMessage, ClubPin, ClubUser
+
+
+WRITER_BATCH_SIZE = 1000
+
+WRITER_QUEUE_SIZE = 5000
+
+WRITER_KINDS = ["members", "users", "messages", "pins", "dm_channels", "marks"]
+
+CRAWLED_USER_FIELDS = [
+    ClubUser.is_bot,
+    ClubUser.is_member,
+    ClubUser.has_avatar,
+    ClubUser.display_name,
+    ClubUser.mention,
+    ClubUser.joined_at,
+    ClubUser.initial_roles,
+]
 
 
 logger = loggers.from_path(__file__)
 
 
-@make_async
+def reset_users() -> None:
+    """
+    Prepares users stored by previous crawl for an incremental crawl
+
+    Authors of messages kept from the previous crawl must stay in the database,
+    but anyone can leave the club in the meantime, and the data other syncs
+    store along the users get reset as if the table was created again.
+    """
+    reset = {
+        field: None
+        for field in ClubUser._meta.sorted_fields
+        if field.null and field not in CRAWLED_USER_FIELDS
+    }
+    ClubUser.update({**reset, ClubUser.is_member: False}).execute()
+
+
+class DatabaseWriter:
+    """
+    Stores crawled data in batches, in a single task
+
+    Crawling workers put rows to the queue and the writer stores them
+    in batches, each in a single transaction in a separate thread. The queue
+    is bounded, so the workers get slowed down if the database can't keep up.
+    """
+
+    def __init__(
+        self, batch_size: int = WRITER_BATCH_SIZE, queue_size: int = WRITER_QUEUE_SIZE
+    ):
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.task = None
+        self.count = 0
+        self.members_ids = set()
+
+    async def __aenter__(self) -> Self:
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            await self._put(None)
+            await self.task
+            logger.info(f"Stored {self.count} rows")
+        else:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def store_member(self, member: Member) -> None:
+        logger["users"][member.id].debug(f"Saving {member.display_name!r}")
+        self.members_ids.add(member.id)
+        await self._put(("members", _member_to_row(member)))
+
+    async def store_message(self, message: Message) -> None:
+        """
+        Stores given Discord Message object
+
+        If the author isn't stored yet, it stores it along the way. If the message
+        or the author are already stored, the existing records are kept.
+        """
+        logger["messages"][message.channel.id].debug(f"Saving {message.jump_url}")
+        await self._put(("users", _user_to_row(message.author)))
+        await self._put(("messages", _message_to_row(message)))
+
+    async def store_pin(self, message_id: int, member: Member) -> None:
+        """Stores the information about given Discord Member pinning given message"""
+        logger["pins"].debug(
+            f"Message #{message_id} is pinned by member '{member.display_name}' #{member.id}"
+        )
+        await self._put(("pins", dict(pinned_message=message_id, member=member.id)))
+
+    async def store_known_pins(self, message_id: int, members_ids: list[int]) -> None:
+        """
+        Stores pins of given message as they were crawled previously
+
+        Pins by those who left the club since then are skipped. Only members
+        stored by this writer are known to be still in the club.
+        """
+        for member_id in members_ids:
+            if member_id in self.members_ids:
+                logger["pins"].debug(
+                    f"Message #{message_id} is still pinned by member #{member_id}"
+                )
+                await self._put(
+                    ("pins", dict(pinned_message=message_id, member=member_id))
+                )
+
+    async def store_dm_channel(self, channel: DMChannel) -> None:
+        """Stores the information about given Discord DM channel"""
+        member = channel.recipient
+        logger["dm"].debug(
+            f"Channel {channel.id} belongs to member '{member.display_name}' #{member.id}"
+        )
+        await self._put(("dm_channels", (channel.id, member.id)))
+
+    async def store_channel_mark(self, channel_id: int, message_id: int) -> None:
+        """
+        Records ID of the newest message crawled in given channel
+
+        The mark gets stored after all the messages put before it, so if the crawl
+        crashes, the next one doesn't skip messages which haven't been stored.
+        """
+        logger["marks"][channel_id].debug(f"Newest message: #{message_id}")
+        await self._put(("marks", (channel_id, message_id)))
+
+    async def _put(self, item: tuple[str, Any] | None) -> None:
+        if self.task.done():
+            self.task.result()  # raises if the writer crashed
+            raise RuntimeError("Writer is closed")
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+            return
+
+        # Waiting until the writer makes space in the queue, unless it crashes
+        put = asyncio.create_task(self.queue.put(item))
+        try:
+            await asyncio.wait([put, self.task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        if not put.done() or put.cancelled():
+            self.task.result()  # raises if the writer crashed
+            raise RuntimeError("Writer is closed")
+
+    async def _run(self) -> None:
+        is_closed = False
+        while not is_closed:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if items[-1] is None:
+                items.pop()
+                is_closed = True
+            if items:
+                await call_async(write_batch, items)
+                self.count += len(items)
+
+
 @db.connection_context()
-def store_member(member: Member) -> ClubUser:
-    """Stores in database given Discord Member object"""
-    logger["users"][member.id].debug(f"Saving {member.display_name!r}")
-    return ClubUser.create(
+def write_batch(items: list[tuple[str, Any]]) -> None:
+    # Members are put to the queue before anything else. Within the batch,
+    # they need to be stored before messages try to store them as authors,
+    # and before their DM channels get recorded.
+    rows = {kind: [] for kind in WRITER_KINDS}
+    for kind, row in items:
+        rows[kind].append(row)
+
+    with db.atomic():
+        with BulkWriter(
+            ClubUser, conflict_target=[ClubUser.id], preserve=CRAWLED_USER_FIELDS
+        ) as writer:
+            writer.add_many(rows["members"])
+        with BulkWriter(ClubUser, ignore=True) as writer:
+            writer.add_many(rows["users"])
+        with BulkWriter(ClubMessage, ignore=True) as writer:
+            writer.add_many(rows["messages"])
+
+        if rows["pins"]:
+            members_ids = {row["member"] for row in rows["pins"]}
+            query = ClubUser.members_listing().where(ClubUser.id.in_(members_ids))
+            if unknown_ids := members_ids - {member.id for member in query}:
+                raise ClubUser.DoesNotExist(f"Unknown members: {unknown_ids!r}")
+            with BulkWriter(ClubPin) as writer:
+                writer.add_many(rows["pins"])
+
+        # Assuming the recipient is a member, but also ensuring it REALLY IS
+        # a member in the where() clause below.
+        for channel_id, member_id in rows["dm_channels"]:
+            rows_count = (
+                ClubUser.update({ClubUser.dm_channel_id: channel_id})
+                .where(ClubUser.id == member_id, ClubUser.is_member == True)  # noqa: E712
+                .execute()
+            )
+            if rows_count != 1:
+                raise RuntimeError(
+                    f"Unexpected number of rows updated ({rows_count}) when recording DM channel #{channel_id} to member #{member_id}"
+                )
+
+        for channel_id, message_id in rows["marks"]:
+            ClubChannelMark.record(channel_id, message_id)
+
+
+def _member_to_row(member: Member) -> dict[str, Any]:
+    return dict(
         id=member.id,
         is_bot=member.bot,
         is_member=True,
@@ -40,119 +239,152 @@ def store_member(member: Member) -> ClubUser:
     )
 
 
-@db.connection_context()
-def _store_user(user: User) -> ClubUser:
-    """
-    Stores in database given Discord User object
+def _user_to_row(user: User) -> dict[str, Any]:
+    # The message.author can be an instance of Member, but it can also be an instance of User,
+    # if the author isn't a member of the Discord guild/server anymore. User instances don't
+    # have certain properties, hence the getattr() calls below.
+    return dict(
+        id=user.id,
+        is_bot=user.bot,
+        is_member=bool(getattr(user, "joined_at", False)),
+        has_avatar=bool(user.avatar),
+        display_name=user.display_name,
+        mention=user.mention,
+        joined_at=(
+            arrow.get(user.joined_at).naive if hasattr(user, "joined_at") else None
+        ),
+        initial_roles=get_user_roles(user),
+    )
 
-    If given user is already stored, it silently returns the existing database object.
-    """
-    logger["users"][user.id].debug(f"Saving {user.display_name!r}")
-    try:
-        # The message.author can be an instance of Member, but it can also be an instance of User,
-        # if the author isn't a member of the Discord guild/server anymore. User instances don't
-        # have certain properties, hence the getattr() calls below.
-        obj = ClubUser.create(
-            id=user.id,
-            is_bot=user.bot,
-            is_member=bool(getattr(user, "joined_at", False)),
-            has_avatar=bool(user.avatar),
-            display_name=user.display_name,
-            mention=user.mention,
-            joined_at=(
-                arrow.get(user.joined_at).naive if hasattr(user, "joined_at") else None
-            ),
-            initial_roles=get_user_roles(user),
-        )
-        logger["users"][user.id].debug(f"Saved {user.display_name!r} as {obj!r}")
-        return obj
-    except peewee.IntegrityError:
-        obj = ClubUser.get_by_id(user.id)
-        logger["users"][user.id].debug(f"Found {user.display_name!r} as {obj!r}")
-        return obj
+
+def _message_to_row(message: Message) -> dict[str, Any]:
+    # The channel can be a GuildChannel, but it can also be a DMChannel.
+    # Those have different properties, hence the get_...() and getattr() calls below.
+    channel = message.channel
+    return dict(
+        id=message.id,
+        url=message.jump_url,
+        content=message.content,
+        content_size=len(message.content or ""),
+        content_starting_emoji=get_starting_emoji(message.content),
+        reactions={
+            emoji_name(reaction.emoji): reaction.count for reaction in message.reactions
+        },
+        upvotes_count=count_upvotes(message.reactions),
+        downvotes_count=count_downvotes(message.reactions),
+        created_at=arrow.get(message.created_at).naive,
+        created_month=f"{message.created_at:%Y-%m}",
+        author=message.author.id,
+        author_is_bot=message.author.id == ClubMemberID.BOT,
+        channel_id=channel.id,
+        channel_name=get_channel_name(channel),
+        parent_channel_id=get_parent_channel(channel).id,
+        parent_channel_name=get_channel_name(get_parent_channel(channel)),
+        category_id=getattr(channel, "category_id", None),
+        type=message.type.name,
+        is_private=is_channel_private(channel),
+        pinned_message_url=get_pinned_message_url(message),
+        ui_urls=get_ui_urls(message),
+    )
 
 
 @make_async
 @db.connection_context()
-def store_message(message: Message) -> ClubMessage:
+def get_channel_mark(channel_id: int) -> int | None:
+    """Returns ID of the newest message crawled in given channel"""
+    return ClubChannelMark.get_message_id(channel_id)
+
+
+@make_async
+@db.connection_context()
+def get_pins(
+    channel_id: int, after: datetime | None = None
+) -> dict[int, tuple[int, list[int]]]:
     """
-    Stores in database given Discord Message object
+    Returns pins of messages in given channel created after given time
 
-    If the author isn't stored yet, it stores it along the way.
+    For each pinned message, returns the count of pin reactions as stored
+    with the message, and IDs of members who pinned it.
     """
-    # The channel can be a GuildChannel, but it can also be a DMChannel.
-    # Those have different properties, hence the get_...() and getattr() calls below.
-    channel = message.channel
-    try:
-        return ClubMessage.create(
-            id=message.id,
-            url=message.jump_url,
-            content=message.content,
-            content_size=len(message.content or ""),
-            content_starting_emoji=get_starting_emoji(message.content),
-            reactions={
-                emoji_name(reaction.emoji): reaction.count
-                for reaction in message.reactions
-            },
-            upvotes_count=count_upvotes(message.reactions),
-            downvotes_count=count_downvotes(message.reactions),
-            created_at=arrow.get(message.created_at).naive,
-            created_month=f"{message.created_at:%Y-%m}",
-            edited_at=(
-                arrow.get(message.edited_at).naive if message.edited_at else None
-            ),
-            author=_store_user(message.author),
-            author_is_bot=message.author.id == ClubMemberID.BOT,
-            channel_id=channel.id,
-            channel_name=get_channel_name(channel),
-            parent_channel_id=get_parent_channel(channel).id,
-            parent_channel_name=get_channel_name(get_parent_channel(channel)),
-            category_id=getattr(channel, "category_id", None),
-            type=message.type.name,
-            is_private=is_channel_private(channel),
-            pinned_message_url=get_pinned_message_url(message),
-            ui_urls=get_ui_urls(message),
-        )
-    except peewee.IntegrityError:
-        message_obj = ClubMessage.get_by_id(message.id)
-        logger["messages"].debug(
-            f"Message {message.jump_url} apparently already stored as {message_obj!r}"
-        )
-        return message_obj
+    query = ClubMessage.select(ClubMessage.id, ClubMessage.reactions).where(
+        ClubMessage.channel_id == channel_id
+    )
+    if after:
+        query = query.where(ClubMessage.created_at > arrow.get(after).naive)
+    pins = {
+        message.id: (message.reactions[ClubEmoji.PIN], [])
+        for message in query
+        if message.reactions.get(ClubEmoji.PIN)
+    }
+    rows = (
+        ClubPin.select(ClubPin.pinned_message, ClubPin.member)
+        .where(ClubPin.pinned_message.in_(list(pins)))
+        .tuples()
+    )
+    for message_id, member_id in rows:
+        pins[message_id][1].append(member_id)
+    return pins
 
 
 @make_async
 @db.connection_context()
-def store_pin(message: ClubMessage, member: Member) -> ClubPin:
+def forget_messages(
+    channel_id: int, after: datetime | None = None, before: datetime | None = None
+) -> int:
     """
-    Stores in database the information about given Discord Member pinning given Discord Message
+    Deletes messages of given channel created after or before given time
 
-    If the reacting member isn't stored yet, it stores it along the way.
+    Pins of the messages are deleted as well, so that it's possible
+    to crawl the messages again.
     """
-    logger["pins"].debug(
-        f"Message {message.url} is pinned by member '{member.display_name}' #{member.id}"
-    )
-    return ClubPin.create(
-        pinned_message=message.id, member=ClubUser.get_member_by_id(member.id)
+    query = ClubMessage.select(ClubMessage.id).where(
+        ClubMessage.channel_id == channel_id
     )
+    if after:
+        query = query.where(ClubMessage.created_at > arrow.get(after).naive)
+    if before:
+        query = query.where(ClubMessage.created_at < arrow.get(before).naive)
+    rows_count = _delete_messages(query)
+    if rows_count:
+        logger["messages"][channel_id].debug(f"Forgot {rows_count} messages")
+    return rows_count
 
 
 @make_async
 @db.connection_context()
-def store_dm_channel(channel: DMChannel) -> None:
-    """Stores in database the information about given Discord DM channel"""
-    # Assuming the recipient is a member, but also ensuring it REALLY IS a member
-    # in the where() clause below.
-    member = channel.recipient
-    logger["dm"].debug(
-        f"Channel {channel.id} belongs to member '{member.display_name}' #{member.id}"
+def forget_channels_except(channels_ids: Iterable[int]) -> None:
+    """
+    Deletes everything crawled previously in channels other than given
+
+    Also deletes users who aren't members and aren't authors of any
+    messages anymore. After that, the database is the same as if it
+    was created by crawling given channels from scratch.
+    """
+    channels_ids = list(channels_ids)
+    rows_count = _delete_messages(
+        ClubMessage.select(ClubMessage.id).where(
+            ClubMessage.channel_id.not_in(channels_ids)
+        )
     )
+    logger["messages"].info(f"Forgot {rows_count} messages in channels not crawled")
+    ClubChannelMark.delete().where(
+        ClubChannelMark.channel_id.not_in(channels_ids)
+    ).execute()
     rows_count = (
-        ClubUser.update({ClubUser.dm_channel_id: channel.id})
-        .where(ClubUser.id == member.id, ClubUser.is_member == True)  # noqa: E712
+        ClubUser.delete()
+        .where(
+            ClubUser.is_member == False,  # noqa: E712
+            ClubUser.id.not_in(ClubMessage.select(ClubMessage.author)),
+        )
         .execute()
     )
-    if rows_count != 1:
-        raise RuntimeError(
-            f"Unexpected number of rows updated ({rows_count}) when recording DM channel #{channel.id} to member #{member.id}"
-        )
+    logger["users"].info(f"Forgot {rows_count} users without messages")
+
+
+def _delete_messages(query: peewee.Select) -> int:
+    with db.atomic():
+        ClubPin.delete().where(ClubPin.pinned_message.in_(query)).execute()
+        ClubPin.update({ClubPin.pinning_message: None}).where(
+            ClubPin.pinning_message.in_(query)
+        ).execute()
+        return ClubMessage.delete().where(ClubMessage.id.in_(query)).execute()
@@ -31,7 +31,7 @@ class CourseProviderConfig(YAMLConfig):
     sk_business_id: int | None = None
 
 
-@cli.sync_command()
+@cli.sync_command(input_files=[f"{YAML_DIR_PATH}/*.yml"])
 @db.connection_context()
 def main():
     CourseProvider.drop_table()
@@ -5,7 +5,7 @@ from lxml import html
 
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
-from jg.coop.models.base import db
+from jg.coop.models.base import BulkWriter, db
 from jg.coop.models.feminine_name import FeminineName
 
 
@@ -50,16 +50,13 @@ def main():
         for element in html_tree.cssselect(".wikitable a[href]")
     ] + EXTRA_NAMES
 
-    for name in names:
-        name_lower = name.lower()
-        name_ascii = remove_accents(name_lower)
-        logger.info(f"{name} → {name_lower}, {name_ascii}")
-        FeminineName.insert_many(
-            [
-                dict(name=name_lower),
-                dict(name=name_ascii),
-            ]
-        ).on_conflict_ignore().execute()
+    with BulkWriter(FeminineName, ignore=True) as writer:
+        for name in names:
+            name_lower = name.lower()
+            name_ascii = remove_accents(name_lower)
+            logger.info(f"{name} → {name_lower}, {name_ascii}")
+            writer.add(dict(name=name_lower))
+            writer.add(dict(name=name_ascii))
 
 
 def remove_accents(s):
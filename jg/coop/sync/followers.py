@@ -59,8 +59,7 @@ def main(
     logger.info("Reading history from a file")
     history_path.touch(exist_ok=True)
     with history_path.open() as f:
-        for line in f:
-            Followers.deserialize(line)
+        Followers.deserialize_many(f)
 
     month = f"{date.today():%Y-%m}"
     logger.info(f"Current month: {month}")
@@ -43,9 +43,10 @@ async def sync_jobs(client: ClubClient, channel_id: int):
 
     messages = ClubMessage.forum_listing(channel_id)
     logger.info(f"Found {len(messages)} threads since {since_on}")
+    comments_counts = ClubMessage.forum_comments_count_mapping(channel_id)
     for message in messages:
         if message.created_at.date() > since_on:
-            comments_count = len(ClubMessage.channel_listing(message.channel_id)) - 1
+            comments_count = comments_counts[message.channel_id]
             if len(message.ui_urls) > 1:
                 raise ValueError(f"Multiple URLs: {message.url} {message.ui_urls!r}")
             try:
@@ -11,6 +11,7 @@ from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps
 
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
+from jg.coop.lib.profiling import profiled
 from jg.coop.models.base import db
 from jg.coop.models.job import ListedJob
 
@@ -142,6 +143,7 @@ def sort_key(logo):
     return (is_icon, similarity_to_square, area)
 
 
+@profiled
 def fetch_icon_urls(args):
     logger_f = logger["fetch_icon_urls"]
     job_id, company_url = args
@@ -162,6 +164,7 @@ def fetch_icon_urls(args):
         return job_id, []
 
 
+@profiled
 def download_image(image_url):
     logger_d = logger["download_image"]
     logger_d.debug(f"Downloading {image_url}")
@@ -1,17 +1,28 @@
 import asyncio
 import importlib
-import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
 from pprint import pformat
-from typing import Awaitable, Callable
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable
 
+import click
 from peewee import IntegrityError
 
 from jg.coop.cli.sync import main as cli
-from jg.coop.lib import apify, loggers
-from jg.coop.lib.async_utils import make_async
+from jg.coop.lib import apify, llm, loggers
+from jg.coop.lib.async_utils import make_async, merge
 from jg.coop.lib.cli import async_command
 from jg.coop.models.base import db
 from jg.coop.models.job import DroppedJob, ScrapedJob
+from jg.coop.sync.jobs_scraped.stats import (
+    StageStats,
+    current_stage,
+    log_stats,
+    measure_cpu_time,
+)
 
 
 ACTORS = [
@@ -36,83 +47,177 @@ PIPELINES = [
     "jg.coop.sync.jobs_scraped.pipelines.employment_types_cleaner",
 ]
 
+# Pipelines declaring CPU_BOUND = True run in a pool of processes, so that
+# they don't block the event loop, which waits for the I/O-bound ones
+CPU_BOUND_WORKERS = os.cpu_count() or 1
 
-logger = loggers.from_path(__file__)
-
-
-class DropItem(Exception):
-    pass
-
+# The pool starts within a thread running the event loop, while other threads
+# may hold locks, e.g. the Discord session or cache connections. Forking would
+# copy those locks to the workers in a locked state, so they're spawned.
+CPU_BOUND_START_METHOD = "spawn"
 
-# Python 3.12 should start supporting generators for asyncio.as_completed,
-# so remove this class then
-class DisguisedGenerator:
-    def __init__(self, generator):
-        self._generator = generator
+# Items are processed concurrently, but only this many at once, so that
+# memory stays flat and downloading waits for the pipelines to catch up
+MAX_IN_FLIGHT = 100
 
-    def __iter__(self):
-        return self
 
-    def __next__(self):
-        return next(self._generator)
+logger = loggers.from_path(__file__)
 
-    def __len__(self):
-        raise NotImplementedError("DisguisedGenerator doesn't support len()")
 
-    def __getitem__(self, index):
-        raise NotImplementedError("DisguisedGenerator doesn't support indexing")
+class DropItem(Exception):
+    pass
 
 
 @cli.sync_command()
+@click.option("--max-in-flight", default=MAX_IN_FLIGHT, type=int)
 @async_command
-async def main():
+async def main(max_in_flight: int):
     logger.info(f"Actors:\n{pformat(ACTORS)}")
-    items = itertools.chain.from_iterable(
-        apify.fetch_data(actor, raise_if_missing=False) for actor in ACTORS
+    llm.reset_stats()
+    items = merge(
+        *(apify.stream_data(actor, raise_if_missing=False) for actor in ACTORS)
     )
 
-    logger.info(f"Pipelines:\n{pformat(PIPELINES)}")
-    pipelines = [
-        (
-            pipeline_name.split(".")[-1],
-            importlib.import_module(pipeline_name).process,
-        )
-        for pipeline_name in PIPELINES
-    ]
-
     logger.info("Setting up db tables")
     with db.connection_context():
         db.drop_tables([DroppedJob, ScrapedJob])
         db.create_tables([DroppedJob, ScrapedJob])
 
-    logger.info("Processing items")
-    count = 0
-    drops = 0
-    for processing in logger.progress(
-        asyncio.as_completed(
-            DisguisedGenerator(process_item(pipelines, item) for item in items)
+    with create_executor() as executor:
+        logger.info(f"Pipelines:\n{pformat(PIPELINES)}")
+        pipelines = load_pipelines(PIPELINES, executor)
+        stages = {name: StageStats(name) for name, _ in pipelines}
+
+        logger.info(
+            f"Processing items, up to {max_in_flight} at once, "
+            f"CPU-bound pipelines in {CPU_BOUND_WORKERS} processes"
         )
-    ):
-        count += 1
-        drops += 1 - (await processing)
+        count = 0
+        drops = 0
+        async for saved in process_items(pipelines, items, stages, max_in_flight):
+            count += 1
+            drops += 1 - saved
+            if count % 100 == 0:
+                logger.info(f"Done {count} items")
     logger.info(f"Stats: {count} items, {drops} drops")
+    log_stats(list(stages.values()), logger["stats"])
+    llm.log_stats(logger["stats"])
+
+
+def create_executor(max_workers: int = CPU_BOUND_WORKERS) -> ProcessPoolExecutor:
+    mp_context = multiprocessing.get_context(CPU_BOUND_START_METHOD)
+    return ProcessPoolExecutor(max_workers, mp_context=mp_context)
+
+
+def load_pipelines(
+    pipelines_names: list[str], executor: Executor | None = None
+) -> list[tuple[str, Callable[..., Awaitable[dict]]]]:
+    pipelines = []
+    for pipeline_name in pipelines_names:
+        module = importlib.import_module(pipeline_name)
+        if executor and getattr(module, "CPU_BOUND", False):
+            process = partial(process_in_executor, executor, pipeline_name)
+        else:
+            process = module.process
+        pipelines.append((pipeline_name.split(".")[-1], process))
+    return pipelines
+
+
+async def process_in_executor(
+    executor: Executor, pipeline_name: str, item: dict
+) -> dict:
+    loop = asyncio.get_running_loop()
+    submitted_at = time.time()
+    item, cpu_time_s, started_at = await loop.run_in_executor(
+        executor, process_measured, pipeline_name, item
+    )
+    if stage := current_stage.get():
+        stage.cpu_time_s += cpu_time_s
+        stage.latency_s += max(0, started_at - submitted_at)
+    if isinstance(item, DropItem):
+        raise item
+    return item
+
+
+def process_measured(
+    pipeline_name: str, item: dict
+) -> tuple[dict | DropItem, float, float]:
+    # The worker process measures its own CPU time, and when it started, so that
+    # the time the item waited in the queue of the pool can be told apart
+    started_at = time.time()
+    cpu_started_at = time.process_time()
+    try:
+        item = process_sync(pipeline_name, item)
+    except DropItem as e:
+        item = e
+    return item, time.process_time() - cpu_started_at, started_at
+
+
+def process_sync(pipeline_name: str, item: dict) -> dict:
+    # CPU-bound pipelines are coroutines which never await, so they finish
+    # at the first step, and can run outside of an event loop
+    coroutine = importlib.import_module(pipeline_name).process(item)
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    coroutine.close()
+    raise RuntimeError(f"Pipeline {pipeline_name!r} awaits, it isn't CPU-bound")
+
+
+async def process_items(
+    pipelines: list[tuple[str, Callable[..., Awaitable[dict]]]],
+    items: AsyncIterable[dict],
+    stages: dict[str, StageStats] | None = None,
+    max_in_flight: int = MAX_IN_FLIGHT,
+) -> AsyncGenerator[int, None]:
+    """
+    Yields results of processing items, as they complete
+
+    Takes next item only if there's less than given number of items
+    in flight, so that memory doesn't grow with the number of items.
+    """
+    in_flight = set()
+    try:
+        async for item in items:
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+            in_flight.add(asyncio.create_task(process_item(pipelines, item, stages)))
+        for processing in asyncio.as_completed(in_flight):
+            yield await processing
+    finally:
+        for task in in_flight:
+            task.cancel()
 
 
 async def process_item(
     pipelines: list[tuple[str, Callable[..., Awaitable[dict]]]],
     item: dict,
+    stages: dict[str, StageStats] | None = None,
 ) -> int:
     logger.debug(f"Item {item['url']}")
     try:
         for pipeline_name, pipeline in pipelines:
+            stage = stages[pipeline_name] if stages else StageStats(pipeline_name)
+            stage.items_count += 1
+            token = current_stage.set(stage)
+            started_at = time.perf_counter()
             try:
-                item = await pipeline(item)
+                item = await measure_cpu_time(pipeline(item), stage)
             except DropItem as e:
+                stage.drops_count += 1
                 logger[pipeline_name].debug(f"Dropping: {e}\n{pformat(item)}")
                 raise
             except Exception:
                 logger.error(f"Pipeline {pipeline_name!r} failed:\n{pformat(item)}")
                 raise
+            finally:
+                stage.wall_time_s += time.perf_counter() - started_at
+                current_stage.reset(token)
     except DropItem:
         logger.debug(f"Saving dropped job {item['url']}")
         await save_dropped_job(item)
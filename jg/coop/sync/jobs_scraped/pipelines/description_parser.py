@@ -7,6 +7,9 @@ from jg.coop.lib.text import extract_text
 logger = loggers.from_path(__file__)
 
 
+CPU_BOUND = True
+
+
 async def process(item: dict) -> dict:
     try:
         item["description_text"] = extract_text(item["description_html"])
@@ -0,0 +1,103 @@
+import contextvars
+import time
+import types
+from dataclasses import dataclass
+from typing import Awaitable, Coroutine, Generator
+
+from jg.coop.lib import loggers
+
+
+# Filters which drop at least this share of items are worth
+# running early, before more expensive stages
+SELECTIVE_DROP_RATIO = 0.1
+
+
+logger = loggers.from_path(__file__)
+
+current_stage = contextvars.ContextVar("current_stage", default=None)
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_count: int = 0
+    drops_count: int = 0
+    wall_time_s: float = 0
+    cpu_time_s: float = 0
+    latency_s: float = 0
+
+    @property
+    def drop_ratio(self) -> float:
+        return self.drops_count / self.items_count if self.items_count else 0
+
+    @property
+    def cost_s(self) -> float:
+        return self.wall_time_s / self.items_count if self.items_count else 0
+
+    @property
+    def rank(self) -> float:
+        # Independent filters are cheapest to run ordered by cost per dropped item
+        return self.cost_s / self.drop_ratio if self.drop_ratio else float("inf")
+
+    def format(self) -> str:
+        return (
+            f"{self.name:26} {self.items_count:6}× "
+            f"drops {self.drops_count:6} {self.drop_ratio:4.0%} "
+            f"wall {self.wall_time_s:7.1f}s "
+            f"CPU {self.cpu_time_s:7.1f}s "
+            f"latency {self.latency_s:7.1f}s "
+            f"{self.cost_s * 1000:8.2f}ms/item"
+        )
+
+
+@types.coroutine
+def measure_cpu_time(
+    coroutine: Coroutine, stage: StageStats
+) -> Generator[Awaitable, None, dict]:
+    """
+    Awaits given coroutine, while adding up the CPU time it takes
+
+    Measures just the steps in which the coroutine runs, so the time
+    other coroutines spend while this one awaits doesn't count.
+    """
+    value, exception = None, None
+    while True:
+        started_at = time.thread_time()
+        try:
+            if exception is None:
+                awaitable = coroutine.send(value)
+            else:
+                awaitable = coroutine.throw(exception)
+        except StopIteration as e:
+            return e.value
+        finally:
+            stage.cpu_time_s += time.thread_time() - started_at
+        try:
+            value, exception = (yield awaitable), None
+        except BaseException as e:
+            value, exception = None, e
+
+
+def get_suggestions(stages: list[StageStats]) -> list[str]:
+    suggestions = []
+    for position, stage in enumerate(stages):
+        if stage.drop_ratio < SELECTIVE_DROP_RATIO:
+            continue
+        for stage_before in stages[:position]:
+            if stage_before.rank > stage.rank and stage_before.cost_s > stage.cost_s:
+                suggestions.append(
+                    f"Consider running {stage.name!r} "
+                    f"(drops {stage.drop_ratio:.0%}, {stage.cost_s * 1000:.2f}ms/item) "
+                    f"before {stage_before.name!r} "
+                    f"({stage_before.cost_s * 1000:.2f}ms/item), "
+                    "unless it depends on its output"
+                )
+                break
+    return suggestions
+
+
+def log_stats(stages: list[StageStats], logger: loggers.Logger = logger) -> None:
+    for stage in stages:
+        logger.info(stage.format())
+    for suggestion in get_suggestions(stages):
+        logger.info(suggestion)
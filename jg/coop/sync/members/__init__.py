@@ -176,8 +176,7 @@ def main(history_path: Path, today: date):
     Members.create_table()
     history_path.touch(exist_ok=True)
     with history_path.open() as f:
-        for line in f:
-            Members.deserialize(line)
+        Members.deserialize_many(f)
 
     month = f"{today:%Y-%m}"
     logger.info(f"Recording {month} stats")
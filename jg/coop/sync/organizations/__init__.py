@@ -143,7 +143,16 @@ class PartnersConfig(YAMLConfig):
     registry: list[PartnerConfig]
 
 
-@cli.sync_command()
+@cli.sync_command(
+    input_files=[
+        str(SPONSORS_YAML_PATH),
+        str(PARTNERS_YAML_PATH),
+        str(LOGOS_CSS_PATH),
+        f"{LOGOS_DIR}/*",
+        "jg/coop/image_templates/sponsor.*",
+    ],
+    input_cache_tags=["memberful-api"],
+)
 @click.option(
     "--today",
     default=lambda: date.today().isoformat(),
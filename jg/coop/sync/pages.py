@@ -10,7 +10,10 @@ from playhouse.shortcuts import model_to_dict
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
 from jg.coop.models.base import db
+from jg.coop.models.course_provider import CourseProvider
+from jg.coop.models.event import Event
 from jg.coop.models.page import Page
+from jg.coop.models.podcast import PodcastEpisode
 from jg.coop.models.stage import Stage
 from jg.coop.web.templates import TEMPLATES
 
@@ -19,7 +22,16 @@ logger = loggers.from_path(__file__)
 
 
 # See 'Generating pages from templates' on why the dependencies are needed
-@cli.sync_command(dependencies=["stages", "course-providers", "events", "podcast"])
+@cli.sync_command(
+    dependencies=["stages", "course-providers", "events", "podcast"],
+    input_files=[
+        "jg/coop/web/mkdocs.yml",
+        "jg/coop/web/docs/**/*.md",
+        "jg/coop/web/docs_templates/*",
+        "jg/coop/web/templates.py",
+    ],
+    input_tables=[Stage, CourseProvider, Event, PodcastEpisode],
+)
 @db.connection_context()
 def main():
     logger.info("Setting up db table")
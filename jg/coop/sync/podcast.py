@@ -19,6 +19,7 @@ from jg.coop.lib.images import (
     validate_image,
 )
 from jg.coop.lib.mutations import mutating_discord
+from jg.coop.lib.profiling import profiled
 from jg.coop.lib.template_filters import icon
 from jg.coop.lib.yaml import Date
 from jg.coop.models.base import db
@@ -99,6 +100,7 @@ def main(clear_posters):
     discord_task.run(announce_new_episode)
 
 
+@profiled
 def process_episode(yaml_record):
     number = yaml_record["number"]
     logger_ep = logger[number]
@@ -15,7 +15,7 @@ from jg.coop.lib import discord_task, loggers
 from jg.coop.lib.discord_club import ClubClient, get_user_roles, resolve_references
 from jg.coop.lib.mutations import mutating_discord
 from jg.coop.models.base import db
-from jg.coop.models.club import ClubUser
+from jg.coop.models.club import ClubMemberStats, ClubUser
 from jg.coop.models.documented_role import DocumentedRole
 from jg.coop.models.event import Event
 from jg.coop.models.partner import Partner
@@ -116,81 +116,22 @@ async def sync_roles(client: ClubClient):
         )
 
     logger.info("Preparing data for computing how to re-assign roles")
-    members = ClubUser.members_listing()
+    members = list(ClubUser.members_listing())
     organizations = list(itertools.chain(Sponsor.listing(), Partner.listing()))
     changes = []
     top_members_limit = ClubUser.top_members_limit()
     logger.info(f"members_count={len(members)}, top_members_limit={top_members_limit}")
 
-    logger.info("Computing how to re-assign role: most_discussing")
-    role_id = DocumentedRole.get_by_slug("most_discussing").club_id
-    content_size_stats = calc_stats(
-        members, lambda m: m.content_size(), top_members_limit
-    )
-    logger.debug(f"content_size {repr_stats(members, content_size_stats)}")
-    recent_content_size_stats = calc_stats(
-        members, lambda m: m.recent_content_size(), top_members_limit
-    )
-    logger.debug(
-        f"recent_content_size {repr_stats(members, recent_content_size_stats)}"
-    )
-    most_discussing_members_ids = set(content_size_stats.keys()) | set(
-        recent_content_size_stats.keys()
-    )
-    logger.debug(
-        f"most_discussing_members: {repr_ids(members, most_discussing_members_ids)}"
-    )
-    for member in members:
-        changes.extend(
-            evaluate_changes(
-                member.id, member.initial_roles, most_discussing_members_ids, role_id
-            )
-        )
-
-    logger.info("Computing how to re-assign role: most_helpful")
-    role_id = DocumentedRole.get_by_slug("most_helpful").club_id
-    upvotes_count_stats = calc_stats(
-        members, lambda m: m.upvotes_count(), top_members_limit
-    )
-    logger.debug(f"upvotes_count {repr_stats(members, upvotes_count_stats)}")
-    recent_upvotes_count_stats = calc_stats(
-        members, lambda m: m.recent_upvotes_count(), top_members_limit
-    )
-    logger.debug(
-        f"recent_upvotes_count {repr_stats(members, recent_upvotes_count_stats)}"
-    )
-    most_helpful_members_ids = set(upvotes_count_stats.keys()) | set(
-        recent_upvotes_count_stats.keys()
-    )
-    logger.debug(f"most_helpful_members: {repr_ids(members, most_helpful_members_ids)}")
-    for member in members:
-        changes.extend(
-            evaluate_changes(
-                member.id, member.initial_roles, most_helpful_members_ids, role_id
+    activity_members_ids = get_activity_members_ids(members, top_members_limit)
+    for slug, role_members_ids in activity_members_ids.items():
+        logger.info(f"Computing how to re-assign role: {slug}")
+        role_id = DocumentedRole.get_by_slug(slug).club_id
+        for member in members:
+            changes.extend(
+                evaluate_changes(
+                    member.id, member.initial_roles, role_members_ids, role_id
+                )
             )
-        )
-
-    logger.info("Computing how to re-assign role: has_intro_and_avatar")
-    role_id = DocumentedRole.get_by_slug("has_intro_and_avatar").club_id
-    intro_avatar_members_ids = [
-        member.id for member in members if member.has_avatar and member.intro
-    ]
-    logger.debug(f"intro_avatar_members: {repr_ids(members, intro_avatar_members_ids)}")
-    for member in members:
-        changes.extend(
-            evaluate_changes(
-                member.id, member.initial_roles, intro_avatar_members_ids, role_id
-            )
-        )
-
-    logger.info("Computing how to re-assign role: newcomer")
-    role_id = DocumentedRole.get_by_slug("newcomer").club_id
-    new_members_ids = [member.id for member in members if member.is_new()]
-    logger.debug(f"new_members_ids: {repr_ids(members, new_members_ids)}")
-    for member in members:
-        changes.extend(
-            evaluate_changes(member.id, member.initial_roles, new_members_ids, role_id)
-        )
 
     logger.info("Computing how to re-assign role: speaker")
     role_id = DocumentedRole.get_by_slug("speaker").club_id
@@ -352,6 +293,69 @@ async def apply_changes(client: ClubClient, changes):
         member.save()
 
 
+def get_activity_members_ids(
+    members: list[ClubUser], top_members_limit: int, today=None
+) -> dict[str, set[int]]:
+    """
+    Returns IDs of members who should have roles given by their activity
+
+    Reads statistics computed for all members at once, so that the number
+    of queries doesn't depend on the number of members.
+    """
+    stats = ClubMemberStats.members_mapping()
+
+    content_size_stats = calc_stats(
+        members, lambda m: stats[m.id].content_size, top_members_limit
+    )
+    logger.debug(f"content_size {repr_stats(members, content_size_stats)}")
+    recent_content_size_stats = calc_stats(
+        members, lambda m: stats[m.id].recent_content_size, top_members_limit
+    )
+    logger.debug(
+        f"recent_content_size {repr_stats(members, recent_content_size_stats)}"
+    )
+    most_discussing_members_ids = set(content_size_stats.keys()) | set(
+        recent_content_size_stats.keys()
+    )
+    logger.debug(
+        f"most_discussing_members: {repr_ids(members, most_discussing_members_ids)}"
+    )
+
+    upvotes_count_stats = calc_stats(
+        members, lambda m: stats[m.id].upvotes_count, top_members_limit
+    )
+    logger.debug(f"upvotes_count {repr_stats(members, upvotes_count_stats)}")
+    recent_upvotes_count_stats = calc_stats(
+        members, lambda m: stats[m.id].recent_upvotes_count, top_members_limit
+    )
+    logger.debug(
+        f"recent_upvotes_count {repr_stats(members, recent_upvotes_count_stats)}"
+    )
+    most_helpful_members_ids = set(upvotes_count_stats.keys()) | set(
+        recent_upvotes_count_stats.keys()
+    )
+    logger.debug(f"most_helpful_members: {repr_ids(members, most_helpful_members_ids)}")
+
+    intro_avatar_members_ids = {
+        member.id
+        for member in members
+        if member.has_avatar and stats[member.id].has_intro
+    }
+    logger.debug(f"intro_avatar_members: {repr_ids(members, intro_avatar_members_ids)}")
+
+    new_members_ids = {
+        member.id for member in members if stats[member.id].is_new(today)
+    }
+    logger.debug(f"new_members_ids: {repr_ids(members, new_members_ids)}")
+
+    return dict(
+        most_discussing=most_discussing_members_ids,
+        most_helpful=most_helpful_members_ids,
+        has_intro_and_avatar=intro_avatar_members_ids,
+        newcomer=new_members_ids,
+    )
+
+
 def calc_stats(members, calc_member_fn, top_members_limit):
     counter = Counter({member.id: calc_member_fn(member) for member in members})
     return dict(counter.most_common()[:top_members_limit])
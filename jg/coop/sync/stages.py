@@ -25,7 +25,7 @@ YAML_SCHEMA = Seq(
 logger = loggers.from_path(__file__)
 
 
-@cli.sync_command()
+@cli.sync_command(input_files=[str(YAML_PATH)])
 @db.connection_context()
 def main():
     Stage.drop_table()
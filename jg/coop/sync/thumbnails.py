@@ -6,7 +6,8 @@ import click
 from jg.coop.cli.sync import main as cli
 from jg.coop.lib import loggers
 from jg.coop.lib.images import render_image_file
-from jg.coop.models.base import db
+from jg.coop.lib.profiling import profiled
+from jg.coop.models.base import BulkWriter, db
 from jg.coop.models.job import ListedJob
 from jg.coop.models.page import LegacyThumbnail, Page
 from jg.coop.web_legacy import app, generate_job_pages, get_freezer
@@ -62,6 +63,7 @@ def main(images_path, output_dir, width, height, clear):
         )  # all below can be deleted once Flask is gone
         LegacyThumbnail.drop_table()
         LegacyThumbnail.create_table()
+        writer = BulkWriter(LegacyThumbnail)
 
         equivalents = {
             "/": "index.jinja",
@@ -77,7 +79,7 @@ def main(images_path, output_dir, width, height, clear):
         }
         for url, src_uri in equivalents.items():
             page = Page.get(Page.src_uri == src_uri)
-            LegacyThumbnail.create(url=url, image_path=page.thumbnail_path)
+            writer.add(dict(url=url, image_path=page.thumbnail_path))
 
         default_image_path = render_image_file(
             width, height, "thumbnail_legacy.jinja", {}, output_path
@@ -89,8 +91,8 @@ def main(images_path, output_dir, width, height, clear):
             "/press/handbook/",
             "/press/women/",
         ]:
-            LegacyThumbnail.create(
-                url=url, image_path=default_image_path.relative_to(images_path)
+            writer.add(
+                dict(url=url, image_path=default_image_path.relative_to(images_path))
             )
 
         args = [
@@ -137,9 +139,7 @@ def main(images_path, output_dir, width, height, clear):
             ]
         ]
         for url, image_path in pool.imap_unordered(process_thumbnail, args):
-            LegacyThumbnail.create(
-                url=url, image_path=image_path.relative_to(images_path)
-            )
+            writer.add(dict(url=url, image_path=image_path.relative_to(images_path)))
 
         args = []
         for _, params in generate_job_pages():
@@ -160,9 +160,8 @@ def main(images_path, output_dir, width, height, clear):
                 )
             )
         for url, image_path in pool.imap_unordered(process_thumbnail, args):
-            LegacyThumbnail.create(
-                url=url, image_path=image_path.relative_to(images_path)
-            )
+            writer.add(dict(url=url, image_path=image_path.relative_to(images_path)))
+        writer.flush()
 
         expected_urls = frozenset(get_freezer(app).all_urls())
         urls = frozenset(thumbnail.url for thumbnail in LegacyThumbnail.select())
@@ -172,6 +171,7 @@ def main(images_path, output_dir, width, height, clear):
             raise click.Abort()
 
 
+@profiled
 def process_thumbnail(args):
     id, args = args[0], args[1:]
     image_path = render_image_file(*args)
@@ -1,4 +1,21 @@
-from jg.coop.cli.sync import default_from_env, get_parallel_chains
+import threading
+import time
+
+import pytest
+
+from jg.coop.cli.sync import (
+    default_from_env,
+    get_dependents_counts,
+    get_job_chains,
+    get_makespans,
+    get_nodes_count,
+    get_parallel_chains,
+    pack_chains,
+    run_parallel,
+)
+
+
+NS_IN_MIN = 60000000000
 
 
 def test_get_parallel_chains():
@@ -53,6 +70,168 @@ def test_get_parallel_chains_exclude():
     ]
 
 
+def test_get_job_chains():
+    dependencies = {"a": [], "b": ["a"], "c": [], "d": ["b"], "e": ["c"]}
+
+    assert get_job_chains(dependencies, "sync-1") == [["a"], ["c"]]
+    assert get_job_chains(dependencies, "sync-2") == [["b", "d"], ["e"]]
+
+
+def test_pack_chains():
+    chains = [["a"], ["b", "c"], ["d"], ["e"]]
+    durations = dict(a=10, b=3, c=3, d=5, e=4)
+
+    assert pack_chains(chains, 2, durations) == [["a", "e"], ["b", "c", "d"]]
+
+
+def test_pack_chains_node_per_chain():
+    chains = [["a"], ["b", "c"], ["d"]]
+    durations = dict(a=10, b=3, c=3, d=5)
+
+    assert pack_chains(chains, 3, durations) == [["a"], ["b", "c"], ["d"]]
+
+
+def test_pack_chains_unknown_durations_are_median():
+    chains = [["a"], ["b"], ["c"], ["x"]]
+    durations = dict(a=1, b=2, c=9)
+
+    assert get_makespans(pack_chains(chains, 4, durations), durations) == [9, 2, 2, 1]
+
+
+def test_pack_chains_fewer_nodes_same_makespan():
+    dependencies = {
+        "club-content": [],
+        "roles": [],
+        "tips": ["roles"],
+        "pages": [],
+        "events": [],
+        "charts": [],
+        "jobs-scraped": [],
+        "jobs-listing": ["jobs-scraped"],
+    }
+    durations = {
+        "club-content": 30 * NS_IN_MIN,
+        "roles": 6 * NS_IN_MIN,
+        "tips": 4 * NS_IN_MIN,
+        "pages": 1 * NS_IN_MIN,
+        "events": 2 * NS_IN_MIN,
+        "charts": 1 * NS_IN_MIN,
+        "jobs-scraped": 20 * NS_IN_MIN,
+        "jobs-listing": 2 * NS_IN_MIN,
+    }
+    chains = get_job_chains(dependencies, "sync-1")
+    nodes = get_nodes_count(chains, durations)
+    packed = pack_chains(chains, nodes, durations)
+
+    assert nodes < len(chains)
+    assert max(get_makespans(packed, durations)) == max(
+        get_makespans(chains, durations)
+    )
+
+
+def test_pack_chains_invalid_nodes():
+    with pytest.raises(ValueError):
+        pack_chains([["a"]], 0, {})
+
+
+def test_get_nodes_count():
+    chains = [["a"], ["b", "c"], ["d"], ["e"]]
+    durations = dict(a=10, b=3, c=3, d=5, e=4)
+
+    assert get_nodes_count(chains, durations) == 3
+
+
+def test_get_nodes_count_no_durations():
+    chains = [["a"], ["b", "c"], ["d"], ["e"]]
+
+    assert get_nodes_count(chains, {}) == 4
+
+
+def test_run_parallel_respects_dependencies():
+    dependencies = {"a": [], "b": ["a"], "c": ["b"], "d": []}
+    log = []
+
+    def run(name):
+        log.append(f"start {name}")
+        time.sleep(0.01)
+        log.append(f"end {name}")
+
+    run_parallel(dependencies, run, jobs=4)
+
+    assert log.index("end a") < log.index("start b")
+    assert log.index("end b") < log.index("start c")
+    assert "end d" in log
+
+
+def test_run_parallel_limits_jobs():
+    dependencies = {name: [] for name in "abcdef"}
+    lock = threading.Lock()
+    running = set()
+    concurrency = []
+
+    def run(name):
+        with lock:
+            running.add(name)
+            concurrency.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(name)
+
+    run_parallel(dependencies, run, jobs=2)
+
+    assert max(concurrency) == 2
+
+
+def test_run_parallel_takes_as_long_as_critical_path():
+    dependencies = {"a": [], "b": ["a"], "c": [], "d": [], "e": []}
+
+    def run(name):
+        time.sleep(0.1)
+
+    time_start = time.perf_counter()
+    run_parallel(dependencies, run, jobs=4)
+
+    assert time.perf_counter() - time_start < 0.3
+
+
+def test_run_parallel_skips_done():
+    dependencies = {"a": [], "b": ["a"], "c": []}
+    names = []
+
+    run_parallel(dependencies, names.append, jobs=2, done={"a"})
+
+    assert sorted(names) == ["b", "c"]
+
+
+def test_run_parallel_stops_on_exception():
+    dependencies = {"a": [], "b": ["a"]}
+    names = []
+
+    def run(name):
+        names.append(name)
+        raise RuntimeError(name)
+
+    with pytest.raises(RuntimeError, match="a"):
+        run_parallel(dependencies, run, jobs=2)
+    assert names == ["a"]
+
+
+def test_run_parallel_unknown_dependencies():
+    with pytest.raises(NotImplementedError, match="x"):
+        run_parallel({"a": ["x"]}, lambda name: None)
+
+
+def test_run_parallel_cyclic_dependencies():
+    with pytest.raises(ValueError, match="Cyclic"):
+        run_parallel({"a": ["b"], "b": ["a"]}, lambda name: None)
+
+
+def test_get_dependents_counts():
+    dependencies = {"a": [], "b": ["a"], "c": ["b"], "d": ["a"], "e": []}
+
+    assert get_dependents_counts(dependencies) == dict(a=3, b=1, c=0, d=0, e=0)
+
+
 def test_default_from_env(monkeypatch):
     monkeypatch.setenv("FOO", "something")
     env_reader = default_from_env("FOO")
@@ -0,0 +1,212 @@
+import asyncio
+import tracemalloc
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from jg.coop.lib import apify
+from jg.coop.lib.cache import get_cache
+
+
+ITEMS_COUNT = 2_500
+
+RUN_INFO = {
+    "id": "run123",
+    "actId": "act123",
+    "finishedAt": "2024-10-01T12:00:00.000Z",
+    "stats": {"runTimeSecs": 42},
+}
+
+
+def create_item(no: int) -> dict:
+    return {
+        "url": f"https://www.jobs.cz/rpd/{no}/",
+        "title": f"Junior Python Developer #{no}",
+        "description_html": f"<p>Lorem ipsum dolor sit amet #{no}</p>" * 50,
+    }
+
+
+class FakeApify:
+    def __init__(self, items_count: int = ITEMS_COUNT, page_delay_s: float = 0):
+        self.items = [create_item(no) for no in range(items_count)]
+        self.page_delay_s = page_delay_s
+        self.pages_count = 0
+        self.runs_count = 0
+        self.app = web.Application()
+        self.app.router.add_get("/v2/acts/{actor}/runs/last", self.get_run)
+        self.app.router.add_get(
+            "/v2/acts/{actor}/runs/last/dataset/items", self.get_items
+        )
+
+    async def get_run(self, request: web.Request) -> web.Response:
+        self.runs_count += 1
+        if request.match_info["actor"] == "honzajavorek~missing":
+            return web.json_response(
+                {"error": {"type": "record-not-found", "message": "Not found"}},
+                status=404,
+            )
+        return web.json_response({"data": RUN_INFO})
+
+    async def get_items(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.page_delay_s)
+        self.pages_count += 1
+        offset = int(request.query["offset"])
+        limit = int(request.query["limit"])
+        return web.json_response(
+            self.items[offset : offset + limit],
+            headers={
+                "x-apify-pagination-total": str(len(self.items)),
+                "x-apify-pagination-offset": str(offset),
+                "x-apify-pagination-limit": str(limit),
+                "x-apify-pagination-desc": "",
+            },
+        )
+
+
+@pytest_asyncio.fixture
+async def fake_apify():
+    fake_apify = FakeApify(page_delay_s=0.05)
+    async with TestServer(fake_apify.app) as server:
+        fake_apify.url = str(server.make_url("")).rstrip("/")
+        yield fake_apify
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    yield cache_dir
+    get_cache(cache_dir).close()
+
+
+def stream_data(fake_apify: FakeApify, cache_dir: str, actor_name: str = None):
+    return apify.stream_data(
+        actor_name or "honzajavorek/jobs-jobscz",
+        token="token",
+        api_url=fake_apify.url,
+        cache_dir=cache_dir,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_data(fake_apify, cache_dir):
+    items = [item async for item in stream_data(fake_apify, cache_dir)]
+
+    assert items == fake_apify.items
+    assert fake_apify.pages_count == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_data_yields_before_download_finishes(fake_apify, cache_dir):
+    async for _ in stream_data(fake_apify, cache_dir):
+        break
+
+    assert fake_apify.pages_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_data_caches_chunks(fake_apify, cache_dir):
+    items = [item async for item in stream_data(fake_apify, cache_dir)]
+    items_cached = [item async for item in stream_data(fake_apify, cache_dir)]
+
+    assert items_cached == items
+    assert fake_apify.runs_count == 1
+    assert fake_apify.pages_count == 3
+    assert get_cache(cache_dir).get("apify:honzajavorek/jobs-jobscz") == 25
+
+
+@pytest.mark.asyncio
+async def test_stream_data_caches_items_unchanged(fake_apify, cache_dir):
+    async for item in stream_data(fake_apify, cache_dir):
+        item.clear()
+    items_cached = [item async for item in stream_data(fake_apify, cache_dir)]
+
+    assert items_cached == fake_apify.items
+    assert fake_apify.runs_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_data_caches_empty_dataset(fake_apify, cache_dir):
+    fake_apify.items = []
+    items = [item async for item in stream_data(fake_apify, cache_dir)]
+    items_cached = [item async for item in stream_data(fake_apify, cache_dir)]
+
+    assert items == items_cached == []
+    assert fake_apify.runs_count == 1
+    assert get_cache(cache_dir).get("apify:honzajavorek/jobs-jobscz") == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_data_doesnt_cache_unfinished_download(fake_apify, cache_dir):
+    async for _ in stream_data(fake_apify, cache_dir):
+        break
+    items = [item async for item in stream_data(fake_apify, cache_dir)]
+
+    assert items == fake_apify.items
+    assert fake_apify.runs_count == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_data_missing_run(fake_apify, cache_dir):
+    with pytest.raises(RuntimeError, match="No successful runs"):
+        async for _ in stream_data(fake_apify, cache_dir, "honzajavorek/missing"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stream_data_missing_run_doesnt_raise(fake_apify, cache_dir):
+    items = [
+        item
+        async for item in apify.stream_data(
+            "honzajavorek/missing",
+            token="token",
+            raise_if_missing=False,
+            api_url=fake_apify.url,
+            cache_dir=cache_dir,
+        )
+    ]
+
+    assert items == []
+
+
+@pytest.mark.asyncio
+async def test_stream_data_from_cache_memory(fake_apify, cache_dir):
+    async for _ in stream_data(fake_apify, cache_dir):
+        pass
+
+    tracemalloc.start()
+    try:
+        async for _ in stream_data(fake_apify, cache_dir):
+            pass
+        _, peak_size = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    tracemalloc.start()
+    try:
+        items = [item async for item in stream_data(fake_apify, cache_dir)]
+        _, peak_size_list = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(items) == ITEMS_COUNT
+    assert peak_size < peak_size_list / 2
+
+
+def test_store_chunk_compresses(tmp_path):
+    cache = get_cache(str(tmp_path / "cache"))
+    items = [create_item(no) for no in range(100)]
+    apify.store_chunk(cache, "chunk", items)
+
+    assert len(cache.get("chunk")) < len(repr(items)) / 10
+    assert apify.load_chunk(cache, "chunk") == items
+    cache.close()
+
+
+def test_load_chunk_expired(tmp_path):
+    cache = get_cache(str(tmp_path / "cache"))
+
+    with pytest.raises(RuntimeError, match="expired"):
+        apify.load_chunk(cache, "chunk")
+    cache.close()
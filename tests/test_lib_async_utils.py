@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from jg.coop.lib.async_utils import merge
+
+
+async def generate(values: list, delay_s: float = 0):
+    for value in values:
+        await asyncio.sleep(delay_s)
+        yield value
+
+
+async def fail():
+    yield 1
+    raise ValueError("Download failed")
+
+
+@pytest.mark.asyncio
+async def test_merge():
+    values = [value async for value in merge(generate([1, 2, 3]), generate(["a", "b"]))]
+
+    assert sorted(values, key=str) == [1, 2, 3, "a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_merge_keeps_order_of_each_iterable():
+    values = [
+        value async for value in merge(generate([1, 2, 3], 0.01), generate(["a", "b"]))
+    ]
+
+    assert [value for value in values if isinstance(value, int)] == [1, 2, 3]
+    assert [value for value in values if isinstance(value, str)] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_merge_interleaves():
+    values = [
+        value
+        async for value in merge(generate([1, 2], 0.02), generate(["a", "b"], 0.03))
+    ]
+
+    assert values == [1, "a", 2, "b"]
+
+
+@pytest.mark.asyncio
+async def test_merge_empty():
+    assert [value async for value in merge()] == []
+
+
+@pytest.mark.asyncio
+async def test_merge_raises():
+    with pytest.raises(ValueError, match="Download failed"):
+        async for _ in merge(generate([1, 2, 3], 0.01), fail()):
+            pass
@@ -149,3 +149,66 @@ def test_milestones_label_respects_nbsp():
     annotation = result["annotations"]["velikonocni-pondeli-label"]
 
     assert annotation["content"] == ["Velikonoční pondělí"]
+
+
+def test_rollup_sum():
+    rollup = charts.Rollup(
+        [
+            (date(2021, 1, 31), "a", 1),
+            (date(2021, 2, 1), "a", 2),
+            (date(2021, 2, 1), "b", 4),
+            (date(2021, 2, 28), "b", 8),
+            (date(2021, 3, 1), "a", 16),
+        ]
+    )
+
+    assert rollup.sum(date(2021, 2, 1), date(2021, 2, 28)) == 14
+
+
+def test_rollup_sum_outside_range():
+    rollup = charts.Rollup([(date(2021, 2, 1), "a", 2)])
+
+    assert rollup.sum(date(2020, 1, 1), date(2020, 12, 31)) == 0
+    assert rollup.sum(date(2022, 1, 1), date(2022, 12, 31)) == 0
+
+
+def test_rollup_sum_same_day_and_category():
+    rollup = charts.Rollup([(date(2021, 2, 1), "a", 2), (date(2021, 2, 1), "a", 3)])
+
+    assert rollup.sum(date(2021, 2, 1), date(2021, 2, 1)) == 5
+
+
+def test_rollup_breakdown():
+    rollup = charts.Rollup(
+        [
+            (date(2021, 1, 31), "a", 1),
+            (date(2021, 2, 1), "a", 2),
+            (date(2021, 2, 1), "b", 4),
+            (date(2021, 2, 15), "c", 0),
+            (date(2021, 3, 1), "d", 16),
+        ]
+    )
+
+    assert rollup.breakdown(date(2021, 2, 1), date(2021, 2, 28)) == {
+        "a": 2,
+        "b": 4,
+        "c": 0,
+    }
+
+
+def test_rollup_ptc():
+    rollup = charts.Rollup(
+        [
+            (date(2021, 2, 1), True, 1),
+            (date(2021, 2, 1), False, 2),
+            (date(2021, 2, 1), None, 1),
+        ]
+    )
+
+    assert rollup.ptc(date(2021, 2, 1), date(2021, 2, 28), True) == 25
+
+
+def test_rollup_ptc_empty():
+    rollup = charts.Rollup([])
+
+    assert rollup.ptc(date(2021, 2, 1), date(2021, 2, 28), True) == 0
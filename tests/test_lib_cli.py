@@ -1,6 +1,15 @@
+import json
+import subprocess
+import sys
+from textwrap import dedent
+
+import click
 import pytest
 
-from jg.coop.lib.cli import command_name
+from jg.coop.lib.cli import LazyGroup, command_name, read_dependencies
+
+
+STARTUP_TIME_LIMIT_S = 5
 
 
 @pytest.mark.parametrize(
@@ -13,3 +22,111 @@ from jg.coop.lib.cli import command_name
 )
 def test_command_name(module, expected_name):
     assert command_name(module) == expected_name
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        (
+            """
+            @cli.sync_command(dependencies=["club-content", "roles"])
+            def main():
+                pass
+            """,
+            ["club-content", "roles"],
+        ),
+        (
+            """
+            @cli.sync_command(
+                dependencies=["club-content"],
+                input_files=["jg/coop/data/stages.yml"],
+            )
+            @click.option("--today", default=None)
+            @async_command
+            async def main(today):
+                pass
+            """,
+            ["club-content"],
+        ),
+        (
+            """
+            @cli.sync_command()
+            def main():
+                pass
+            """,
+            [],
+        ),
+        (
+            """
+            @cli.sync_command(dependencies=["roles"])
+            def helper():
+                pass
+
+            @cli.sync_command()
+            def main():
+                pass
+            """,
+            [],
+        ),
+    ],
+)
+def test_read_dependencies(tmp_path, source, expected):
+    path = tmp_path / "module.py"
+    path.write_text(dedent(source))
+
+    assert read_dependencies(path) == expected
+
+
+def test_lazy_group_imports_only_invoked_command(monkeypatch):
+    imported = []
+
+    def import_module(module_name):
+        imported.append(module_name)
+        return type("Module", (), dict(main=click.Command(module_name)))
+
+    monkeypatch.setattr("jg.coop.lib.cli.import_module", import_module)
+    group = LazyGroup(lazy_commands=dict(dogs="animals.dogs", cats="animals.cats"))
+    context = click.Context(group)
+
+    assert group.list_commands(context) == ["cats", "dogs"]
+    assert group.get_command(context, "dogs").name == "animals.dogs"
+    assert group.get_command(context, "cows") is None
+    assert imported == ["animals.dogs"]
+
+
+def test_jg_startup():
+    code = dedent(
+        """
+        import json, sys, time
+
+        start = time.perf_counter()
+        from jg.coop.cli import main
+
+        context = main.make_context("jg", ["sync", "stages"])
+        sync = main.get_command(context, "sync")
+        sync.get_command(context, "stages")
+        sync.dependencies_map
+        time_s = time.perf_counter() - start
+
+        modules = [name for name in sys.modules if name.startswith("jg.coop.")]
+        playwright = "playwright" in sys.modules
+        print(json.dumps(dict(time_s=time_s, modules=modules, playwright=playwright)))
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    startup = json.loads(result.stdout.splitlines()[-1])
+    modules = set(startup["modules"])
+
+    assert "jg.coop.sync.stages" in modules
+    assert not modules & {
+        "jg.coop.cli.web",
+        "jg.coop.cli.backup",
+        "jg.coop.sync.club_content",
+        "jg.coop.sync.pages",
+        "jg.coop.lib.discord_club",
+        "jg.coop.lib.images",
+    }
+    assert startup["playwright"] is False
+    assert startup["time_s"] < STARTUP_TIME_LIMIT_S
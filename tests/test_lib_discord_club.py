@@ -1,8 +1,10 @@
 from collections import namedtuple
 from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
 
 import pytest
-from discord import ChannelType, Route
+from discord import ChannelType, NotFound, Route
+from diskcache import Cache
 
 from jg.coop.lib import discord_club
 from jg.coop.lib.mutations import MutationsNotAllowedError
@@ -338,3 +340,110 @@ def test_get_channel_name_dm():
 )
 def test_parse_channel(channel, expected):
     assert discord_club.parse_channel(channel) == expected
+
+
+class StubHTTP:
+    def __init__(self, channels_ids):
+        self.channels_ids = channels_ids
+
+    async def logs_from(self, channel_id, limit, **kwargs):
+        if channel_id not in self.channels_ids:
+            raise NotFound(SimpleNamespace(status=404, reason="Not Found"), "")
+        return []
+
+
+class StubState:
+    def __init__(self, channels_ids=None):
+        self.http = StubHTTP(channels_ids or set())
+        self.user = None
+        self.dm_channels = {}
+
+    def store_user(self, data):
+        return StubUser(data["id"])
+
+
+class StubDMMember:
+    def __init__(self, id, state, dm_channel_id=None):
+        self.id = id
+        self.name = "gargamel"
+        self.discriminator = "0"
+        self.global_name = "Gargamel"
+        self.avatar = None
+        self.bot = False
+        self._state = state
+        self.dm_channel_id = dm_channel_id
+        self.create_dm_calls = 0
+
+    @property
+    def dm_channel(self):
+        return self._state.dm_channels.get(self.id)
+
+    async def create_dm(self):
+        self.create_dm_calls += 1
+        self._state.http.channels_ids.add(self.dm_channel_id)
+        self._state.dm_channels[self.id] = SimpleNamespace(id=self.dm_channel_id)
+        return self._state.dm_channels[self.id]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = Cache(tmp_path)
+    yield cache
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_dm_channel_reuses_persisted_channel(cache):
+    member = StubDMMember(123, StubState(), dm_channel_id=456)
+    channel = await discord_club.get_or_create_dm_channel(member, cache=cache)
+    member_next_run = StubDMMember(123, StubState({456}))
+    channel_next_run = await discord_club.get_or_create_dm_channel(
+        member_next_run, cache=cache
+    )
+
+    assert channel.id == 456
+    assert member.create_dm_calls == 1
+    assert channel_next_run.id == 456
+    assert channel_next_run.recipient.id == 123
+    assert member_next_run.create_dm_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_dm_channel_uses_channel_in_memory(cache):
+    state = StubState()
+    state.dm_channels[123] = SimpleNamespace(id=789)
+    member = StubDMMember(123, state, dm_channel_id=456)
+    channel = await discord_club.get_or_create_dm_channel(member, cache=cache)
+
+    assert channel.id == 789
+    assert member.create_dm_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_dm_channel_replaces_channel_which_is_gone(cache):
+    member = StubDMMember(123, StubState(), dm_channel_id=456)
+    await discord_club.get_or_create_dm_channel(member, cache=cache)
+    member_next_run = StubDMMember(123, StubState(), dm_channel_id=789)
+    channel = await discord_club.get_or_create_dm_channel(member_next_run, cache=cache)
+    member_last_run = StubDMMember(123, StubState({789}))
+    channel_last_run = await discord_club.get_or_create_dm_channel(
+        member_last_run, cache=cache
+    )
+
+    assert channel.id == 789
+    assert member_next_run.create_dm_calls == 1
+    assert channel_last_run.id == 789
+    assert member_last_run.create_dm_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_dm_channel_without_verification(cache):
+    member = StubDMMember(123, StubState(), dm_channel_id=456)
+    await discord_club.get_or_create_dm_channel(member, cache=cache)
+    member_next_run = StubDMMember(123, StubState())
+    channel = await discord_club.get_or_create_dm_channel(
+        member_next_run, cache=cache, verify=False
+    )
+
+    assert channel.id == 456
+    assert member_next_run.create_dm_calls == 0
@@ -0,0 +1,253 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+
+from jg.coop.lib.discord_rate_limits import AdaptiveRateLimiter
+
+
+GLOBAL_LIMIT = 20
+
+GLOBAL_WINDOW_S = 0.1
+
+BUCKET_LIMIT = 5
+
+BUCKET_WINDOW_S = 0.05
+
+LATENCY_S = 0.005
+
+
+class FakeWindow:
+    def __init__(self, limit: int, window_s: float):
+        self.limit = limit
+        self.window_s = window_s
+        self.remaining = limit
+        self.reset_at = None
+
+    def hit(self, now: float) -> bool:
+        if self.reset_at is None or now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window_s
+        if self.remaining:
+            self.remaining -= 1
+            return True
+        return False
+
+
+class FakeRateLimitedAPI:
+    """
+    Imitates how Discord rate limits requests
+
+    Every channel has its own bucket, which is described by headers
+    of the responses. The global limit isn't described by any headers.
+    """
+
+    def __init__(
+        self,
+        global_limit: int = GLOBAL_LIMIT,
+        global_window_s: float = GLOBAL_WINDOW_S,
+        bucket_limit: int = BUCKET_LIMIT,
+        bucket_window_s: float = BUCKET_WINDOW_S,
+    ):
+        self.global_window = FakeWindow(global_limit, global_window_s)
+        self.bucket_limit = bucket_limit
+        self.bucket_window_s = bucket_window_s
+        self.buckets = {}
+        self.requests_count = 0
+        self.rate_limited_count = 0
+
+    def respond(self, major: str) -> tuple[int, dict[str, str]]:
+        now = time.monotonic()
+        bucket = self.buckets.setdefault(
+            major, FakeWindow(self.bucket_limit, self.bucket_window_s)
+        )
+        if bucket.hit(now) and self.global_window.hit(now):
+            self.requests_count += 1
+            status = 200
+        else:
+            self.rate_limited_count += 1
+            status = 429
+        return status, {
+            "X-RateLimit-Bucket": "abc123",
+            "X-RateLimit-Limit": str(bucket.limit),
+            "X-RateLimit-Remaining": str(bucket.remaining),
+            "X-RateLimit-Reset-After": str(
+                math.ceil((bucket.reset_at - now) * 1000) / 1000
+            ),
+        }
+
+    async def request(
+        self, limiter: AdaptiveRateLimiter, route_key: str, major: str = ""
+    ) -> None:
+        while True:
+            async with limiter.request(route_key, major):
+                await asyncio.sleep(LATENCY_S)
+                status, headers = self.respond(major)
+                await limiter.observe(status, headers)
+            if status != 429:
+                return
+            await asyncio.sleep(float(headers["X-RateLimit-Reset-After"]))
+
+
+class FixedConcurrency(AdaptiveRateLimiter):
+    @asynccontextmanager
+    async def request(self, route_key, major=""):
+        yield
+
+    async def observe(self, status, headers, route_key=None, major=""):
+        pass
+
+
+async def crawl(
+    api: FakeRateLimitedAPI,
+    limiter: AdaptiveRateLimiter,
+    channels_count: int = 20,
+    pages_count: int = 10,
+) -> float:
+    queue = asyncio.Queue()
+    for channel_no in range(channels_count):
+        queue.put_nowait(channel_no)
+
+    async def worker():
+        while True:
+            channel_no = await queue.get()
+            async with limiter.worker():
+                for _ in range(pages_count):
+                    route_key = "GET /channels/{channel_id}/messages"
+                    await api.request(limiter, route_key, str(channel_no))
+            queue.task_done()
+
+    started_at = time.monotonic()
+    workers = [asyncio.create_task(worker()) for _ in range(limiter.max_concurrency)]
+    await queue.join()
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    return time.monotonic() - started_at
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_avoids_rate_limits_and_keeps_throughput():
+    api = FakeRateLimitedAPI()
+    limiter = AdaptiveRateLimiter(
+        global_limit=GLOBAL_LIMIT, global_window_s=GLOBAL_WINDOW_S
+    )
+    time_s = await crawl(api, limiter)
+    throughput = api.requests_count / time_s
+    throughput_limit = GLOBAL_LIMIT / GLOBAL_WINDOW_S
+
+    assert api.requests_count == 200
+    assert api.rate_limited_count == 0
+    assert limiter.rate_limited_count == 0
+    assert throughput > 0.6 * throughput_limit
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_counts_requests_in_flight_and_finished():
+    now = 0.0
+    limiter = AdaptiveRateLimiter(global_limit=2, global_window_s=1, clock=lambda: now)
+    async with limiter.request("GET /a", "1"):
+        async with limiter.request("GET /b", "2"):
+            assert limiter.get_wait_time("GET /c", "3") == 0  # waits for one to finish
+        now = 0.5
+        assert limiter.get_wait_time("GET /c", "3") == 0.5  # finished still counts
+    now = 0.75
+    assert limiter.get_wait_time("GET /c", "3") == 0.25
+    now = 1.0
+    assert limiter.get_wait_time("GET /c", "3") is None
+
+
+@pytest.mark.asyncio
+async def test_fixed_concurrency_gets_rate_limited():
+    api = FakeRateLimitedAPI()
+    limiter = FixedConcurrency(initial_concurrency=16, max_concurrency=16)
+    await crawl(api, limiter)
+
+    assert api.rate_limited_count > 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_records_wait_time_per_route():
+    api = FakeRateLimitedAPI(bucket_limit=2, bucket_window_s=0.05)
+    limiter = AdaptiveRateLimiter()
+    for _ in range(4):
+        await api.request(limiter, "GET /users/@me")
+
+    assert limiter.requests_counts == {"GET /users/@me": 4}
+    assert limiter.wait_times["GET /users/@me"] > 0.02
+    assert api.rate_limited_count == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_unknown_route_goes_one_by_one():
+    limiter = AdaptiveRateLimiter()
+    async with limiter.request("GET /users/@me"):
+        assert limiter.get_wait_time("GET /users/@me") == 0
+    assert limiter.get_wait_time("GET /users/@me") is None
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_scales_up_with_headroom():
+    limiter = AdaptiveRateLimiter(initial_concurrency=2, max_concurrency=3)
+    headers = {
+        "X-RateLimit-Bucket": "abc123",
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "9",
+        "X-RateLimit-Reset-After": "1",
+    }
+    for _ in range(5):
+        await limiter.observe(200, headers, route_key="GET /users/@me")
+
+    assert limiter.concurrency == 3
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_backs_off_on_low_headroom():
+    limiter = AdaptiveRateLimiter(initial_concurrency=4)
+    headers = {
+        "X-RateLimit-Bucket": "abc123",
+        "X-RateLimit-Limit": "10",
+        "X-RateLimit-Remaining": "1",
+        "X-RateLimit-Reset-After": "1",
+    }
+    await limiter.observe(200, headers, route_key="GET /users/@me")
+
+    assert limiter.concurrency == 3
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_halves_concurrency_on_rate_limit():
+    limiter = AdaptiveRateLimiter(initial_concurrency=8)
+    await limiter.observe(429, {}, route_key="GET /users/@me")
+
+    assert limiter.concurrency == 4
+    assert limiter.rate_limited_count == 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_observe_without_route():
+    limiter = AdaptiveRateLimiter(initial_concurrency=8)
+    await limiter.observe(429, {})
+
+    assert limiter.concurrency == 8
+    assert limiter.rate_limited_count == 0
+
+
+@pytest.mark.asyncio
+async def test_adaptive_rate_limiter_worker_respects_concurrency():
+    limiter = AdaptiveRateLimiter(initial_concurrency=2, max_concurrency=2)
+    running, running_max = 0, 0
+
+    async def work():
+        nonlocal running, running_max
+        async with limiter.worker():
+            running += 1
+            running_max = max(running, running_max)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[work() for _ in range(6)])
+
+    assert running_max == 2
@@ -0,0 +1,163 @@
+import asyncio
+import pstats
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from jg.coop.lib import discord_task, global_state, profiling
+
+
+class FakeClient:
+    instances_count = 0
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._ready = asyncio.Event()
+        self._closed = asyncio.Event()
+        FakeClient.instances_count += 1
+
+    async def start(self, token):
+        self._ready.set()
+        await self._closed.wait()
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    async def close(self):
+        self._closed.set()
+
+
+class BrokenClient(FakeClient):
+    async def start(self, token):
+        raise ConnectionError("Login failed")
+
+
+@pytest.fixture
+def client_cls():
+    FakeClient.instances_count = 0
+    return FakeClient
+
+
+async def get_client(client):
+    return client
+
+
+async def fail(client):
+    raise ValueError("Task failed")
+
+
+def test_session_connects_once(client_cls):
+    session = discord_task.Session(client_cls)
+    clients = [session.run(get_client) for _ in range(3)]
+    session.close()
+
+    assert client_cls.instances_count == 1
+    assert clients[0] is clients[1] is clients[2]
+    assert session.tasks_count == 3
+
+
+def test_session_connects_lazily(client_cls):
+    session = discord_task.Session(client_cls)
+    session.close()
+
+    assert client_cls.instances_count == 0
+
+
+def test_session_passes_arguments(client_cls):
+    async def task(client, a, b=None):
+        return a, b
+
+    session = discord_task.Session(client_cls)
+    result = session.run(task, 1, b=2)
+    session.close()
+
+    assert result == (1, 2)
+
+
+def test_session_raises_task_exception(client_cls):
+    session = discord_task.Session(client_cls)
+    with pytest.raises(ValueError, match="Task failed"):
+        session.run(fail)
+    client = session.run(get_client)
+    session.close()
+
+    assert isinstance(client, FakeClient)
+
+
+def test_session_raises_connection_exception():
+    session = discord_task.Session(BrokenClient)
+    with pytest.raises(ConnectionError, match="Login failed"):
+        session.run(get_client)
+
+    assert session.client is None
+
+
+def test_session_requires_async_function(client_cls):
+    def task(client):
+        pass
+
+    session = discord_task.Session(client_cls)
+    with pytest.raises(TypeError):
+        session.run(task)
+    session.close()
+
+
+def test_run_uses_session(client_cls):
+    clients = []
+
+    async def task(client):
+        clients.append(client)
+
+    with discord_task.session(client_cls):
+        discord_task.run(task)
+        discord_task.run(task)
+
+    assert client_cls.instances_count == 1
+    assert clients[0] is clients[1]
+    assert discord_task._session is None
+
+
+def test_session_counts_tasks_from_threads(client_cls):
+    session = discord_task.Session(client_cls)
+    threads = [
+        threading.Thread(target=session.run, args=[get_client]) for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.close()
+
+    assert client_cls.instances_count == 1
+    assert session.tasks_count == 20
+
+
+def test_session_profiles_tasks(client_cls, tmp_path, monkeypatch):
+    async def work_in_discord_task(client):
+        return sum(range(100))
+
+    monkeypatch.setenv(global_state.ENV_KEY, "{}")
+    profiling.enable(tmp_path)
+    with profiling.profiling("dogs"):
+        session = discord_task.Session(client_cls)
+        session.run(work_in_discord_task)
+        session.close()
+    stats = pstats.Stats(str(tmp_path / "dogs.pstats"))
+
+    assert "work_in_discord_task" in {name for _, _, name in stats.stats.keys()}
+
+
+def test_import_doesnt_import_discord():
+    code = (
+        "import sys; "
+        "import jg.coop.cli.sync; "
+        "from jg.coop.lib import discord_task; "
+        "print('discord' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,135 @@
+import pytest
+from diskcache import Cache
+from peewee import CharField
+
+from jg.coop.lib import fingerprints
+from jg.coop.models.base import BaseModel
+
+from testing_utils import prepare_test_db
+
+
+class Animal(BaseModel):
+    name = CharField()
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([Animal])
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = Cache(tmp_path / "cache")
+    monkeypatch.setattr(fingerprints, "get_cache", lambda: cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "dogs.yml").write_text("- Rex\n")
+    (data_dir / "cats.yml").write_text("- Tom\n")
+    return data_dir
+
+
+def test_fingerprint_is_stable(data_dir):
+    assert fingerprints.fingerprint(files=["data/*.yml"]) == fingerprints.fingerprint(
+        files=["data/*.yml"]
+    )
+
+
+def test_fingerprint_files_changed(data_dir):
+    fingerprint = fingerprints.fingerprint(files=["data/*.yml"])
+    (data_dir / "dogs.yml").write_text("- Rex\n- Lassie\n")
+
+    assert fingerprints.fingerprint(files=["data/*.yml"]) != fingerprint
+
+
+def test_fingerprint_files_added(data_dir):
+    fingerprint = fingerprints.fingerprint(files=["data/*.yml"])
+    (data_dir / "cows.yml").write_text("- Milka\n")
+
+    assert fingerprints.fingerprint(files=["data/*.yml"]) != fingerprint
+
+
+def test_fingerprint_tables_changed(test_db):
+    Animal.create(name="Rex")
+    fingerprint = fingerprints.fingerprint(tables=[Animal])
+    Animal.create(name="Tom")
+
+    assert fingerprints.fingerprint(tables=[Animal]) != fingerprint
+
+
+def test_fingerprint_tables_missing(test_db):
+    fingerprint = fingerprints.fingerprint(tables=[Animal])
+    test_db.drop_tables([Animal])
+
+    assert fingerprints.fingerprint(tables=[Animal]) != fingerprint
+
+
+def test_fingerprint_tables_row_replaced(test_db):
+    rex = Animal.create(name="Rex")
+    Animal.create(name="Tom")
+    fingerprint = fingerprints.fingerprint(tables=[Animal])
+    rex.delete_instance()
+    Animal.create(name="Lassie")
+
+    assert fingerprints.fingerprint(tables=[Animal]) != fingerprint
+
+
+def test_fingerprint_tables_doesnt_read_rows(test_db):
+    Animal.create(name="Rex")
+
+    with test_db.count_queries() as queries:
+        fingerprints.fingerprint(tables=[Animal])
+
+    assert queries.count == 1
+
+
+def test_fingerprint_dependencies_changed():
+    assert fingerprints.fingerprint(
+        dependencies=["abc", None]
+    ) != fingerprints.fingerprint(dependencies=["def", None])
+
+
+def test_fingerprint_cache_tags_changed(cache):
+    cache.set("dogs", 1, tag="animals")
+    fingerprint = fingerprints.fingerprint(cache_tags=["animals"])
+    cache.set("cats", 2, tag="animals")
+
+    assert fingerprints.fingerprint(cache_tags=["animals"]) != fingerprint
+
+
+def test_fingerprint_cache_tags_unrelated_change(cache):
+    cache.set("dogs", 1, tag="animals")
+    fingerprint = fingerprints.fingerprint(cache_tags=["animals"])
+    cache.set("roses", 2, tag="plants")
+
+    assert fingerprints.fingerprint(cache_tags=["animals"]) == fingerprint
+
+
+def test_fingerprint_params_changed():
+    assert fingerprints.fingerprint(
+        params=dict(today="2024-01-01")
+    ) != fingerprints.fingerprint(params=dict(today="2024-01-02"))
+
+
+def test_fingerprint_sources():
+    assert fingerprints.fingerprint(fn=test_fingerprint_sources) != (
+        fingerprints.fingerprint()
+    )
+
+
+def test_glob_files(data_dir):
+    paths = fingerprints.glob_files(["data/*.yml", "data/*.txt"], cwd=data_dir.parent)
+
+    assert sorted(path.name for path in paths) == ["cats.yml", "dogs.yml"]
+
+
+def test_get_module_sources():
+    assert fingerprints.get_module_sources(test_get_module_sources) == [
+        fingerprints.Path(__file__)
+    ]
@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from jg.coop.lib import llm
+from jg.coop.lib.mutations import MutationsNotAllowedError
+
+
+@pytest.fixture
+def fetch_json(monkeypatch):
+    calls = []
+
+    async def fetch_json(content_hash, system_prompt, user_prompt):
+        if "cached" in user_prompt:
+            return {"prompt": user_prompt}
+        for _ in range(2 if "retried" in user_prompt else 1):
+            llm._asked.add(content_hash)
+            calls.append(content_hash)
+        await asyncio.sleep(0.01)
+        if "forbidden" in user_prompt:
+            raise MutationsNotAllowedError()
+        return {"prompt": user_prompt}
+
+    monkeypatch.setattr(llm, "fetch_json", fetch_json)
+    llm.reset_stats()
+    return calls
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Junior Python Developer", "junior python developer"),
+        ("  Junior\n\nPython\tDeveloper ", "junior python developer"),
+        ("Ｊｕｎｉｏｒ", "junior"),
+        ("Straße", "strasse"),
+    ],
+)
+def test_normalize_content(text: str, expected: str):
+    assert llm.normalize_content(text) == expected
+
+
+def test_hash_content_same_for_near_identical_content():
+    assert llm.hash_content("System", "Junior Python Developer\n\nPrague") == (
+        llm.hash_content("System", "junior python  developer\nPrague ")
+    )
+
+
+def test_hash_content_differs_for_different_content():
+    assert llm.hash_content("System", "Junior Python Developer") != (
+        llm.hash_content("System", "Senior Python Developer")
+    )
+
+
+def test_hash_content_differs_for_different_system_prompt():
+    assert llm.hash_content("System", "Junior Python Developer") != (
+        llm.hash_content("Another system", "Junior Python Developer")
+    )
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_coalesces_same_content(fetch_json):
+    replies = await asyncio.gather(
+        llm.ask_for_json("System", "Junior Python Developer"),
+        llm.ask_for_json("System", "junior  python developer"),
+        llm.ask_for_json("System", "Junior Python Developer"),
+        llm.ask_for_json("System", "Senior Python Developer"),
+    )
+
+    assert replies == [
+        {"prompt": "Junior Python Developer"},
+        {"prompt": "Junior Python Developer"},
+        {"prompt": "Junior Python Developer"},
+        {"prompt": "Senior Python Developer"},
+    ]
+    assert len(fetch_json) == 2
+    assert llm.stats == llm.Stats(requests_count=4, calls_count=2, coalesced_count=2)
+    assert llm.stats.saved_count == 2
+    assert llm._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_counts_retried_call_once(fetch_json):
+    await llm.ask_for_json("System", "retried")
+
+    assert len(fetch_json) == 2
+    assert llm.stats == llm.Stats(requests_count=1, calls_count=1)
+    assert llm._asked == set()
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_doesnt_count_cached_reply_as_call(fetch_json):
+    await llm.ask_for_json("System", "cached")
+
+    assert llm.stats == llm.Stats(requests_count=1, calls_count=0)
+    assert llm.stats.saved_count == 1
+
+
+@pytest.mark.asyncio
+async def test_reset_stats(fetch_json):
+    await llm.ask_for_json("System", "Junior Python Developer")
+    llm.reset_stats()
+    await llm.ask_for_json("System", "cached")
+
+    assert llm.stats == llm.Stats(requests_count=1, calls_count=0)
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_returns_copies(fetch_json):
+    replies = await asyncio.gather(
+        llm.ask_for_json("System", "Junior Python Developer"),
+        llm.ask_for_json("System", "Junior Python Developer"),
+    )
+    replies[0]["is_relevant"] = True
+
+    assert replies[1] == {"prompt": "Junior Python Developer"}
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_asks_again_after_reply(fetch_json):
+    await llm.ask_for_json("System", "Junior Python Developer")
+    await llm.ask_for_json("System", "Junior Python Developer")
+
+    assert len(fetch_json) == 2
+    assert llm.stats.coalesced_count == 0
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_coalesces_exceptions(fetch_json):
+    results = await asyncio.gather(
+        llm.ask_for_json("System", "forbidden"),
+        llm.ask_for_json("System", "Forbidden"),
+        return_exceptions=True,
+    )
+
+    assert [type(result) for result in results] == [
+        MutationsNotAllowedError,
+        MutationsNotAllowedError,
+    ]
+    assert len(fetch_json) == 1
+    assert llm._in_flight == {}
+
+
+@pytest.mark.asyncio
+async def test_ask_for_json_cancelled(fetch_json):
+    task = asyncio.create_task(llm.ask_for_json("System", "Junior Python Developer"))
+    waiting_task = asyncio.create_task(
+        llm.ask_for_json("System", "Junior Python Developer")
+    )
+    await asyncio.sleep(0)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting_task
+    assert llm._in_flight == {}
@@ -0,0 +1,72 @@
+import pstats
+import threading
+from multiprocessing import Pool
+
+import pytest
+
+from jg.coop.lib import global_state, profiling
+
+
+@pytest.fixture(autouse=True)
+def clean_global_state(monkeypatch):
+    monkeypatch.setenv(global_state.ENV_KEY, "{}")
+
+
+def work_in_main_thread():
+    return sum(range(100))
+
+
+@profiling.profiled
+def work_in_thread():
+    return sum(range(100))
+
+
+@profiling.profiled
+def work_in_worker(number):
+    return number * 2
+
+
+def get_functions_names(path):
+    return {name for _, _, name in pstats.Stats(str(path)).stats.keys()}
+
+
+def test_profiling_disabled(tmp_path):
+    with profiling.profiling("dogs"):
+        work_in_main_thread()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiling_main_thread(tmp_path):
+    profiling.enable(tmp_path)
+    with profiling.profiling("dogs"):
+        work_in_main_thread()
+
+    assert [path.name for path in tmp_path.iterdir()] == ["dogs.pstats"]
+    assert "work_in_main_thread" in get_functions_names(tmp_path / "dogs.pstats")
+
+
+def test_profiling_thread(tmp_path):
+    profiling.enable(tmp_path)
+    with profiling.profiling("dogs"):
+        thread = threading.Thread(target=work_in_thread)
+        thread.start()
+        thread.join()
+
+    assert "work_in_thread" in get_functions_names(tmp_path / "dogs.pstats")
+
+
+def test_profiling_pool_workers(tmp_path):
+    profiling.enable(tmp_path)
+    with profiling.profiling("dogs"):
+        with Pool(2) as pool:
+            assert sorted(pool.map(work_in_worker, range(10))) == list(range(0, 20, 2))
+
+    assert "work_in_worker" in get_functions_names(tmp_path / "dogs.pstats")
+
+
+def test_profiled_outside_of_command(tmp_path):
+    profiling.enable(tmp_path)
+
+    assert work_in_thread() == 4950
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+from diskcache import Cache
+
+from jg.coop.lib import sync_history
+
+
+NS_IN_MIN = 60000000000
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = Cache(tmp_path)
+    yield cache
+    cache.close()
+
+
+def prepare_records(*minutes):
+    return [
+        sync_history.Record(
+            sync_id=str(index),
+            recorded_at=datetime(2024, 1, 1).isoformat(),
+            time_diff=round(time_diff_min * NS_IN_MIN),
+        )
+        for index, time_diff_min in enumerate(minutes)
+    ]
+
+
+def test_record_appends(cache):
+    sync_history.record("dogs", 1, 5, now=datetime(2024, 1, 1), cache=cache)
+    sync_history.record("dogs", 2, 7, now=datetime(2024, 1, 2), cache=cache)
+    sync_history.record("cats", 2, 3, now=datetime(2024, 1, 2), cache=cache)
+
+    assert sync_history.load(["dogs", "cats", "cows"], cache=cache) == {
+        "cats": [dict(sync_id="2", recorded_at="2024-01-02T00:00:00", time_diff=3)],
+        "dogs": [
+            dict(sync_id="1", recorded_at="2024-01-01T00:00:00", time_diff=5),
+            dict(sync_id="2", recorded_at="2024-01-02T00:00:00", time_diff=7),
+        ],
+    }
+
+
+def test_record_keeps_limited_number_of_records(cache, monkeypatch):
+    monkeypatch.setattr(sync_history, "MAX_RECORDS", 3)
+    for time_diff in range(5):
+        sync_history.record("dogs", time_diff, time_diff, cache=cache)
+    records = sync_history.load(["dogs"], cache=cache)["dogs"]
+
+    assert [record["time_diff"] for record in records] == [2, 3, 4]
+
+
+@pytest.mark.parametrize(
+    "ptc, expected",
+    [
+        (0, 1),
+        (50, 3),
+        (90, 7.6),
+        (100, 10),
+    ],
+)
+def test_percentile(ptc, expected):
+    assert sync_history.percentile([10, 1, 3, 2, 4], ptc) == pytest.approx(expected)
+
+
+def test_percentile_empty():
+    with pytest.raises(ValueError):
+        sync_history.percentile([], 50)
+
+
+def test_median_durations():
+    history = dict(dogs=prepare_records(1, 2, 10), cats=prepare_records(3))
+
+    assert sync_history.median_durations(history) == dict(
+        dogs=2 * NS_IN_MIN, cats=3 * NS_IN_MIN
+    )
+
+
+def test_get_stats():
+    stats = sync_history.get_stats(prepare_records(2, 2, 4, 3))
+
+    assert stats["count"] == 4
+    assert stats["last"] == 3 * NS_IN_MIN
+    assert stats["p50"] == 2.5 * NS_IN_MIN
+    assert stats["baseline"] == 2 * NS_IN_MIN
+    assert stats["change_ptc"] == 50
+    assert stats["is_regression"] is False
+
+
+def test_get_stats_regression():
+    stats = sync_history.get_stats(prepare_records(2, 2, 2, 5))
+
+    assert stats["is_regression"] is True
+
+
+def test_get_stats_regression_threshold():
+    stats = sync_history.get_stats(prepare_records(2, 2, 2, 5), threshold_ptc=200)
+
+    assert stats["is_regression"] is False
+
+
+def test_get_stats_regression_ignores_short_commands():
+    stats = sync_history.get_stats(
+        prepare_records(0.1, 0.1, 0.1, 0.3), min_diff=timedelta(seconds=30)
+    )
+
+    assert stats["change_ptc"] == pytest.approx(200)
+    assert stats["is_regression"] is False
+
+
+def test_get_stats_single_record():
+    stats = sync_history.get_stats(prepare_records(2))
+
+    assert stats["baseline"] is None
+    assert stats["change_ptc"] is None
+    assert stats["is_regression"] is False
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        ([1, 1, 1], "▁▁▁"),
+        ([1, 8], "▁█"),
+        ([0, 7, 14], "▁▅█"),
+    ],
+)
+def test_sparkline(values, expected):
+    assert sync_history.sparkline(values) == expected
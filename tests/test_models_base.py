@@ -1,8 +1,38 @@
 from datetime import date, datetime, time
 
 import pytest
+from peewee import EXCLUDED, CharField, IntegerField, fn
 
-from jg.coop.models.base import json_dumps
+from jg.coop.models.base import (
+    BULK_BATCH_SIZE,
+    PRAGMAS_PROFILES,
+    BaseModel,
+    BulkWriter,
+    QueryStats,
+    SqliteDatabase,
+    is_batch_statement,
+    json_dumps,
+    normalize_sql,
+)
+
+from testing_utils import assert_max_queries, prepare_test_db
+
+
+ROWS_COUNT = 2000
+
+
+class Animal(BaseModel):
+    name = CharField()
+
+
+class Score(BaseModel):
+    name = CharField(unique=True)
+    value = IntegerField(default=0)
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([Animal, Score])
 
 
 @pytest.mark.parametrize(
@@ -39,3 +69,267 @@ def test_json_dumps_item():
         '"employment_types": ["full-time"]'
         "}"
     )
+
+
+def test_count_queries(test_db):
+    Animal.create(name="Rex")
+    with test_db.count_queries() as queries:
+        for animal in Animal.select():
+            Animal.get_by_id(animal.id)
+        Animal.select().count()
+
+    assert queries.count == 3
+    assert queries.time_s > 0
+
+
+def test_count_queries_nested(test_db):
+    with test_db.count_queries() as outer_queries:
+        Animal.select().count()
+        with test_db.count_queries() as inner_queries:
+            Animal.select().count()
+
+    assert outer_queries.count == 2
+    assert inner_queries.count == 1
+
+
+def test_count_queries_n_plus_one(test_db):
+    for i in range(5):
+        Animal.create(name=f"Rex {i}")
+    with test_db.count_queries() as queries:
+        for animal in Animal.select():
+            Animal.get_by_id(animal.id)
+
+    assert queries.n_plus_one(threshold=4) == [
+        (
+            'SELECT "t1"."id", "t1"."name" FROM "animal" AS "t1" '
+            'WHERE ("t1"."id" = ?) LIMIT ? OFFSET ?',
+            5,
+        )
+    ]
+    assert queries.n_plus_one(threshold=5) == []
+
+
+def test_count_queries_n_plus_one_ignores_batch_inserts(test_db):
+    with test_db.count_queries() as queries:
+        with BulkWriter(Animal, batch_size=2) as writer:
+            for i in range(250):
+                writer.add(dict(name=f"Rex {i}"))
+
+    assert queries.counts['INSERT INTO "animal" ("name") VALUES (?), (?)'] == 125
+    assert queries.n_plus_one() == []
+
+
+def test_count_queries_n_plus_one_single_row_inserts(test_db):
+    with test_db.count_queries() as queries:
+        for i in range(5):
+            Animal.create(name=f"Rex {i}")
+
+    assert queries.n_plus_one(threshold=4) == [
+        ('INSERT INTO "animal" ("name") VALUES (?)', 5)
+    ]
+
+
+def test_query_stats_most_common():
+    queries = QueryStats()
+    queries.record("SELECT 1", 10)
+    queries.record("SELECT 2", 10)
+    queries.record("SELECT 2", 10)
+
+    assert queries.most_common(1) == [("SELECT 2", 2)]
+    assert queries.time_s == 30 / 1_000_000_000
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT  *\n  FROM animal", "SELECT * FROM animal"),
+        (
+            "SELECT * FROM animal WHERE id IN (?, ?, ?)",
+            "SELECT * FROM animal WHERE id IN (?, ...)",
+        ),
+        ("SELECT * FROM animal WHERE id = ?", "SELECT * FROM animal WHERE id = ?"),
+    ],
+)
+def test_normalize_sql(sql, expected):
+    assert normalize_sql(sql) == expected
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        ('INSERT INTO "animal" ("name") VALUES (?), (?)', True),
+        ('INSERT INTO "animal" ("id", "name") VALUES (?, ...), (?, ...)', True),
+        ('INSERT OR IGNORE INTO "animal" ("name") VALUES (?), (?)', True),
+        ('REPLACE INTO "animal" ("name") VALUES (?), (?)', True),
+        ('INSERT INTO "animal" ("name") VALUES (?)', False),
+        ('SELECT * FROM "animal" WHERE ("id" IN (?), (?))', False),
+        ("BEGIN", True),
+        ("SAVEPOINT s1234", True),
+    ],
+)
+def test_is_batch_statement(statement, expected):
+    assert is_batch_statement(statement) is expected
+
+
+def test_assert_max_queries(test_db):
+    with assert_max_queries(test_db, 2):
+        Animal.select().count()
+        Animal.select().count()
+
+
+def test_assert_max_queries_fails(test_db):
+    with pytest.raises(pytest.fail.Exception, match="Executed 3 SQL queries"):
+        with assert_max_queries(test_db, 2):
+            Animal.select().count()
+            Animal.select().count()
+            Animal.select().count()
+
+
+def test_bulk_writer(test_db):
+    with test_db.count_queries() as queries:
+        with BulkWriter(Animal, batch_size=2) as writer:
+            writer.add_many(dict(name=f"Rex {i}") for i in range(5))
+
+    assert writer.count == 5
+    assert [animal.name for animal in Animal.select().order_by(Animal.id)] == [
+        "Rex 0",
+        "Rex 1",
+        "Rex 2",
+        "Rex 3",
+        "Rex 4",
+    ]
+    assert (
+        sum(
+            count
+            for statement, count in queries.most_common()
+            if statement.startswith("INSERT")
+        )
+        == 3
+    )
+
+
+def test_bulk_writer_model_instances(test_db):
+    with BulkWriter(Score) as writer:
+        writer.add(Score(name="Rex"))
+        writer.add(Score(name="Fido", value=3))
+
+    assert [(score.name, score.value) for score in Score.select()] == [
+        ("Rex", 0),
+        ("Fido", 3),
+    ]
+
+
+def test_bulk_writer_different_keys(test_db):
+    with BulkWriter(Score) as writer:
+        writer.add(dict(name="Rex", value=3))
+        writer.add(dict(name="Fido"))
+
+    assert [(score.name, score.value) for score in Score.select()] == [
+        ("Rex", 3),
+        ("Fido", 0),
+    ]
+
+
+def test_bulk_writer_ignore(test_db):
+    Score.create(name="Rex", value=1)
+    with BulkWriter(Score, ignore=True) as writer:
+        writer.add(dict(name="Rex", value=2))
+        writer.add(dict(name="Fido", value=3))
+
+    assert {score.name: score.value for score in Score.select()} == dict(Rex=1, Fido=3)
+
+
+def test_bulk_writer_preserve(test_db):
+    Score.create(name="Rex", value=1)
+    with BulkWriter(
+        Score, conflict_target=[Score.name], preserve=[Score.value]
+    ) as writer:
+        writer.add(dict(name="Rex", value=2))
+        writer.add(dict(name="Fido", value=3))
+        writer.add(dict(name="Fido", value=4))
+
+    assert {score.name: score.value for score in Score.select()} == dict(Rex=2, Fido=4)
+
+
+def test_bulk_writer_update(test_db):
+    Score.create(name="Rex", value=5)
+    update = {Score.value: fn.MAX(Score.value, EXCLUDED.value)}
+    with BulkWriter(Score, conflict_target=[Score.name], update=update) as writer:
+        writer.add(dict(name="Rex", value=2))
+        writer.add(dict(name="Fido", value=3))
+        writer.add(dict(name="Fido", value=1))
+
+    assert {score.name: score.value for score in Score.select()} == dict(Rex=5, Fido=3)
+
+
+def test_bulk_writer_doesnt_flush_on_exception(test_db):
+    with pytest.raises(RuntimeError):
+        with BulkWriter(Animal) as writer:
+            writer.add(dict(name="Rex"))
+            raise RuntimeError()
+
+    assert Animal.select().count() == 0
+
+
+def test_bulk_writer_ignore_and_update():
+    with pytest.raises(ValueError):
+        BulkWriter(Score, ignore=True, preserve=[Score.value])
+
+
+def test_bulk_writer_inserts_in_batches(tmp_path):
+    db = SqliteDatabase(tmp_path / "test.db")
+    rows = [dict(name=f"Rex {i}") for i in range(ROWS_COUNT)]
+
+    with db.bind_ctx([Animal]), db.connection_context():
+        db.create_tables([Animal])
+        with db.count_queries() as queries, BulkWriter(Animal) as writer:
+            writer.add_many(rows)
+
+        assert Animal.select().count() == ROWS_COUNT
+    assert [
+        count
+        for statement, count in queries.most_common()
+        if statement.startswith("INSERT")
+    ] == [ROWS_COUNT // BULK_BATCH_SIZE]
+
+
+@pytest.mark.parametrize("profile, expected_synchronous", [("default", 1), ("bulk", 0)])
+def test_use_pragmas_profile(tmp_path, profile, expected_synchronous):
+    db = SqliteDatabase(tmp_path / "test.db", pragmas={"journal_mode": "wal"})
+    db.use_pragmas_profile(profile)
+
+    with db.connection_context():
+        assert db.pragma("synchronous") == expected_synchronous
+        assert db.pragma("journal_mode") == "wal"
+        assert (
+            db.pragma("wal_autocheckpoint")
+            == PRAGMAS_PROFILES[profile]["wal_autocheckpoint"]
+        )
+
+
+def test_use_pragmas_profile_open_connection(tmp_path):
+    db = SqliteDatabase(tmp_path / "test.db", pragmas={"journal_mode": "wal"})
+
+    with db.connection_context():
+        db.use_pragmas_profile("bulk")
+
+        assert db.pragma("synchronous") == 0
+
+
+def test_use_pragmas_profile_unknown(tmp_path):
+    db = SqliteDatabase(tmp_path / "test.db")
+
+    with pytest.raises(KeyError):
+        db.use_pragmas_profile("turbo")
+
+
+def test_pragmas_profile(tmp_path):
+    db = SqliteDatabase(tmp_path / "test.db", pragmas=PRAGMAS_PROFILES["default"])
+
+    with db.connection_context():
+        with db.pragmas_profile("bulk"):
+            assert db.pragma("synchronous") == 0
+        assert db.pragma("synchronous") == 1
+
+    with db.connection_context():
+        assert db.pragma("synchronous") == 1
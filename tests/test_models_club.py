@@ -3,9 +3,21 @@ from datetime import date, datetime, timedelta
 import pytest
 
 from jg.coop.lib.discord_club import ClubChannelID, ClubMemberID, get_starting_emoji
-from jg.coop.models.club import ClubMessage, ClubPin, ClubUser
+from jg.coop.models.base import BulkWriter
+from jg.coop.models.club import (
+    ClubChannelMark,
+    ClubMemberStats,
+    ClubMessage,
+    ClubPin,
+    ClubUser,
+)
+
+from testing_utils import assert_max_queries, prepare_test_db
+
 
-from testing_utils import prepare_test_db
+MAPPING_MEMBERS_COUNT = 200
+
+MAPPING_MESSAGES_COUNT = 10_000
 
 
 def create_user(id_, **kwargs):
@@ -47,7 +59,9 @@ def create_message(id_, user, **kwargs):
 
 @pytest.fixture
 def test_db():
-    yield from prepare_test_db([ClubUser, ClubMessage, ClubPin])
+    yield from prepare_test_db(
+        [ClubUser, ClubMessage, ClubPin, ClubChannelMark, ClubMemberStats]
+    )
 
 
 @pytest.fixture
@@ -262,6 +276,29 @@ def test_message_channel_listing(test_db):
     assert list(ClubMessage.channel_listing(333)) == [message2, message1]
 
 
+def test_message_forum_comments_count_mapping(test_db):
+    user = create_user(1)
+    create_message(1, user, channel_id=100)
+    create_message(2, user, channel_id=111, parent_channel_id=100)
+    create_message(3, user, channel_id=111, parent_channel_id=100)
+    create_message(4, user, channel_id=111, parent_channel_id=100)
+    create_message(5, user, channel_id=222, parent_channel_id=100)
+    create_message(6, user, channel_id=333, parent_channel_id=300)
+
+    assert ClubMessage.forum_comments_count_mapping(100) == {111: 2, 222: 0}
+
+
+def test_message_forum_comments_count_mapping_query_count(test_db):
+    user = create_user(1)
+    for id_ in range(1, 101):
+        create_message(id_, user, channel_id=1000 + id_ % 10, parent_channel_id=100)
+
+    with assert_max_queries(test_db, 1):
+        comments_counts = ClubMessage.forum_comments_count_mapping(100)
+
+    assert comments_counts == {1000 + i: 9 for i in range(10)}
+
+
 def test_user_members_listing(test_db):
     create_user(1, is_member=True, is_bot=True)
     user2 = create_user(2, is_member=True, is_bot=False)
@@ -587,6 +624,123 @@ def test_user_recent_upvotes_count_skips_some_channels(test_db):
     assert user.recent_upvotes_count(today=date(2021, 4, 1)) == 4
 
 
+def test_user_content_size_mapping(test_db):
+    user1 = create_user(1)
+    user2 = create_user(2)
+    user3 = create_user(3)
+    create_message(1, user1, content="abc")
+    create_message(2, user1, content="defgh")
+    create_message(3, user2, content="ij")
+    create_message(4, user2, content="secret", is_private=True)
+
+    assert ClubUser.content_size_mapping([user1, user2, user3]) == {1: 8, 2: 2}
+
+
+def test_user_content_size_mapping_private_since(test_db):
+    user = create_user(1)
+    create_message(1, user, content="abc", created_at=datetime(2021, 3, 1))
+    create_message(2, user, content="defgh", created_at=datetime(2021, 4, 2))
+    create_message(
+        3, user, content="secret", is_private=True, created_at=datetime(2021, 4, 3)
+    )
+
+    assert ClubUser.content_size_mapping(
+        [user], since=date(2021, 4, 1), private=True
+    ) == {1: 11}
+
+
+def test_user_upvotes_count_mapping(test_db):
+    user1 = create_user(1)
+    user2 = create_user(2)
+    create_message(1, user1, upvotes_count=3)
+    create_message(2, user1, upvotes_count=5, channel_id=ClubChannelID.INTRO)
+    create_message(3, user2, upvotes_count=1)
+
+    assert ClubUser.upvotes_count_mapping([user1, user2]) == {1: 3, 2: 1}
+
+
+def test_user_first_seen_on_mapping(test_db):
+    user1 = create_user(1, joined_at=datetime(2021, 4, 1))
+    user2 = create_user(2, joined_at=None)
+    user3 = create_user(3, joined_at=datetime(2021, 5, 1))
+    create_message(1, user1, created_at=datetime(2021, 3, 15))
+    create_message(2, user1, created_at=datetime(2021, 3, 31))
+    ClubPin.create(member=user2, pinned_message=1)
+
+    assert ClubUser.first_seen_on_mapping([user1, user2, user3]) == {
+        1: date(2021, 3, 15),
+        2: date(2021, 3, 15),
+        3: date(2021, 5, 1),
+    }
+
+
+def test_user_intro_mapping(test_db):
+    created_at = datetime.now() - timedelta(days=1)
+    user1 = create_user(1)
+    user2 = create_user(2)
+    create_user(3)
+    create_message(1, user1, channel_id=ClubChannelID.INTRO, created_at=created_at)
+    create_message(
+        2,
+        user1,
+        channel_id=ClubChannelID.INTRO,
+        created_at=created_at + timedelta(seconds=30),
+    )
+    create_message(3, user2, channel_id=ClubChannelID.INTRO, type="new_member")
+    create_message(4, user2, channel_id=ClubChannelID.INTRO, created_at=created_at)
+
+    assert {
+        user_id: message.id
+        for user_id, message in ClubUser.intro_mapping(ClubUser.select()).items()
+    } == {1: 2, 2: 4}
+
+
+@pytest.mark.parametrize("members_count", [10, 100])
+def test_user_mappings_query_count(test_db, members_count):
+    members = [create_user(id_) for id_ in range(1, members_count + 1)]
+    for member in members:
+        create_message(member.id, member)
+
+    with assert_max_queries(test_db, 5):
+        ClubUser.content_size_mapping(members)
+        ClubUser.upvotes_count_mapping(members)
+        ClubUser.first_seen_on_mapping(members)
+        ClubUser.intro_mapping(members)
+
+
+def test_user_content_size_mapping_same_as_python_sum(test_db):
+    members = [create_user(id_) for id_ in range(1, MAPPING_MEMBERS_COUNT + 1)]
+    with BulkWriter(ClubMessage) as writer:
+        writer.add_many(
+            dict(
+                id=id_,
+                url=f"https://example.com/messages/{id_}",
+                author=members[id_ % len(members)].id,
+                author_is_bot=False,
+                content="x" * (id_ % 100),
+                content_size=id_ % 100,
+                upvotes_count=id_ % 3,
+                created_at=datetime(2024, 1, 1) + timedelta(minutes=id_),
+                created_month="2024-01",
+                channel_id=123,
+                channel_name="random-discussions",
+                parent_channel_id=123,
+                parent_channel_name="random-discussions",
+                type="default",
+            )
+            for id_ in range(MAPPING_MESSAGES_COUNT)
+        )
+
+    sizes = {
+        member.id: sum(message.content_size for message in member.list_messages)
+        for member in members
+    }
+    with assert_max_queries(test_db, 1):
+        sizes_mapping = ClubUser.content_size_mapping(members)
+
+    assert sizes_mapping == sizes
+
+
 def test_last_bot_message_filters_by_channel_id(test_db, juniorguru_bot):
     message1 = create_message(1, juniorguru_bot, content="🔥 abc", channel_id=123)
     create_message(2, juniorguru_bot, content="🔥 abc", channel_id=456)
@@ -622,3 +776,73 @@ def test_last_bot_message_filters_by_emoji_and_text(test_db, juniorguru_bot):
     create_message(3, juniorguru_bot, content="🔥 ghi", channel_id=123)
 
     assert ClubMessage.last_bot_message(123, "🔥", "ab") == message1
+
+
+def test_channel_mark(test_db):
+    ClubChannelMark.record(123, 10)
+    ClubChannelMark.record(123, 20)
+    ClubChannelMark.record(456, 30)
+
+    assert ClubChannelMark.get_message_id(123) == 20
+    assert ClubChannelMark.get_message_id(456) == 30
+    assert ClubChannelMark.get_message_id(789) is None
+
+
+def test_channel_mark_keeps_newest(test_db):
+    ClubChannelMark.record(123, 20)
+    ClubChannelMark.record(123, 10)
+
+    assert ClubChannelMark.get_message_id(123) == 20
+
+
+def test_member_stats_compute_same_as_user_methods(test_db):
+    today = date(2024, 1, 31)
+    user1 = create_user(1, joined_at=datetime(2023, 1, 1))
+    user2 = create_user(2, joined_at=datetime(2024, 1, 25))
+    user3 = create_user(3, joined_at=datetime(2023, 6, 1))
+    create_user(4, joined_at=datetime(2024, 1, 20))
+    create_message(
+        10, user1, content="old", upvotes_count=3, created_at=datetime(2023, 5, 1)
+    )
+    create_message(
+        11, user1, content="recent", upvotes_count=2, created_at=datetime(2024, 1, 15)
+    )
+    create_message(
+        12,
+        user1,
+        content="intro",
+        upvotes_count=5,
+        channel_id=ClubChannelID.INTRO,
+        created_at=datetime(2024, 1, 10),
+    )
+    create_message(
+        13, user2, content="secret", is_private=True, created_at=datetime(2024, 1, 1)
+    )
+    create_message(
+        14, user2, content="public", upvotes_count=1, created_at=datetime(2024, 1, 30)
+    )
+    ClubPin.create(pinned_message=10, member=user3)
+    ClubMemberStats.compute(today=today)
+    stats = {stats.user_id: stats for stats in ClubMemberStats.select()}
+
+    for user in ClubUser.select():
+        assert stats[user.id].content_size == user.content_size()
+        assert stats[user.id].recent_content_size == user.recent_content_size(today)
+        assert stats[user.id].upvotes_count == user.upvotes_count()
+        assert stats[user.id].recent_upvotes_count == user.recent_upvotes_count(today)
+        assert stats[user.id].has_intro == bool(user.intro)
+        assert stats[user.id].first_seen_on == user.first_seen_on()
+        assert stats[user.id].is_new(today) == user.is_new(today)
+
+
+def test_member_stats_members_mapping(test_db):
+    create_user(1)
+    create_user(2, is_member=False)
+    create_user(3, is_bot=True)
+    ClubMemberStats.compute()
+
+    assert list(ClubMemberStats.members_mapping()) == [1]
+
+
+def test_member_stats_is_new_without_first_seen_on():
+    assert ClubMemberStats(first_seen_on=None).is_new() is False
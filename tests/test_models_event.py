@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 import pytest
 
@@ -136,3 +136,50 @@ def test_url(test_db):
     event = create_event(1)
 
     assert event.url == "https://junior.guru/events/1/"
+
+
+def test_monthly_count(test_db):
+    create_event(1, start_at=datetime(2021, 1, 31, 18))
+    create_event(2, start_at=datetime(2021, 2, 1, 18))
+    create_event(3, start_at=datetime(2021, 2, 28, 23, 30))
+    create_event(4, start_at=datetime(2021, 3, 1, 0, 30))
+
+    assert Event.monthly_count([date(2021, 1, 31), date(2021, 2, 28)]) == [1, 2]
+
+
+def test_monthly_count_ttm(test_db):
+    create_event(1, start_at=datetime(2020, 2, 14, 18))
+    for id in range(2, 14):
+        create_event(id, start_at=datetime(2020, 2, 15, 18) + timedelta(days=id * 25))
+
+    assert Event.monthly_count_ttm([date(2021, 2, 14), date(2021, 2, 15)]) == [2, 1]
+
+
+def test_speaking_count_ttm_includes_last_day(test_db):
+    member = create_member(1)
+    event1 = create_event(1, start_at=datetime(2020, 2, 14, 18))
+    event2 = create_event(2, start_at=datetime(2021, 2, 14, 18))
+    event3 = create_event(3, start_at=datetime(2021, 2, 15, 18))
+    EventSpeaking.create(speaker=member, event=event1)
+    EventSpeaking.create(speaker=member, event=event2)
+    EventSpeaking.create(speaker=member, event=event3)
+
+    assert EventSpeaking.count_ttm(date(2021, 2, 14)) == 2
+
+
+def test_monthly_women_ptc_ttm(test_db):
+    woman = ClubUser.create(
+        id=1, display_name="Jane Doe", mention="<#1>", has_feminine_name=True
+    )
+    man = ClubUser.create(
+        id=2, display_name="John Doe", mention="<#2>", has_feminine_name=False
+    )
+    event1 = create_event(1, start_at=datetime(2021, 1, 10, 18))
+    event2 = create_event(2, start_at=datetime(2021, 6, 10, 18))
+    EventSpeaking.create(speaker=woman, event=event1)
+    EventSpeaking.create(speaker=man, event=event1)
+    EventSpeaking.create(speaker=man, event=event2)
+
+    assert EventSpeaking.monthly_women_ptc_ttm(
+        [date(2020, 12, 31), date(2021, 1, 31), date(2021, 6, 30)]
+    ) == [0, 50, 34]
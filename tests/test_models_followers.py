@@ -4,7 +4,7 @@ import pytest
 
 from jg.coop.models.followers import Followers
 
-from testing_utils import prepare_test_db
+from testing_utils import assert_max_queries, prepare_test_db
 
 
 @pytest.fixture
@@ -51,3 +51,37 @@ def test_breakdown_max(test_db):
     Followers.add(month="2023-07", name="twitter", count=300)
 
     assert Followers.breakdown(date(2023, 7, 2)) == {"twitter": 300}
+
+
+def test_deserialize_many(test_db):
+    Followers.add(month="2023-07", name="twitter", count=150)
+    lines = [
+        '{"month": "2023-07", "name": "twitter", "count": 100}\n',
+        '{"month": "2023-07", "name": "facebook", "count": 200}\n',
+        '{"month": "2023-07", "name": "facebook", "count": 250}\n',
+        '{"month": "2023-07", "name": "youtube", "count": null}\n',
+    ]
+
+    assert Followers.deserialize_many(lines) == 3
+    assert Followers.breakdown(date(2023, 7, 1)) == {"twitter": 150, "facebook": 250}
+
+
+def test_monthly_breakdown(test_db):
+    Followers.add(month="2023-07", name="twitter", count=100)
+    Followers.add(month="2023-07", name="facebook", count=200)
+    Followers.add(month="2023-08", name="facebook", count=300)
+
+    assert Followers.monthly_breakdown([date(2023, 7, 31), date(2023, 8, 31)]) == {
+        "twitter": [100, None],
+        "facebook": [200, 300],
+    }
+
+
+def test_pivot_cache(test_db):
+    Followers.add(month="2023-07", name="twitter", count=100)
+    Followers.add(month="2023-08", name="facebook", count=300)
+
+    with assert_max_queries(test_db, 1):
+        with Followers.pivot_cache():
+            Followers.breakdown(date(2023, 7, 31))
+            Followers.monthly_breakdown([date(2023, 7, 31), date(2023, 8, 31)])
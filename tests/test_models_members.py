@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from jg.coop.models.members import Members
+
+from testing_utils import assert_max_queries, prepare_test_db
+
+
+MONTHS = [date(2024, 7, 31), date(2024, 8, 31), date(2024, 9, 15)]
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([Members])
+
+
+@pytest.fixture
+def members(test_db):
+    for month, counts in {
+        "2024-07": dict(members=100, members_f=25, subscriptions_quits=5),
+        "2024-08": dict(members=110, members_f=33, subscriptions_quits=2),
+        "2024-09": dict(members=120, members_f=30, subscriptions_quits=3),
+    }.items():
+        for name, count in counts.items():
+            Members.record(month=month, name=name, count=count)
+        Members.record(month=month, name="subscription_types_monthly", count=60)
+        Members.record(month=month, name="subscription_types_yearly", count=20)
+
+
+def test_pivot(members):
+    pivot = Members.pivot()
+
+    assert list(pivot) == ["2024-07", "2024-08", "2024-09"]
+    assert pivot["2024-08"]["members"] == 110
+    assert pivot["2024-08"]["members_f"] == 33
+    assert pivot["2024-08"]["subscriptions_trials"] is None
+
+
+def test_per_month(members):
+    months = [date(2024, 6, 30)] + MONTHS
+
+    assert Members.per_month("members", months) == [None, 100, 110, 120]
+
+
+def test_monthly_members_women_ptc(members):
+    assert Members.monthly_members_women_ptc(MONTHS) == [25, 30, 25]
+
+
+def test_monthly_subscription_types_breakdown(members):
+    assert Members.monthly_subscription_types_breakdown(MONTHS) == {
+        "monthly": [60, 60, 60],
+        "yearly": [20, 20, 20],
+    }
+
+
+def test_pivot_cache(test_db, members):
+    with assert_max_queries(test_db, 1):
+        with Members.pivot_cache():
+            Members.monthly_members(MONTHS)
+            Members.monthly_members_women_ptc(MONTHS)
+            Members.monthly_churn_ptc(MONTHS)
+            Members.monthly_subscription_types_breakdown(MONTHS)
+
+
+def test_pivot_cache_is_cleared(members):
+    with Members.pivot_cache():
+        pass
+    Members.record(month="2024-10", name="members", count=130)
+
+    assert Members.monthly_members([date(2024, 10, 31)]) == [130]
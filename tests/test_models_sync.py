@@ -1,6 +1,6 @@
 import pytest
 
-from jg.coop.models.sync import Sync, SyncCommand
+from jg.coop.models.sync import Sync, SyncCommand, SyncFingerprint
 
 from testing_utils import prepare_test_db
 
@@ -10,7 +10,7 @@ NS_IN_MIN = 60000000000
 
 @pytest.fixture
 def test_db():
-    yield from prepare_test_db([Sync])
+    yield from prepare_test_db([Sync, SyncCommand, SyncFingerprint])
 
 
 def test_start_flushes_on_different_id(test_db):
@@ -87,3 +87,21 @@ def test_is_command_unseen(test_db, name, expected):
     sync.command_end("dogs", 5 * NS_IN_MIN)
 
     assert sync.is_command_unseen(name) is expected
+
+
+def test_fingerprint_missing(test_db):
+    assert SyncFingerprint.get_fingerprint("dogs") is None
+
+
+def test_fingerprint_record(test_db):
+    SyncFingerprint.record("dogs", "abc")
+    SyncFingerprint.record("dogs", "def")
+
+    assert SyncFingerprint.get_fingerprint("dogs") == "def"
+
+
+def test_fingerprint_forget(test_db):
+    SyncFingerprint.record("dogs", "abc")
+    SyncFingerprint.forget("dogs")
+
+    assert SyncFingerprint.get_fingerprint("dogs") is None
@@ -1,10 +1,13 @@
+import math
+import random
 from datetime import date, timedelta
 
 import pytest
 
+from jg.coop.lib.charts import month_range, months, ttm_range
 from jg.coop.models.transaction import Transaction
 
-from testing_utils import prepare_test_db
+from testing_utils import assert_max_queries, prepare_test_db
 
 
 @pytest.fixture
@@ -163,3 +166,78 @@ def test_listing_sorts_from_newest_to_oldest(test_db):
 #     create_transaction(amount=-300, category='d', happened_on=date(2020, 11, 9))
 
 #     assert Transaction.profit_monthly(date(2020, 12, 12)) == 30
+
+
+@pytest.fixture
+def transactions(test_db):
+    categories = ["memberships", "jobs", "tax", "marketing", "office"]
+    rng = random.Random(42)
+    for i in range(300):
+        create_transaction(
+            str(i),
+            happened_on=date(2020, 1, 1) + timedelta(days=rng.randrange(1000)),
+            category=rng.choice(categories),
+            amount=rng.randrange(-5000, 5000),
+        )
+    return months(date(2020, 1, 1), date(2022, 10, 15))
+
+
+def test_monthly_revenue(transactions):
+    assert Transaction.monthly_revenue(transactions) == [
+        sum(t.amount for t in Transaction.incomes(*month_range(month)))
+        for month in transactions
+    ]
+
+
+def test_monthly_revenue_ttm(transactions):
+    assert Transaction.monthly_revenue_ttm(transactions) == [
+        math.ceil(sum(t.amount for t in Transaction.incomes(*ttm_range(month))) / 12.0)
+        for month in transactions
+    ]
+
+
+def test_monthly_cost_ttm(transactions):
+    assert Transaction.monthly_cost_ttm(transactions) == [
+        math.ceil(
+            (-1 * sum(t.amount for t in Transaction.expenses(*ttm_range(month)))) / 12.0
+        )
+        for month in transactions
+    ]
+
+
+def test_monthly_profit(transactions):
+    assert Transaction.monthly_profit(transactions) == [
+        Transaction.revenue(month) - Transaction.cost(month) for month in transactions
+    ]
+
+
+def test_monthly_revenue_breakdown(transactions):
+    breakdown = Transaction.monthly_revenue_breakdown(transactions)
+
+    for i, month in enumerate(transactions):
+        expected = {}
+        for t in Transaction.incomes(*month_range(month)):
+            expected[t.category] = expected.get(t.category, 0) + t.amount
+        assert {
+            category: values[i]
+            for category, values in breakdown.items()
+            if values[i] is not None
+        } == expected
+
+
+def test_revenue_ttm_breakdown(test_db):
+    create_transaction("1", happened_on=date(2021, 8, 30), amount=1200)
+    create_transaction("2", happened_on=date(2021, 3, 1), amount=1300)
+    create_transaction("3", happened_on=date(2020, 8, 29), amount=1400)
+    create_transaction("4", happened_on=date(2021, 3, 1), category="jobs", amount=10)
+    create_transaction("5", happened_on=date(2021, 3, 1), category="tax", amount=99)
+
+    assert Transaction.revenue_ttm_breakdown(date(2021, 8, 30)) == {
+        "memberships": 209,
+        "jobs": 1,
+    }
+
+
+def test_monthly_profit_ttm_query_count(test_db, transactions):
+    with assert_max_queries(test_db, 2):
+        Transaction.monthly_profit_ttm(transactions)
@@ -1,10 +1,112 @@
+import asyncio
 import logging
+import math
+import time
 from collections import namedtuple
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 
 import pytest
+from discord.utils import time_snowflake
 
-from jg.coop.sync.club_content.crawler import get_channel_logger, get_history_after
+from jg.coop.sync.club_content import crawler
+from jg.coop.sync.club_content.crawler import (
+    get_channel_logger,
+    get_crawl_after,
+    get_history_after,
+)
+
+
+HISTORY_PAGE_SIZE = 100
+
+
+class FakeChannel:
+    """Channel which counts API calls needed to download its history"""
+
+    def __init__(self, id, messages):
+        self.id = id
+        self.messages = messages
+        self.api_calls_count = 0
+
+    def history(self, limit=None, after=None, oldest_first=False):
+        messages = sorted(
+            (
+                message
+                for message in self.messages
+                if after is None or message.created_at > after
+            ),
+            key=lambda message: message.id,
+            reverse=not oldest_first,
+        )[:limit]
+        self.api_calls_count += max(1, math.ceil(len(messages) / HISTORY_PAGE_SIZE))
+        return self._iterate(messages)
+
+    async def _iterate(self, messages):
+        for message in messages:
+            yield message
+
+
+class FakeReaction:
+    """Pin reaction which takes a while to list the users who reacted"""
+
+    emoji = "📌"
+
+    def __init__(self, members_ids, delay_s=0):
+        self.members_ids = members_ids
+        self.count = len(members_ids)
+        self.delay_s = delay_s
+        self.api_calls_count = 0
+
+    async def users(self):
+        self.api_calls_count += 1
+        await asyncio.sleep(self.delay_s)
+        for member_id in self.members_ids:
+            yield SimpleNamespace(id=member_id, display_name=str(member_id))
+
+
+def create_message(created_at, reactions=None):
+    return SimpleNamespace(
+        id=time_snowflake(created_at), created_at=created_at, reactions=reactions or []
+    )
+
+
+class FakeWriter:
+    def __init__(self):
+        self.messages = {}
+        self.marks = {}
+        self.pins = []
+
+    async def store_message(self, message):
+        self.messages[message.id] = message
+
+    async def store_pin(self, message_id, member):
+        self.pins.append((message_id, member.id))
+
+    async def store_known_pins(self, message_id, members_ids):
+        self.pins.extend((message_id, member_id) for member_id in members_ids)
+
+    async def store_channel_mark(self, channel_id, message_id):
+        self.marks[channel_id] = message_id
+
+
+@pytest.fixture
+def fake_store(monkeypatch):
+    store = SimpleNamespace(marks={}, forgotten=[], pins={})
+
+    async def get_channel_mark(channel_id):
+        return store.marks.get(channel_id)
+
+    async def get_pins(channel_id, after=None):
+        return store.pins
+
+    async def forget_messages(channel_id, after=None, before=None):
+        store.forgotten.append((channel_id, after, before))
+
+    monkeypatch.setattr(crawler, "get_channel_mark", get_channel_mark)
+    monkeypatch.setattr(crawler, "forget_messages", forget_messages)
+    monkeypatch.setattr(crawler, "get_pins", get_pins)
+    monkeypatch.setattr(crawler, "is_member", lambda user: True)
+    return store
 
 
 def test_get_history_after_given_naive_datetime():
@@ -20,6 +122,139 @@ def test_get_history_after_given_timezone_aware_datetime():
     assert history_after == datetime(2023, 8, 28, tzinfo=timezone.utc)
 
 
+def test_get_crawl_after():
+    message_id = time_snowflake(datetime(2023, 8, 30, tzinfo=timezone.utc))
+    crawl_after = get_crawl_after(None, message_id, rescan_period=timedelta(days=2))
+
+    assert crawl_after == datetime(2023, 8, 28, tzinfo=timezone.utc)
+
+
+def test_get_crawl_after_respects_history_after():
+    history_after = datetime(2023, 8, 29, tzinfo=timezone.utc)
+    message_id = time_snowflake(datetime(2023, 8, 30, tzinfo=timezone.utc))
+    crawl_after = get_crawl_after(
+        history_after, message_id, rescan_period=timedelta(days=2)
+    )
+
+    assert crawl_after == history_after
+
+
+@pytest.mark.asyncio
+async def test_crawl_channel_incrementally(fake_store):
+    logger = logging.getLogger("test_crawl_channel_incrementally")
+    now = datetime(2023, 8, 30, tzinfo=timezone.utc)
+    history_after = now - timedelta(days=100)
+    channel = FakeChannel(
+        1, [create_message(now - timedelta(hours=hours)) for hours in range(2000)]
+    )
+
+    writer = FakeWriter()
+
+    await crawler.crawl_channel(channel, writer, history_after, False, logger)
+    fake_store.marks.update(writer.marks)
+    first_api_calls_count = channel.api_calls_count
+    channel.messages.append(create_message(now + timedelta(hours=1)))
+    await crawler.crawl_channel(channel, writer, history_after, False, logger)
+    second_api_calls_count = channel.api_calls_count - first_api_calls_count
+
+    assert first_api_calls_count == 20
+    assert second_api_calls_count == 2
+    assert len(writer.messages) == 2001
+    assert writer.marks[1] == channel.messages[-1].id
+
+
+@pytest.mark.asyncio
+async def test_crawl_channel_forgets_rescanned_and_old_messages(fake_store):
+    logger = logging.getLogger("test_crawl_channel_forgets_rescanned")
+    now = datetime(2023, 8, 30, tzinfo=timezone.utc)
+    history_after = now - timedelta(days=100)
+    channel = FakeChannel(1, [create_message(now)])
+    fake_store.marks[1] = channel.messages[0].id
+
+    await crawler.crawl_channel(channel, FakeWriter(), history_after, False, logger)
+
+    assert fake_store.forgotten == [
+        (1, None, history_after),
+        (1, now - crawler.HISTORY_RESCAN_PERIOD, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_crawl_channel_full(fake_store):
+    logger = logging.getLogger("test_crawl_channel_full")
+    now = datetime(2023, 8, 30, tzinfo=timezone.utc)
+    history_after = now - timedelta(days=100)
+    channel = FakeChannel(
+        1, [create_message(now - timedelta(hours=hours)) for hours in range(2000)]
+    )
+
+    writer = FakeWriter()
+
+    await crawler.crawl_channel(channel, writer, history_after, True, logger)
+    fake_store.marks.update(writer.marks)
+    await crawler.crawl_channel(channel, writer, history_after, True, logger)
+
+    assert channel.api_calls_count == 40
+    assert fake_store.forgotten == []
+
+
+@pytest.mark.asyncio
+async def test_crawl_channel_fetches_pins_concurrently(fake_store):
+    logger = logging.getLogger("test_crawl_channel_fetches_pins_concurrently")
+    now = datetime(2023, 8, 30, tzinfo=timezone.utc)
+    reactions = [FakeReaction([hours], delay_s=0.05) for hours in range(8)]
+    channel = FakeChannel(
+        1,
+        [
+            create_message(now - timedelta(hours=hours), [reaction])
+            for hours, reaction in enumerate(reactions)
+        ],
+    )
+    writer = FakeWriter()
+
+    time_start = time.perf_counter()
+    await crawler.crawl_channel(channel, writer, None, True, logger)
+    time_s = time.perf_counter() - time_start
+
+    assert sorted(member_id for _, member_id in writer.pins) == list(range(8))
+    assert time_s < 8 * 0.05 / 2
+
+
+@pytest.mark.asyncio
+async def test_crawl_channel_reuses_pins_if_count_unchanged(fake_store):
+    logger = logging.getLogger("test_crawl_channel_reuses_pins")
+    now = datetime(2023, 8, 30, tzinfo=timezone.utc)
+    unchanged_reaction = FakeReaction([1, 2])
+    changed_reaction = FakeReaction([1, 2, 3])
+    channel = FakeChannel(
+        1,
+        [
+            create_message(now, [unchanged_reaction]),
+            create_message(now - timedelta(hours=1), [changed_reaction]),
+        ],
+    )
+    fake_store.marks[1] = channel.messages[0].id
+    fake_store.pins = {
+        channel.messages[0].id: (2, [1, 2]),
+        channel.messages[1].id: (2, [1, 2]),
+    }
+    writer = FakeWriter()
+
+    await crawler.crawl_channel(channel, writer, None, False, logger)
+
+    assert unchanged_reaction.api_calls_count == 0
+    assert changed_reaction.api_calls_count == 1
+    assert sorted(writer.pins) == sorted(
+        [
+            (channel.messages[0].id, 1),
+            (channel.messages[0].id, 2),
+            (channel.messages[1].id, 1),
+            (channel.messages[1].id, 2),
+            (channel.messages[1].id, 3),
+        ]
+    )
+
+
 def test_get_channel_logger():
     logger = logging.getLogger("test_get_channel_logger")
     StubChannel = namedtuple("Channel", ["id"])
@@ -0,0 +1,163 @@
+import asyncio
+import inspect
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+from jg.coop.models.club import ClubChannelMark, ClubMessage, ClubPin, ClubUser
+from jg.coop.sync.club_content import store
+
+from testing_utils import prepare_test_db
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([ClubUser, ClubMessage, ClubPin, ClubChannelMark])
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = []
+    monkeypatch.setattr(store, "write_batch", batches.append)
+    return batches
+
+
+def create_member(id, **kwargs):
+    return SimpleNamespace(
+        id=id,
+        bot=False,
+        avatar=None,
+        display_name=kwargs.get("display_name", f"Member {id}"),
+        mention=f"<@{id}>",
+        joined_at=datetime(2023, 1, 1, tzinfo=timezone.utc),
+        roles=[],
+    )
+
+
+def create_message(id, author):
+    channel = SimpleNamespace(
+        id=123, type=discord.ChannelType.private, recipient=author
+    )
+    return SimpleNamespace(
+        id=id,
+        jump_url=f"https://example.com/messages/{id}",
+        content="hello",
+        reactions=[],
+        created_at=datetime(2023, 8, 30, tzinfo=timezone.utc),
+        author=author,
+        channel=channel,
+        type=SimpleNamespace(name="default"),
+        embeds=[],
+        components=[],
+    )
+
+
+@pytest.mark.asyncio
+async def test_database_writer_batches(batches):
+    async with store.DatabaseWriter(batch_size=2, queue_size=2) as writer:
+        for message_id in range(5):
+            await writer.store_pin(message_id, create_member(1))
+
+    assert max(len(batch) for batch in batches) == 2
+    assert [row["pinned_message"] for batch in batches for _, row in batch] == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
+    assert writer.count == 5
+
+
+@pytest.mark.asyncio
+async def test_database_writer_raises_instead_of_blocking(monkeypatch):
+    def write_batch(items):
+        raise RuntimeError("Database is gone")
+
+    monkeypatch.setattr(store, "write_batch", write_batch)
+
+    with pytest.raises(RuntimeError, match="Database is gone"):
+        async with store.DatabaseWriter(batch_size=1, queue_size=1) as writer:
+            for message_id in range(100):
+                await asyncio.wait_for(
+                    writer.store_pin(message_id, create_member(1)), timeout=1
+                )
+
+
+def test_write_batch(test_db):
+    member = create_member(1)
+    former_member = SimpleNamespace(**{**vars(create_member(2)), "joined_at": None})
+    del former_member.joined_at
+    del former_member.roles
+
+    store.write_batch.__wrapped__(
+        [
+            ("members", store._member_to_row(member)),
+            ("users", store._user_to_row(member)),
+            ("messages", store._message_to_row(create_message(10, member))),
+            ("users", store._user_to_row(former_member)),
+            ("messages", store._message_to_row(create_message(20, former_member))),
+            ("pins", dict(pinned_message=20, member=1)),
+            ("dm_channels", (123, 1)),
+            ("marks", (123, 20)),
+        ]
+    )
+
+    assert [(user.id, user.is_member) for user in ClubUser.select()] == [
+        (1, True),
+        (2, False),
+    ]
+    assert [message.author_id for message in ClubMessage.select()] == [1, 2]
+    assert [(pin.pinned_message_id, pin.member_id) for pin in ClubPin.select()] == [
+        (20, 1)
+    ]
+    assert ClubUser.get_by_id(1).dm_channel_id == 123
+    assert ClubChannelMark.get_message_id(123) == 20
+
+
+def test_write_batch_updates_members(test_db):
+    store.write_batch.__wrapped__(
+        [("members", store._member_to_row(create_member(1, display_name="Alice")))]
+    )
+    store.write_batch.__wrapped__(
+        [("members", store._member_to_row(create_member(1, display_name="Bob")))]
+    )
+
+    assert ClubUser.get_by_id(1).display_name == "Bob"
+
+
+def test_write_batch_pins_of_unknown_members(test_db):
+    with pytest.raises(ClubUser.DoesNotExist):
+        store.write_batch.__wrapped__([("pins", dict(pinned_message=20, member=1))])
+
+
+def test_get_pins(test_db):
+    member = create_member(1)
+    pinned_message = create_message(10, member)
+    pinned_message.reactions = [SimpleNamespace(emoji="📌", count=3)]
+    store.write_batch.__wrapped__(
+        [
+            ("members", store._member_to_row(member)),
+            ("users", store._user_to_row(member)),
+            ("messages", store._message_to_row(pinned_message)),
+            ("messages", store._message_to_row(create_message(20, member))),
+            ("pins", dict(pinned_message=10, member=1)),
+        ]
+    )
+    get_pins = inspect.unwrap(store.get_pins)
+
+    assert get_pins(123) == {10: (3, [1])}
+    assert get_pins(456) == {}
+
+
+@pytest.mark.asyncio
+async def test_database_writer_stores_known_pins_of_members_only(batches):
+    async with store.DatabaseWriter() as writer:
+        await writer.store_member(create_member(1))
+        await writer.store_known_pins(10, [1, 2])
+
+    assert [item for batch in batches for item in batch if item[0] == "pins"] == [
+        ("pins", dict(pinned_message=10, member=1))
+    ]
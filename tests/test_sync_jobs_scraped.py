@@ -0,0 +1,270 @@
+import asyncio
+
+import pytest
+
+from jg.coop.sync import jobs_scraped
+from jg.coop.sync.jobs_scraped import (
+    DropItem,
+    create_executor,
+    load_pipelines,
+    process_in_executor,
+    process_item,
+    process_items,
+    process_sync,
+)
+from jg.coop.sync.jobs_scraped.pipelines import gender_remover, time_filter
+from jg.coop.sync.jobs_scraped.stats import StageStats, current_stage
+
+
+PIPELINES = [
+    "jg.coop.sync.jobs_scraped.pipelines.blocklist_filter",
+    "jg.coop.sync.jobs_scraped.pipelines.description_parser",
+    "jg.coop.sync.jobs_scraped.pipelines.boards_ids",
+    "jg.coop.sync.jobs_scraped.pipelines.gender_remover",
+    "jg.coop.sync.jobs_scraped.pipelines.emoji_remover",
+]
+
+ITEMS_COUNT = 200
+
+
+def create_item(no: int, **kwargs) -> dict:
+    return {
+        **dict(
+            url=f"https://www.jobs.cz/rpd/{no}/",
+            title=f"Junior Python Developer #{no} (m/f/d) 🚀",
+            company_name="Acme",
+            description_html=(
+                "<div><p>"
+                + "Lorem ipsum dolor sit amet, <b>consectetur</b> adipiscing elit. "
+                * 40
+                + "</p><ul>"
+                + "<li>Python, Django</li>" * 10
+                + "</ul></div>"
+            ),
+        ),
+        **kwargs,
+    }
+
+
+async def process(pipelines: list, item: dict) -> dict:
+    for _, pipeline in pipelines:
+        item = await pipeline(item)
+    return item
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with create_executor(2) as executor:
+        yield executor
+
+
+@pytest.fixture
+def no_saving(monkeypatch):
+    async def save(item):
+        pass
+
+    monkeypatch.setattr(jobs_scraped, "save_scraped_job", save)
+    monkeypatch.setattr(jobs_scraped, "save_dropped_job", save)
+
+
+def test_create_executor_spawns_workers(executor):
+    assert executor._mp_context.get_start_method() == "spawn"
+
+
+def test_load_pipelines():
+    pipelines = load_pipelines(
+        [
+            "jg.coop.sync.jobs_scraped.pipelines.time_filter",
+            "jg.coop.sync.jobs_scraped.pipelines.gender_remover",
+        ]
+    )
+
+    assert pipelines == [
+        ("time_filter", time_filter.process),
+        ("gender_remover", gender_remover.process),
+    ]
+
+
+def test_load_pipelines_with_executor(executor):
+    pipelines = load_pipelines(
+        [
+            "jg.coop.sync.jobs_scraped.pipelines.time_filter",
+            "jg.coop.sync.jobs_scraped.pipelines.description_parser",
+        ],
+        executor,
+    )
+
+    assert pipelines[0] == ("time_filter", time_filter.process)
+    assert pipelines[1][0] == "description_parser"
+    assert pipelines[1][1].func is process_in_executor
+
+
+@pytest.mark.asyncio
+async def test_process_in_executor_same_as_inline(executor):
+    item = create_item(1)
+    item_inline = await process(load_pipelines(PIPELINES), dict(item))
+    item_executor = await process(load_pipelines(PIPELINES, executor), dict(item))
+
+    assert item_executor == item_inline
+    assert item_executor["title"] == "Junior Python Developer #1"
+
+
+@pytest.mark.asyncio
+async def test_process_in_executor_drops_item(executor):
+    item = create_item(1, company_name="SPORTISIMO s.r.o.")
+
+    with pytest.raises(DropItem, match="Blocklist rule applied"):
+        await process_in_executor(
+            executor, "jg.coop.sync.jobs_scraped.pipelines.blocklist_filter", item
+        )
+
+
+@pytest.mark.asyncio
+async def test_process_in_executor_records_stage_stats(executor):
+    stage = StageStats("description_parser")
+    current_stage.set(stage)
+    await process_in_executor(
+        executor,
+        "jg.coop.sync.jobs_scraped.pipelines.description_parser",
+        create_item(1),
+    )
+
+    assert stage.cpu_time_s > 0
+    assert stage.latency_s >= 0
+
+
+@pytest.mark.asyncio
+async def test_process_item_records_stage_stats(no_saving):
+    pipelines = load_pipelines(PIPELINES)
+    stages = {name: StageStats(name) for name, _ in pipelines}
+
+    results = [
+        await process_item(pipelines, create_item(1), stages),
+        await process_item(
+            pipelines, create_item(2, company_name="SPORTISIMO s.r.o."), stages
+        ),
+    ]
+
+    assert results == [1, 0]
+    assert [
+        (stage.name, stage.items_count, stage.drops_count) for stage in stages.values()
+    ] == [
+        ("blocklist_filter", 2, 1),
+        ("description_parser", 1, 0),
+        ("boards_ids", 1, 0),
+        ("gender_remover", 1, 0),
+        ("emoji_remover", 1, 0),
+    ]
+    assert stages["description_parser"].wall_time_s > 0
+    assert stages["description_parser"].cpu_time_s > 0
+
+
+async def generate_items(count: int):
+    for no in range(count):
+        yield create_item(no)
+
+
+@pytest.mark.asyncio
+async def test_process_items_bounds_items_in_flight(no_saving):
+    in_flight_count = 0
+    in_flight_max = 0
+
+    async def pipeline(item):
+        nonlocal in_flight_count, in_flight_max
+        in_flight_count += 1
+        in_flight_max = max(in_flight_max, in_flight_count)
+        await asyncio.sleep(0.001)
+        in_flight_count -= 1
+        if item["url"].endswith("/3/"):
+            raise DropItem("Dropping")
+        return item
+
+    results = [
+        result
+        async for result in process_items(
+            [("pipeline", pipeline)], generate_items(50), max_in_flight=5
+        )
+    ]
+
+    assert len(results) == 50
+    assert sum(results) == 49
+    assert in_flight_max == 5
+
+
+@pytest.mark.asyncio
+async def test_process_items_pulls_items_lazily(no_saving):
+    pulled_count = 0
+
+    async def generate():
+        nonlocal pulled_count
+        async for item in generate_items(50):
+            pulled_count += 1
+            yield item
+
+    async def pipeline(item):
+        await asyncio.sleep(0.001)
+        return item
+
+    async for _ in process_items([("pipeline", pipeline)], generate(), max_in_flight=5):
+        break
+
+    assert pulled_count == 6
+
+
+@pytest.mark.asyncio
+async def test_process_items_raises_and_cancels(no_saving):
+    cancelled_count = 0
+
+    async def pipeline(item):
+        nonlocal cancelled_count
+        if item["url"].endswith("/0/"):
+            raise ValueError("Pipeline failed")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled_count += 1
+            raise
+        return item
+
+    with pytest.raises(ValueError, match="Pipeline failed"):
+        async for _ in process_items(
+            [("pipeline", pipeline)], generate_items(50), max_in_flight=5
+        ):
+            pass
+    await asyncio.sleep(0)
+
+    assert cancelled_count == 4
+
+
+def test_process_sync():
+    item = process_sync(
+        "jg.coop.sync.jobs_scraped.pipelines.gender_remover",
+        dict(title="Java Developer (m/w)"),
+    )
+
+    assert item == dict(title="Java Developer")
+
+
+def test_process_sync_raises_if_pipeline_awaits(monkeypatch):
+    async def process(item):
+        await asyncio.sleep(0)
+        return item
+
+    monkeypatch.setattr(gender_remover, "process", process)
+
+    with pytest.raises(RuntimeError, match="awaits"):
+        process_sync("jg.coop.sync.jobs_scraped.pipelines.gender_remover", {})
+
+
+@pytest.mark.asyncio
+async def test_process_in_executor_many_items_same_as_inline(executor):
+    items = [create_item(no) for no in range(ITEMS_COUNT)]
+
+    async def run(pipelines):
+        return await asyncio.gather(*[process(pipelines, dict(item)) for item in items])
+
+    results_inline = await run(load_pipelines(PIPELINES))
+    results_executor = await run(load_pipelines(PIPELINES, executor))
+
+    assert results_executor == results_inline
+    assert [item["url"] for item in results_executor] == [item["url"] for item in items]
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from jg.coop.sync.jobs_scraped.stats import (
+    StageStats,
+    get_suggestions,
+    measure_cpu_time,
+)
+
+
+def test_stage_stats_ratios():
+    stage = StageStats("filter", items_count=4, drops_count=1, wall_time_s=2)
+
+    assert stage.drop_ratio == 0.25
+    assert stage.cost_s == 0.5
+    assert stage.rank == 2
+
+
+def test_stage_stats_ratios_empty():
+    stage = StageStats("filter")
+
+    assert stage.drop_ratio == 0
+    assert stage.cost_s == 0
+    assert stage.rank == float("inf")
+
+
+def test_stage_stats_format():
+    stage = StageStats("filter", items_count=4, drops_count=1, wall_time_s=2)
+
+    assert stage.format().startswith("filter ")
+    assert "25%" in stage.format()
+    assert "500.00ms/item" in stage.format()
+
+
+@pytest.mark.asyncio
+async def test_measure_cpu_time():
+    async def process(item):
+        await asyncio.sleep(0)
+        sum(range(100_000))
+        await asyncio.sleep(0.1)
+        return item
+
+    stage = StageStats("parser")
+    item = await measure_cpu_time(process({"url": "..."}), stage)
+
+    assert item == {"url": "..."}
+    assert 0 < stage.cpu_time_s < 0.1
+
+
+@pytest.mark.asyncio
+async def test_measure_cpu_time_raises():
+    async def process(item):
+        await asyncio.sleep(0)
+        raise ValueError("Invalid item")
+
+    stage = StageStats("parser")
+
+    with pytest.raises(ValueError, match="Invalid item"):
+        await measure_cpu_time(process({}), stage)
+
+
+def test_get_suggestions():
+    stages = [
+        StageStats("parser", items_count=100, wall_time_s=10),
+        StageStats("filter", items_count=100, drops_count=50, wall_time_s=0.1),
+    ]
+
+    assert get_suggestions(stages) == [
+        "Consider running 'filter' (drops 50%, 1.00ms/item) "
+        "before 'parser' (100.00ms/item), unless it depends on its output"
+    ]
+
+
+def test_get_suggestions_cheap_stage_before():
+    stages = [
+        StageStats("parser", items_count=100, wall_time_s=0.1),
+        StageStats("filter", items_count=100, drops_count=50, wall_time_s=10),
+    ]
+
+    assert get_suggestions(stages) == []
+
+
+def test_get_suggestions_unselective_filter():
+    stages = [
+        StageStats("parser", items_count=100, wall_time_s=10),
+        StageStats("filter", items_count=100, drops_count=1, wall_time_s=0.1),
+    ]
+
+    assert get_suggestions(stages) == []
+
+
+def test_get_suggestions_earliest_stage():
+    stages = [
+        StageStats("time_filter", items_count=100, drops_count=10, wall_time_s=0.01),
+        StageStats("parser", items_count=90, wall_time_s=9),
+        StageStats("llm", items_count=90, wall_time_s=90),
+        StageStats("filter", items_count=90, drops_count=45, wall_time_s=0.09),
+    ]
+
+    assert get_suggestions(stages) == [
+        "Consider running 'filter' (drops 50%, 1.00ms/item) "
+        "before 'parser' (100.00ms/item), unless it depends on its output"
+    ]
@@ -1,14 +1,22 @@
 from collections import namedtuple
+from datetime import date, datetime, timedelta
 from operator import attrgetter
 
+import pytest
+
+from jg.coop.lib.discord_club import ClubChannelID
+from jg.coop.models.club import ClubMemberStats, ClubMessage, ClubPin, ClubUser
 from jg.coop.sync.roles import (
     calc_stats,
     evaluate_changes,
+    get_activity_members_ids,
     repr_ids,
     repr_roles,
     repr_stats,
 )
 
+from testing_utils import assert_max_queries, prepare_test_db
+
 
 DummyRole = namedtuple("Role", ["name"])
 DummyMember = namedtuple(
@@ -115,3 +123,59 @@ def test_evaluate_changes_member_shouldnt_have_this_role_but_has():
     assert evaluate_changes(member_id, member_roles, role_members_ids, role_id) == [
         (1, "remove", 222)
     ]
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([ClubUser, ClubMessage, ClubPin, ClubMemberStats])
+
+
+def create_members(count, today):
+    for id in range(1, count + 1):
+        user = ClubUser.create(
+            id=id,
+            display_name=f"Member {id}",
+            mention=f"<@{id}>",
+            joined_at=datetime(2023, 1, 1),
+        )
+        for offset_days, channel_id in [(1, 123), (100, ClubChannelID.INTRO)]:
+            created_at = datetime.combine(today, datetime.min.time()) - timedelta(
+                days=offset_days
+            )
+            ClubMessage.create(
+                id=id * 10 + offset_days,
+                url=f"https://example.com/messages/{id}",
+                author=user,
+                author_is_bot=False,
+                content="hello" * id,
+                content_size=len("hello") * id,
+                upvotes_count=id % 7,
+                created_at=created_at,
+                created_month=f"{created_at:%Y-%m}",
+                channel_id=channel_id,
+                channel_name="random-discussions",
+                parent_channel_id=channel_id,
+                parent_channel_name="random-discussions",
+            )
+
+
+@pytest.mark.parametrize("members_count", [10, 100])
+def test_get_activity_members_ids_constant_queries(test_db, members_count):
+    today = date(2024, 1, 31)
+    create_members(members_count, today)
+
+    with assert_max_queries(test_db, 1):
+        ClubMemberStats.compute(today=today)
+    with assert_max_queries(test_db, 2):
+        members = list(ClubUser.members_listing())
+        activity_members_ids = get_activity_members_ids(members, 3, today=today)
+
+    assert activity_members_ids["most_discussing"] == {
+        members_count,
+        members_count - 1,
+        members_count - 2,
+    }
+    assert activity_members_ids["has_intro_and_avatar"] == set(
+        range(1, members_count + 1)
+    )
+    assert activity_members_ids["newcomer"] == set()
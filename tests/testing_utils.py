@@ -1,14 +1,19 @@
 import json
 import random
+from contextlib import contextmanager
 from datetime import date, timedelta
 from pathlib import Path
 from typing import Generator
 
 import pytest
-from peewee import SqliteDatabase
 from strictyaml import load
 
-from jg.coop.models.base import BaseModel, db as production_db
+from jg.coop.models.base import (
+    BaseModel,
+    QueryStats,
+    SqliteDatabase,
+    db as production_db,
+)
 
 
 def prepare_test_db(models: list[BaseModel]) -> Generator[SqliteDatabase, None, None]:
@@ -25,6 +30,24 @@ def prepare_test_db(models: list[BaseModel]) -> Generator[SqliteDatabase, None,
         db.drop_tables(models)
 
 
+@contextmanager
+def assert_max_queries(
+    db: SqliteDatabase, max_count: int
+) -> Generator[QueryStats, None, None]:
+    """
+    Fails if the code within executes more SQL statements than given budget
+    """
+    with db.count_queries() as queries:
+        yield queries
+    if queries.count > max_count:
+        statements = "\n".join(
+            f"{count}× {statement}" for statement, count in queries.most_common(5)
+        )
+        pytest.fail(
+            f"Executed {queries.count} SQL queries, expected at most {max_count}:\n{statements}"
+        )
+
+
 def load_yaml(s, schema):
     """
     Uses json.loads/json.dumps to recursively convert all ordered dicts